@@ -1,8 +1,9 @@
 import os
+import time
 import logging
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from .extensions import db
+from .extensions import db, migrate
 
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO)
@@ -10,6 +11,7 @@ logger = logging.getLogger(__name__)
 
 def create_app():
     """Create and configure the Flask application"""
+    start_time = time.time()
     
     # Tạo đối tượng Flask
     app = Flask(__name__, static_url_path='/static', static_folder='static')
@@ -44,11 +46,21 @@ def create_app():
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'thumbnails'), exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'tracking_data'), exist_ok=True)
     
+    # Cấu hình engine (pool, PRAGMA của SQLite) theo loại database
+    from app.db_profile import apply_sqlite_profile, engine_options
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config))
+    
     # Khởi tạo extensions
     db.init_app(app)
+    # Migration (flask db upgrade) nằm trong thư mục backend/migrations
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
     
     # Tạo các bảng database với context của app
+    # (import models trước để db.create_all biết tất cả các bảng)
+    from app import models
     with app.app_context():
+        apply_sqlite_profile(db.engine, app.config)
         try:
             # Chỉ tạo bảng sau khi app đã được khởi tạo đúng cách
             db.create_all()
@@ -59,6 +71,14 @@ def create_app():
     # Kích hoạt CORS
     CORS(app)
     
+    # Khởi tạo Socket.IO (gửi tiến trình xử lý video cho client)
+    from app.socket_events import init_socketio
+    init_socketio(app)
+    
+    # Hàng đợi xử lý video nền (worker được khởi động bởi run.py hoặc JOB_WORKERS_AUTOSTART)
+    from app.services.job_queue import init_job_queue
+    init_job_queue(app)
+    
     # Đăng ký blueprint
     from app.api import api_bp
     app.register_blueprint(api_bp)
@@ -82,4 +102,13 @@ def create_app():
     def test_route():
         return jsonify({'message': 'API is working!'})
     
+    # Model chỉ được tải khi có job đầu tiên, trừ khi bật warm-up nền
+    if app.config['DETECTOR_WARMUP']:
+        from app.services.detector_pool import start_warmup
+        start_warmup(app.config)
+    
+    # Báo cáo thời gian khởi động (cũng được trả về trong /api/status)
+    app.config['STARTUP_SECONDS'] = time.time() - start_time
+    logger.info(f"Application initialized in {app.config['STARTUP_SECONDS']:.2f}s")
+    
     return app
\ No newline at end of file
@@ -0,0 +1,84 @@
+from flask import Blueprint, request, jsonify
+import json
+import logging
+
+from app.models.detection import CameraSettings
+from app import db
+from app.services.options import parse_processing_options
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Định nghĩa Blueprint
+camera_bp = Blueprint('camera', __name__, url_prefix='/cameras')
+
+# API endpoint để lấy danh sách cài đặt của các camera
+@camera_bp.route('', methods=['GET'])
+def get_cameras():
+    try:
+        cameras = CameraSettings.query.order_by(CameraSettings.camera_id).all()
+        
+        return jsonify({
+            'cameras': [camera.to_dict() for camera in cameras],
+            'count': len(cameras)
+        })
+    except Exception as e:
+        logger.error(f"Error getting cameras: {str(e)}")
+        return jsonify({'error': f'Error getting cameras: {str(e)}'}), 500
+
+# API endpoint để lấy cài đặt xử lý của một camera
+@camera_bp.route('/<camera_id>', methods=['GET'])
+def get_camera_settings(camera_id):
+    try:
+        camera = CameraSettings.query.filter_by(camera_id=camera_id).first()
+        
+        if not camera:
+            return jsonify({'error': 'Camera not found'}), 404
+        
+        return jsonify(camera.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting camera settings: {str(e)}")
+        return jsonify({'error': f'Error getting camera settings: {str(e)}'}), 500
+
+# API endpoint để tạo hoặc cập nhật cài đặt xử lý của một camera
+# (ví dụ roi, classes, conf, imgsz), dùng làm mặc định cho các video upload từ camera này
+@camera_bp.route('/<camera_id>', methods=['PUT'])
+def update_camera_settings(camera_id):
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object with processing settings'}), 400
+        
+        try:
+            settings = parse_processing_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        camera = CameraSettings.query.filter_by(camera_id=camera_id).first()
+        if not camera:
+            camera = CameraSettings(camera_id=camera_id)
+            db.session.add(camera)
+        camera.settings = json.dumps(settings)
+        db.session.commit()
+        
+        return jsonify(camera.to_dict())
+    except Exception as e:
+        logger.error(f"Error updating camera settings: {str(e)}")
+        return jsonify({'error': f'Error updating camera settings: {str(e)}'}), 500
+
+# API endpoint để xóa cài đặt của một camera
+@camera_bp.route('/<camera_id>', methods=['DELETE'])
+def delete_camera_settings(camera_id):
+    try:
+        camera = CameraSettings.query.filter_by(camera_id=camera_id).first()
+        
+        if not camera:
+            return jsonify({'error': 'Camera not found'}), 404
+        
+        db.session.delete(camera)
+        db.session.commit()
+        
+        return jsonify({'message': 'Camera settings deleted successfully'})
+    except Exception as e:
+        logger.error(f"Error deleting camera settings: {str(e)}")
+        return jsonify({'error': f'Error deleting camera settings: {str(e)}'}), 500
@@ -3,6 +3,7 @@ import os
 from app.api.routes import api_bp
 from app.models.detection import ProcessedVideo, AnimalDetection, TrackedObject, TrackingHistory
 from app import db
+from app.services.detector_pool import get_pool_status
 
 # Đảm bảo các thư mục tồn tại
 def ensure_directories_exist():
@@ -33,6 +34,10 @@ def get_status():
             'statistics': {
                 'processed_videos': video_count,
                 'total_detections': detection_count
+            },
+            'startup': {
+                'app_init_seconds': current_app.config.get('STARTUP_SECONDS'),
+                'detector': get_pool_status()
             }
         })
     except Exception as e:
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, send_file
 import os
 import json
 import logging
@@ -6,6 +6,7 @@ from datetime import datetime
 
 from app.models.detection import AnimalDetection, TrackedObject, TrackingHistory, ProcessedVideo
 from app import db
+from app.services.track_store import load_tracking_data, tracking_store_path
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
@@ -41,20 +42,45 @@ def get_tracking_history():
             'error': str(e)
         }), 500
 
+# API endpoint để lấy dữ liệu tracking của một video
+# ?format=npz trả về file track dạng cột (xem app.services.track_store) thay vì JSON.
+# ?from_frame=&to_frame= (hoặc from_time=&to_time=, giây) chỉ trả về các track và
+# vị trí trong đoạn đó (tính cả hai đầu), tìm bằng interval index của file track
 @tracking_bp.route('/video/<video_id>', methods=['GET'])
 def get_video_tracking(video_id):
     try:
-        # Try to get tracking data from JSON file
-        tracking_path = os.path.join(
-            current_app.config['UPLOAD_FOLDER'],
-            'tracking_data',
-            f"tracking_{video_id}.json"
-        )
-        
-        if os.path.exists(tracking_path):
-            with open(tracking_path, 'r') as f:
-                tracking_data = json.load(f)
-                
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        
+        from_frame = request.args.get('from_frame', None, type=int)
+        to_frame = request.args.get('to_frame', None, type=int)
+        from_time = request.args.get('from_time', None, type=float)
+        to_time = request.args.get('to_time', None, type=float)
+        
+        # Đổi thời gian (giây) sang frame theo fps của video
+        if from_time is not None or to_time is not None:
+            video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+            fps = video.fps if video and video.fps else 30
+            if from_time is not None:
+                from_frame = int(from_time * fps)
+            if to_time is not None:
+                to_frame = int(to_time * fps)
+        if from_frame is not None and to_frame is not None and to_frame < from_frame:
+            return jsonify({'error': 'Invalid frame range'}), 400
+        
+        if request.args.get('format') == 'npz':
+            store_path = tracking_store_path(upload_folder, video_id)
+            if not os.path.exists(store_path):
+                return jsonify({'error': 'Tracking data not found'}), 404
+            return send_file(store_path, mimetype='application/octet-stream', as_attachment=True,
+                             download_name=f"tracking_{video_id}.npz", conditional=True)
+        
+        # Try to get tracking data from track file (.npz, hoặc JSON của video cũ)
+        tracking_data = load_tracking_data(upload_folder, video_id, from_frame, to_frame)
+        
+        if tracking_data is not None:
+            if from_frame is not None or to_frame is not None:
+                tracking_data['range'] = {'from_frame': from_frame, 'to_frame': to_frame}
+            
             # Get video info
             video = ProcessedVideo.query.filter_by(video_id=video_id).first()
             if video:
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app, send_file, send_from_directory
 import os
+import re
 import time
 import uuid
 import glob
@@ -8,11 +9,16 @@ import cv2
 import numpy as np
 import logging
 import json
+import shutil
 from datetime import datetime
 
-from app.models.detection import ProcessedVideo, AnimalDetection, TrackedObject, TrackingHistory
+from app.models.detection import ProcessedVideo, AnimalDetection, TrackedObject, TrackingHistory, ProcessingJob, CameraSettings
 from app import db
-from app.services.detector import ObjectDetector
+from app.services.job_queue import find_or_create_job, submit_job
+from app.services.options import parse_processing_options
+from app.services.track_store import tracking_store_path
+from app.services.encoder import ffmpeg_available
+from app.services.video_processing import hls_directory, playable_video_path, render_path
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
@@ -20,14 +26,6 @@ logger = logging.getLogger(__name__)
 # Định nghĩa Blueprint
 video_bp = Blueprint('video', __name__, url_prefix='/videos')
 
-# Khởi tạo detector
-try:
-    detector = ObjectDetector()
-    logger.info("ObjectDetector initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing ObjectDetector: {str(e)}")
-    detector = None
-
 # Đảm bảo các thư mục tồn tại
 def ensure_directories_exist():
     upload_folder = current_app.config['UPLOAD_FOLDER']
@@ -35,23 +33,7 @@ def ensure_directories_exist():
     os.makedirs(os.path.join(upload_folder, 'processed'), exist_ok=True)
     os.makedirs(os.path.join(upload_folder, 'thumbnails'), exist_ok=True)
     os.makedirs(os.path.join(upload_folder, 'tracking_data'), exist_ok=True)
-
-# Tạo thumbnail từ video
-def generate_thumbnail(video_path, thumbnail_path):
-    try:
-        cap = cv2.VideoCapture(video_path)
-        ret, frame = cap.read()
-        
-        if ret:
-            # Lấy frame đầu tiên làm thumbnail
-            cv2.imwrite(thumbnail_path, frame)
-            cap.release()
-            return True
-        cap.release()
-        return False
-    except Exception as e:
-        logger.error(f"Error generating thumbnail: {str(e)}")
-        return False
+    os.makedirs(os.path.join(upload_folder, 'renders'), exist_ok=True)
 
 # API endpoint để upload video
 @video_bp.route('/upload', methods=['POST'])
@@ -67,6 +49,23 @@ def upload_video():
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
+        # Cài đặt mặc định của camera (nếu có) được ghi đè bởi tham số của job
+        camera_id = request.form.get('camera_id') or None
+        defaults = {
+            'batch_size': current_app.config['DETECTION_BATCH_SIZE'],
+            'chunk_workers': current_app.config['CHUNK_WORKERS']
+        }
+        if camera_id:
+            camera = CameraSettings.query.filter_by(camera_id=camera_id).first()
+            if camera:
+                defaults.update(json.loads(camera.settings or '{}'))
+        
+        # Đọc tham số xử lý của job (ví dụ batch_size, roi, classes, conf, imgsz)
+        try:
+            options = parse_processing_options(request.form, defaults)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Tạo ID duy nhất cho video
         video_id = str(uuid.uuid4())
         
@@ -75,144 +74,57 @@ def upload_video():
         upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'original', f"{video_id}_{original_filename}")
         file.save(upload_path)
         
-        # Đường dẫn cho video sẽ được xử lý
-        processed_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'processed')
-        processed_path = os.path.join(processed_folder, f"processed_{video_id}_{original_filename}")
-        
         # Tạo record trong database
         new_video = ProcessedVideo(
             video_id=video_id,
             filename=original_filename,
             original_filename=f"{video_id}_{original_filename}",
             processed_filename=f"processed_{video_id}_{original_filename}",
-            filesize=os.path.getsize(upload_path)
+            filesize=os.path.getsize(upload_path),
+            camera_id=camera_id
         )
         
         db.session.add(new_video)
         db.session.commit()
         
-        # Start video processing in another thread
-        # In a real application, this would be a background task
-        # For simplicity, we'll process synchronously here
-        if detector:
-            logger.info(f"Starting to process video: {upload_path}")
-            
-            # Xử lý video
-            results = detector.process_video(upload_path, processed_path)
-            
-            if 'error' in results:
-                logger.error(f"Error during video processing: {results['error']}")
-                return jsonify({'error': f"Video processing error: {results['error']}"}), 500
-            
-            # Lưu tracking data
-            tracking_data_path = os.path.join(
-                current_app.config['UPLOAD_FOLDER'],
-                'tracking_data',
-                f"tracking_{video_id}.json"
-            )
-            
-            with open(tracking_data_path, 'w') as f:
-                json.dump({
-                    'video_id': video_id,
-                    'processed_at': datetime.now().isoformat(),
-                    'person_count': results.get('person_count', 0),
-                    'animal_count': results.get('animal_count', 0),
-                    'total_frames': results.get('total_frames', 0),
-                    'tracks': results.get('tracks', {})
-                }, f)
-                
-            # Generate thumbnail
-            thumbnail_path = os.path.join(
-                current_app.config['UPLOAD_FOLDER'],
-                'thumbnails',
-                f"thumbnail_{video_id}.jpg"
-            )
-            generate_thumbnail(processed_path, thumbnail_path)
-            
-            # Update database record
-            video_record = ProcessedVideo.query.filter_by(video_id=video_id).first()
-            if video_record:
-                video_record.processed_at = datetime.now()
-                video_record.person_count = results.get('person_count', 0)
-                video_record.animal_count = results.get('animal_count', 0)
-                video_record.total_frames = results.get('total_frames', 0)
-                video_record.fps = results.get('fps', 0)
-                video_record.resolution = results.get('resolution', '')
-                video_record.has_tracking_data = True
-                
-                # Calculate duration
-                cap = cv2.VideoCapture(processed_path)
-                if cap.isOpened():
-                    fps = cap.get(cv2.CAP_PROP_FPS)
-                    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                    video_record.duration = frame_count / fps if fps > 0 else 0
-                    cap.release()
-                
-                db.session.commit()
-            
-            # Save detection history
-            tracking_history = TrackingHistory(
-                video_id=video_id,
-                person_count=results.get('person_count', 0),
-                animal_count=results.get('animal_count', 0),
-                total_objects=len(results.get('tracks', {})),
-                total_frames=results.get('total_frames', 0)
-            )
-            db.session.add(tracking_history)
-            
-            # Save tracked objects
-            for track_id, track_data in results.get('tracks', {}).items():
-                tracked_object = TrackedObject(
-                    video_id=video_id,
-                    track_id=int(track_id),
-                    class_name=track_data.get('class', 'unknown'),
-                    first_frame=track_data.get('first_frame', 0),
-                    last_frame=track_data.get('last_frame', 0),
-                    avg_confidence=0.0  # Calculate from detections if available
-                )
-                db.session.add(tracked_object)
-            
-            # Save detections to database
-            for detection in results.get('detections', []):
-                if isinstance(detection, dict):
-                    db_detection = AnimalDetection(
-                        video_id=video_id,
-                        video_source=f"processed_{video_id}_{original_filename}",
-                        class_name=detection.get('class', 'unknown'),
-                        confidence=detection.get('confidence', 0.0),
-                        frame_number=detection.get('frame', 0),
-                        x1=detection.get('box', [0, 0, 0, 0])[0],
-                        y1=detection.get('box', [0, 0, 0, 0])[1],
-                        x2=detection.get('box', [0, 0, 0, 0])[2],
-                        y2=detection.get('box', [0, 0, 0, 0])[3]
-                    )
-                    db.session.add(db_detection)
-            
-            db.session.commit()
-            
-            logger.info(f"Video processing completed: {processed_path}")
-            
-            return jsonify({
-                'videoId': video_id,
-                'message': 'Video uploaded and processed successfully',
-                'person_count': results.get('person_count', 0),
-                'animal_count': results.get('animal_count', 0),
-                'processed_file': f"processed_{video_id}_{original_filename}"
-            })
-        else:
-            logger.warning("No detector available, returning without processing")
-            # For simplicity, copy the file as processed
-            import shutil
-            shutil.copy(upload_path, processed_path)
-            
-            return jsonify({
-                'warning': 'Video uploaded but processing not available',
-                'videoId': video_id
-            })
+        # Tạo job xử lý và đưa vào hàng đợi nền, trả về ngay cho client
+        job = ProcessingJob(
+            job_id=str(uuid.uuid4()),
+            video_id=video_id,
+            status='pending',
+            options=json.dumps(options)
+        )
+        db.session.add(job)
+        db.session.commit()
+        
+        submit_job(job.job_id)
+        logger.info(f"Queued processing job {job.job_id} for video: {upload_path}")
+        
+        return jsonify({
+            'videoId': video_id,
+            'jobId': job.job_id,
+            'status': job.status,
+            'message': 'Video uploaded, processing started',
+            'status_url': f'/api/videos/jobs/{job.job_id}'
+        }), 202
     except Exception as e:
         logger.error(f"Error in upload_video: {str(e)}", exc_info=True)
         return jsonify({'error': f'Error processing video: {str(e)}'}), 500
 
+# API endpoint để lấy trạng thái của một job xử lý video
+@video_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    try:
+        job = ProcessingJob.query.filter_by(job_id=job_id).first()
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+            
+        return jsonify(job.to_dict())
+    except Exception as e:
+        logger.error(f"Error getting job status: {str(e)}")
+        return jsonify({'error': f'Error getting job status: {str(e)}'}), 500
+
 # API endpoint để lấy danh sách video đã xử lý
 @video_bp.route('/processed', methods=['GET'])
 def get_processed_videos():
@@ -226,12 +138,8 @@ def get_processed_videos():
         # Format kết quả
         formatted_videos = []
         for video in videos:
-            # Check if processed file exists
-            processed_path = os.path.join(
-                current_app.config['UPLOAD_FOLDER'], 
-                'processed', 
-                video.processed_filename
-            )
+            # Check if processed file exists (video gốc với chế độ chỉ phát hiện)
+            processed_path = playable_video_path(video)
             
             # Check if thumbnail exists
             thumbnail_path = os.path.join(
@@ -255,7 +163,11 @@ def get_processed_videos():
                     'animal_count': video.animal_count,
                     'duration': video.duration,
                     'resolution': video.resolution,
-                    'has_tracking_data': video.has_tracking_data
+                    'has_tracking_data': video.has_tracking_data,
+                    'detections_only': bool(video.detections_only),
+                    'overlay_url': f'/api/videos/render/{video.video_id}' if video.detections_only else None,
+                    'previews': json.loads(video.previews) if video.previews else None,
+                    'sprite': f'/api/videos/sprite/{video.video_id}' if video.previews else None
                 })
         
         return jsonify({
@@ -270,6 +182,8 @@ def get_processed_videos():
         })
 
 # API endpoint để stream một video
+# Hỗ trợ Range (206 Partial Content) và ETag/Last-Modified, nên trình phát chỉ tải
+# phần đang xem khi tua thay vì tải lại cả file
 @video_bp.route('/stream/<video_id>', methods=['GET'])
 def stream_video(video_id):
     try:
@@ -279,44 +193,131 @@ def stream_video(video_id):
         if not video:
             return jsonify({'error': 'Video not found'}), 404
             
-        processed_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'processed')
-        video_path = os.path.join(processed_dir, video.processed_filename)
+        video_path = playable_video_path(video)
         
         if not os.path.exists(video_path):
             return jsonify({'error': 'Video file not found'}), 404
             
-        return send_file(video_path)
+        return send_file(video_path, mimetype='video/mp4', conditional=True, etag=True)
     except Exception as e:
         logger.error(f"Error streaming video: {str(e)}")
         return jsonify({'error': f'Error streaming video: {str(e)}'}), 500
 
-# API endpoint để lấy thumbnail
+# API endpoint để lấy playlist HLS của một video
+# Playlist được tạo bằng stream copy khi xử lý (option hls) hoặc trong một job 'hls'
+# ở lần yêu cầu đầu tiên; khi chưa có, endpoint trả về 202 với job id
+@video_bp.route('/stream/<video_id>/index.m3u8', methods=['GET'])
+def stream_hls_playlist(video_id):
+    try:
+        video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+        
+        if not video:
+            return jsonify({'error': 'Video not found'}), 404
+        
+        hls_dir = hls_directory(video_id)
+        if os.path.exists(os.path.join(hls_dir, 'index.m3u8')):
+            return send_from_directory(hls_dir, 'index.m3u8', mimetype='application/vnd.apple.mpegurl',
+                                       conditional=True)
+        
+        if not ffmpeg_available():
+            return jsonify({'error': 'HLS is not available for this video'}), 503
+        
+        if not video.processed_at or not os.path.exists(playable_video_path(video)):
+            return jsonify({'error': 'Video file not found'}), 404
+        
+        job = find_or_create_job(video_id, 'hls', {})
+        return jsonify({
+            'videoId': video_id,
+            'jobId': job.job_id,
+            'status': job.status,
+            'message': 'HLS generation started, request this URL again when the job is completed',
+            'status_url': f'/api/videos/jobs/{job.job_id}'
+        }), 202
+    except Exception as e:
+        logger.error(f"Error streaming HLS playlist: {str(e)}")
+        return jsonify({'error': f'Error streaming HLS playlist: {str(e)}'}), 500
+
+# API endpoint để lấy một segment HLS (đường dẫn tương đối trong playlist)
+@video_bp.route('/stream/<video_id>/<segment>', methods=['GET'])
+def stream_hls_segment(video_id, segment):
+    try:
+        # Chỉ chấp nhận tên segment do write_hls tạo ra (không có đường dẫn)
+        if not re.fullmatch(r'segment_\d+\.ts', segment):
+            return jsonify({'error': 'Segment not found'}), 404
+        
+        video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+        
+        if not video:
+            return jsonify({'error': 'Video not found'}), 404
+        
+        segment_path = os.path.join(hls_directory(video.video_id), segment)
+        if not os.path.exists(segment_path):
+            return jsonify({'error': 'Segment not found'}), 404
+        
+        # Segment không thay đổi sau khi tạo nên được cache lâu dài
+        return send_file(segment_path, mimetype='video/mp2t', conditional=True, max_age=31536000)
+    except Exception as e:
+        logger.error(f"Error streaming HLS segment: {str(e)}")
+        return jsonify({'error': f'Error streaming HLS segment: {str(e)}'}), 500
+
+# API endpoint để vẽ overlay tracking lên video gốc từ tracks đã lưu
+# Query: start, end (giây, mặc định là cả video). Kết quả được cache trong uploads/renders;
+# khi chưa có, việc vẽ được đưa vào hàng đợi job và endpoint trả về 202 với job id
+@video_bp.route('/render/<video_id>', methods=['GET'])
+def render_video(video_id):
+    try:
+        video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+        
+        if not video:
+            return jsonify({'error': 'Video not found'}), 404
+        
+        start = request.args.get('start', 0, type=float)
+        end = request.args.get('end', None, type=float)
+        if start < 0 or (end is not None and end <= start):
+            return jsonify({'error': 'Invalid time range'}), 400
+        
+        original_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'original', video.original_filename)
+        
+        if not os.path.exists(original_path) or not video.has_tracking_data:
+            return jsonify({'error': 'Video or tracking data not found'}), 404
+        
+        output_path = render_path(video_id, start, end)
+        if os.path.exists(output_path):
+            return send_file(output_path, mimetype='video/mp4', conditional=True, etag=True)
+        
+        # Vẽ và mã hóa cả video mất nhiều thời gian: chạy trong worker nền
+        job = find_or_create_job(video_id, 'render', {'start': start, 'end': end})
+        return jsonify({
+            'videoId': video_id,
+            'jobId': job.job_id,
+            'status': job.status,
+            'message': 'Rendering started, request this URL again when the job is completed',
+            'status_url': f'/api/videos/jobs/{job.job_id}'
+        }), 202
+    except Exception as e:
+        logger.error(f"Error rendering video: {str(e)}")
+        return jsonify({'error': f'Error rendering video: {str(e)}'}), 500
+
+# API endpoint để lấy thumbnail (?width= chọn thumbnail thu nhỏ, xem THUMBNAIL_WIDTHS)
+# Thumbnail được tạo trong lúc xử lý, endpoint này không giải mã video
 @video_bp.route('/thumbnail/<video_id>', methods=['GET'])
 def serve_thumbnail(video_id):
     try:
-        thumbnail_path = os.path.join(
-            current_app.config['UPLOAD_FOLDER'],
-            'thumbnails',
-            f"thumbnail_{video_id}.jpg"
-        )
+        width = request.args.get('width', None, type=int)
+        thumbnail_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'thumbnails')
+        thumbnail_path = os.path.join(thumbnail_dir, f"thumbnail_{video_id}.jpg")
         
-        if os.path.exists(thumbnail_path):
-            return send_file(thumbnail_path)
-            
-        # Nếu không có thumbnail, tìm video và tạo thumbnail
-        video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+        # Thumbnail nhỏ nhất có chiều rộng >= width, hoặc thumbnail gốc
+        if width:
+            for size in sorted(current_app.config['THUMBNAIL_WIDTHS']):
+                sized_path = os.path.join(thumbnail_dir, f"thumbnail_{video_id}_{size}.jpg")
+                if size >= width and os.path.exists(sized_path):
+                    thumbnail_path = sized_path
+                    break
         
-        if video:
-            video_path = os.path.join(
-                current_app.config['UPLOAD_FOLDER'],
-                'processed',
-                video.processed_filename
-            )
-            
-            if os.path.exists(video_path):
-                generate_thumbnail(video_path, thumbnail_path)
-                if os.path.exists(thumbnail_path):
-                    return send_file(thumbnail_path)
+        if os.path.exists(thumbnail_path):
+            return send_file(thumbnail_path, mimetype='image/jpeg', conditional=True,
+                             max_age=current_app.config['PREVIEW_CACHE_MAX_AGE'])
         
         # Trả về placeholder nếu không tìm thấy
         placeholder_path = os.path.join(current_app.root_path, 'static', 'video-placeholder.jpg')
@@ -328,6 +329,26 @@ def serve_thumbnail(video_id):
         logger.error(f"Error serving thumbnail: {str(e)}")
         return jsonify({'error': f'Error serving thumbnail: {str(e)}'}), 500
 
+# API endpoint để lấy sprite sheet dùng cho thanh tua
+# Vị trí các ô (interval, columns, tile_width, tile_height) nằm trong 'previews' của video
+@video_bp.route('/sprite/<video_id>', methods=['GET'])
+def serve_sprite(video_id):
+    try:
+        sprite_path = os.path.join(
+            current_app.config['UPLOAD_FOLDER'],
+            'thumbnails',
+            f"sprite_{video_id}.jpg"
+        )
+        
+        if not os.path.exists(sprite_path):
+            return jsonify({'error': 'Sprite sheet not found'}), 404
+        
+        return send_file(sprite_path, mimetype='image/jpeg', conditional=True,
+                         max_age=current_app.config['PREVIEW_CACHE_MAX_AGE'])
+    except Exception as e:
+        logger.error(f"Error serving sprite sheet: {str(e)}")
+        return jsonify({'error': f'Error serving sprite sheet: {str(e)}'}), 500
+
 # API endpoint để xóa video
 @video_bp.route('/delete/<video_id>', methods=['DELETE'])
 def delete_video(video_id):
@@ -362,16 +383,41 @@ def delete_video(video_id):
             'tracking_data',
             f"tracking_{video.video_id}.json"
         )
+        tracking_store = tracking_store_path(current_app.config['UPLOAD_FOLDER'], video.video_id)
+        
+        # Thumbnail thu nhỏ và sprite sheet
+        preview_paths = glob.glob(os.path.join(
+            current_app.config['UPLOAD_FOLDER'],
+            'thumbnails',
+            f"thumbnail_{video.video_id}_*.jpg"
+        )) + [os.path.join(
+            current_app.config['UPLOAD_FOLDER'],
+            'thumbnails',
+            f"sprite_{video.video_id}.jpg"
+        )]
+        
+        # Overlay đã vẽ (chế độ chỉ phát hiện)
+        render_paths = glob.glob(os.path.join(
+            current_app.config['UPLOAD_FOLDER'],
+            'renders',
+            f"render_{video.video_id}_*"
+        ))
         
         # Xóa các file nếu tồn tại
-        for path in [original_path, processed_path, thumbnail_path, tracking_path]:
+        for path in [original_path, processed_path, thumbnail_path, tracking_path, tracking_store] + preview_paths + render_paths:
             if path and os.path.exists(path):
                 os.remove(path)
         
+        # Playlist và segment HLS
+        hls_dir = hls_directory(video.video_id)
+        if os.path.isdir(hls_dir):
+            shutil.rmtree(hls_dir)
+        
         # Xóa dữ liệu tracking từ database
         TrackedObject.query.filter_by(video_id=video_id).delete()
         TrackingHistory.query.filter_by(video_id=video_id).delete()
         AnimalDetection.query.filter_by(video_id=video_id).delete()
+        ProcessingJob.query.filter_by(video_id=video_id).delete()
         
         # Xóa record video
         db.session.delete(video)
@@ -21,6 +21,20 @@ class Config:
         f'sqlite:///{os.path.join(BASE_DIR, "database.db")}'
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLALCHEMY_ENGINE_OPTIONS được tạo trong create_app theo loại database
+    # (xem app/db_profile.py) từ các giá trị dưới đây
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    # Chỉ dùng cho database ngoài (DATABASE_URL): thời gian chờ kết nối rảnh và làm mới kết nối (giây)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    # Profile SQLite: WAL để dashboard đọc được trong khi job đang ghi detections,
+    # synchronous=NORMAL (an toàn với WAL, ít fsync hơn), cache, mmap và busy timeout
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', 'True') == 'True'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))
     
     # Upload configuration - Để đảm bảo đường dẫn là chính xác
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
@@ -28,6 +42,52 @@ class Config:
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB limit for uploads
     
+    # Video processing configuration
+    # Số frame mặc định được gom lại cho một lần gọi YOLO (có thể ghi đè theo job)
+    DETECTION_BATCH_SIZE = int(os.environ.get('DETECTION_BATCH_SIZE', 4))
+    # Backend suy luận: 'pytorch', 'onnx', 'onnx-int8' (cần chạy quantize_model.py trước)
+    # hoặc 'openvino'; tự quay về pytorch nếu thiếu runtime
+    DETECTOR_BACKEND = os.environ.get('DETECTOR_BACKEND', 'pytorch')
+    # Tracker mặc định: 'deepsort' (có appearance embedder) hoặc 'iou' (chỉ dùng chuyển động, nhanh hơn)
+    DEFAULT_TRACKER = os.environ.get('DEFAULT_TRACKER', 'deepsort')
+    # Số video được xử lý đồng thời (mỗi job có detector và tracker riêng, các slot dùng chung trọng số YOLO)
+    DETECTOR_POOL_SIZE = int(os.environ.get('DETECTOR_POOL_SIZE', 2))
+    # Thời gian tối đa (giây) một upload chờ slot detector rảnh
+    DETECTOR_POOL_TIMEOUT = float(os.environ.get('DETECTOR_POOL_TIMEOUT', 300))
+    # Tải model và chạy một lần suy luận giả trong thread nền ngay sau khi server khởi động
+    DETECTOR_WARMUP = os.environ.get('DETECTOR_WARMUP', 'False') == 'True'
+    # Số worker thread xử lý job video trong nền
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', DETECTOR_POOL_SIZE))
+    # Khởi động worker ngay trong create_app (ví dụ khi chạy bằng gunicorn). Mặc định chỉ
+    # run.py khởi động worker, nên lệnh CLI (flask db upgrade, flask shell) không xử lý job.
+    # Chỉ bật cho một process: khi khởi động, worker đưa các job 'running' về lại 'pending'
+    JOB_WORKERS_AUTOSTART = os.environ.get('JOB_WORKERS_AUTOSTART', 'False') == 'True'
+    # Khoảng thời gian (giây) worker kiểm tra database để tìm job pending do process khác tạo
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 5.0))
+    # Khoảng thời gian tối thiểu (giây) giữa hai sự kiện processing_progress của một job
+    PROGRESS_EMIT_INTERVAL = float(os.environ.get('PROGRESS_EMIT_INTERVAL', 1.0))
+    # Số process xử lý song song các đoạn của một video dài (1 = tắt, có thể ghi đè theo job)
+    CHUNK_WORKERS = int(os.environ.get('CHUNK_WORKERS', 1))
+    # Lưu checkpoint của job mỗi số frame này để có thể tiếp tục sau khi server khởi động lại (0 = tắt)
+    CHECKPOINT_INTERVAL = int(os.environ.get('CHECKPOINT_INTERVAL', 1500))
+    # Độ dài mỗi segment HLS (giây), segment được cắt tại keyframe
+    HLS_SEGMENT_SECONDS = int(os.environ.get('HLS_SEGMENT_SECONDS', 6))
+    
+    # Preview tạo trong lúc xử lý: chiều rộng các thumbnail thu nhỏ, và sprite sheet
+    # (một ô rộng SPRITE_TILE_WIDTH mỗi SPRITE_INTERVAL giây, SPRITE_COLUMNS ô mỗi hàng)
+    THUMBNAIL_WIDTHS = [int(width) for width in os.environ.get('THUMBNAIL_WIDTHS', '160,320,640').split(',')]
+    SPRITE_INTERVAL = float(os.environ.get('SPRITE_INTERVAL', 10))
+    SPRITE_TILE_WIDTH = int(os.environ.get('SPRITE_TILE_WIDTH', 160))
+    SPRITE_COLUMNS = int(os.environ.get('SPRITE_COLUMNS', 10))
+    # Thời gian cache (giây) của thumbnail và sprite sheet trên trình duyệt
+    PREVIEW_CACHE_MAX_AGE = int(os.environ.get('PREVIEW_CACHE_MAX_AGE', 86400))
+    # Số row mỗi lần INSERT executemany (mỗi batch một transaction) khi lưu detections và tracks
+    DB_INSERT_BATCH_SIZE = int(os.environ.get('DB_INSERT_BATCH_SIZE', 5000))
+    # Vị trí track được giữ trong bộ nhớ tối đa số frame này rồi ghi ra file tạm
+    TRACK_FLUSH_FRAMES = int(os.environ.get('TRACK_FLUSH_FRAMES', 1000))
+    # Nén file track .npz (nhỏ hơn); tắt để file có thể được memory-map khi đọc
+    TRACK_STORE_COMPRESSED = os.environ.get('TRACK_STORE_COMPRESSED', 'True') == 'True'
+    
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
@@ -0,0 +1,77 @@
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def is_sqlite_memory(uri):
+    return is_sqlite(uri) and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri)
+
+
+def engine_options(uri, config):
+    """SQLALCHEMY_ENGINE_OPTIONS phù hợp với database
+
+    SQLite (file): pool giữ kết nối lâu dài để PRAGMA chỉ chạy một lần cho mỗi
+    kết nối, timeout của driver bằng busy timeout, và kết nối được dùng chung
+    giữa các thread (job worker, request). Database ngoài (DATABASE_URL):
+    pool có giới hạn, kiểm tra kết nối trước khi dùng và làm mới định kỳ.
+    """
+    if is_sqlite_memory(uri):
+        # Flask-SQLAlchemy dùng StaticPool cho database trong bộ nhớ
+        return {}
+    if is_sqlite(uri):
+        return {
+            'poolclass': QueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'connect_args': {
+                'timeout': config['SQLITE_BUSY_TIMEOUT'],
+                'check_same_thread': False
+            }
+        }
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True
+    }
+
+
+def sqlite_pragmas(config):
+    """Các PRAGMA được chạy trên mỗi kết nối SQLite mới"""
+    pragmas = {
+        'busy_timeout': int(config['SQLITE_BUSY_TIMEOUT'] * 1000),
+        # Số âm: kích thước cache tính bằng KiB
+        'cache_size': -config['SQLITE_CACHE_SIZE_KB'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'temp_store': 'MEMORY'
+    }
+    if config['SQLITE_WAL']:
+        # WAL: người đọc không bị chặn khi đang có transaction ghi (và ngược lại)
+        pragmas = dict({'journal_mode': 'WAL'}, **pragmas)
+    return pragmas
+
+
+def apply_sqlite_profile(engine, config):
+    """Đăng ký PRAGMA của profile SQLite cho mọi kết nối mới của engine"""
+    if not is_sqlite(str(engine.url)) or is_sqlite_memory(str(engine.url)):
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    logger.info(f"SQLite profile: {', '.join(f'{name}={value}' for name, value in pragmas.items())}")
@@ -1,7 +1,16 @@
+import json
 from datetime import datetime
 from app import db
 
 class AnimalDetection(db.Model):
+    # Index cho các truy vấn thường dùng: detections của một video theo frame
+    # (phân trang, xóa video), thống kê theo class và sắp xếp theo thời gian
+    __table_args__ = (
+        db.Index('ix_animal_detection_video_frame', 'video_id', 'frame_number'),
+        db.Index('ix_animal_detection_class_name', 'class_name'),
+        db.Index('ix_animal_detection_timestamp', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     video_source = db.Column(db.String(255), nullable=False)
     video_id = db.Column(db.String(50), nullable=False)
@@ -29,6 +38,10 @@ class AnimalDetection(db.Model):
         }
 
 class ProcessedVideo(db.Model):
+    __table_args__ = (
+        db.Index('ix_processed_video_processed_at', 'processed_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.String(50), nullable=False, unique=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -44,6 +57,9 @@ class ProcessedVideo(db.Model):
     fps = db.Column(db.Float, nullable=True)
     resolution = db.Column(db.String(20), nullable=True)
     has_tracking_data = db.Column(db.Boolean, default=False)
+    camera_id = db.Column(db.String(50), nullable=True)  # Camera đã quay video (nếu có)
+    detections_only = db.Column(db.Boolean, default=False)  # Không có video kết quả, phát video gốc
+    previews = db.Column(db.Text, nullable=True)  # JSON: kích thước thumbnail và thông tin sprite sheet
     
     def to_dict(self):
         return {
@@ -61,10 +77,17 @@ class ProcessedVideo(db.Model):
             'total_frames': self.total_frames,
             'fps': self.fps,
             'resolution': self.resolution,
-            'has_tracking_data': self.has_tracking_data
+            'has_tracking_data': self.has_tracking_data,
+            'camera_id': self.camera_id,
+            'detections_only': bool(self.detections_only),
+            'previews': json.loads(self.previews) if self.previews else None
         }
 
 class TrackedObject(db.Model):
+    __table_args__ = (
+        db.Index('ix_tracked_object_video_track', 'video_id', 'track_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.String(50), nullable=False)
     track_id = db.Column(db.Integer, nullable=False)
@@ -86,6 +109,11 @@ class TrackedObject(db.Model):
         }
 
 class TrackingHistory(db.Model):
+    __table_args__ = (
+        db.Index('ix_tracking_history_video_id', 'video_id'),
+        db.Index('ix_tracking_history_timestamp', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.String(50), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -103,4 +131,56 @@ class TrackingHistory(db.Model):
             'animal_count': self.animal_count,
             'total_objects': self.total_objects,
             'total_frames': self.total_frames
-        }
\ No newline at end of file
+        }
+
+class ProcessingJob(db.Model):
+    __table_args__ = (
+        db.Index('ix_processing_job_video_id', 'video_id'),
+        db.Index('ix_processing_job_status_created_at', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(50), nullable=False, unique=True)
+    video_id = db.Column(db.String(50), nullable=False)
+    task = db.Column(db.String(20), nullable=True, default='process')  # process, render, hls (None = process)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    progress = db.Column(db.Integer, default=0)
+    options = db.Column(db.Text, nullable=True)  # Tham số xử lý của job (JSON)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    checkpoint_frame = db.Column(db.Integer, nullable=True)  # Frame của checkpoint gần nhất
+    resumed_at = db.Column(db.DateTime, nullable=True)
+    resumed_from_frame = db.Column(db.Integer, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'video_id': self.video_id,
+            'task': self.task or 'process',
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'checkpoint_frame': self.checkpoint_frame,
+            'resumed': self.resumed_at is not None,
+            'resumed_at': self.resumed_at.isoformat() if self.resumed_at else None,
+            'resumed_from_frame': self.resumed_from_frame
+        }
+
+class CameraSettings(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    camera_id = db.Column(db.String(50), nullable=False, unique=True)
+    settings = db.Column(db.Text, nullable=False, default='{}')  # Tham số xử lý mặc định của camera (JSON)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'camera_id': self.camera_id,
+            'settings': json.loads(self.settings or '{}'),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
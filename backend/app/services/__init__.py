@@ -1 +1,2 @@
-from app.services.detector import ObjectDetector
\ No newline at end of file
+from app.services.detector import ObjectDetector
+from app.services.detector_pool import DetectorPool
\ No newline at end of file
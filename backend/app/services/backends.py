@@ -0,0 +1,89 @@
+import os
+import logging
+import importlib.util
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Đường dẫn mặc định đến model (backend/model/best.pt)
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                  'model', 'best.pt')
+
+# Các backend suy luận được hỗ trợ
+SUPPORTED_BACKENDS = ('pytorch', 'onnx', 'onnx-int8', 'openvino')
+
+# Thư viện runtime cần có cho từng backend
+RUNTIME_MODULES = {
+    'onnx': 'onnxruntime',
+    'onnx-int8': 'onnxruntime',
+    'openvino': 'openvino',
+}
+
+
+def runtime_available(backend):
+    """Kiểm tra runtime của backend đã được cài đặt hay chưa"""
+    module = RUNTIME_MODULES.get(backend)
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def exported_model_path(model_path, backend):
+    """Đường dẫn của model đã export, nằm cạnh file .pt (theo cách đặt tên của ultralytics)"""
+    base = os.path.splitext(model_path)[0]
+    if backend == 'onnx':
+        return f"{base}.onnx"
+    if backend == 'onnx-int8':
+        return f"{base}_int8.onnx"
+    if backend == 'openvino':
+        return f"{base}_openvino_model"
+    return model_path
+
+
+def ensure_exported(model_path, backend):
+    """Export model sang backend một lần và dùng lại bản đã export nếu còn mới"""
+    artifact = exported_model_path(model_path, backend)
+    if backend == 'onnx-int8':
+        # Model INT8 chỉ được tạo bởi quantize_model.py, không export tự động
+        if not os.path.exists(artifact):
+            raise FileNotFoundError(f"INT8 model not found: {artifact} (run quantize_model.py first)")
+        return artifact
+
+    if os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(model_path):
+        return artifact
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exporting {model_path} to {backend} format")
+    # dynamic=True để model đã export nhận được batch nhiều frame
+    exported = YOLO(model_path).export(format=backend, dynamic=True)
+    logger.info(f"Model exported to: {exported}")
+    return str(exported)
+
+
+def load_model(model_path, backend='pytorch'):
+    """Tải model YOLOv8 với backend được chọn
+
+    Trả về (model, backend thực tế). Nếu runtime không có hoặc export lỗi,
+    model được tải bằng PyTorch như mặc định.
+    """
+    # Import muộn để torch/ultralytics chỉ được nạp khi thật sự cần model
+    from ultralytics import YOLO
+
+    backend = (backend or 'pytorch').lower()
+    if backend not in SUPPORTED_BACKENDS:
+        logger.warning(f"Unknown detector backend '{backend}', using pytorch")
+        backend = 'pytorch'
+
+    if backend != 'pytorch':
+        if not runtime_available(backend):
+            logger.warning(f"{RUNTIME_MODULES[backend]} is not installed, falling back to pytorch")
+        else:
+            try:
+                artifact = ensure_exported(model_path, backend)
+                model = YOLO(artifact, task='detect')
+                logger.info(f"Loaded {backend} model from: {artifact}")
+                return model, backend
+            except Exception as e:
+                logger.error(f"Error loading {backend} model, falling back to pytorch: {str(e)}",
+                             exc_info=True)
+
+    return YOLO(model_path), 'pytorch'
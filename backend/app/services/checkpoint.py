@@ -0,0 +1,67 @@
+import os
+import glob
+import pickle
+import logging
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """Checkpoint định kỳ của một job xử lý video
+
+    Trạng thái (frame cuối cùng đã xử lý, detections và tracks đã tích lũy,
+    trạng thái tracker, danh sách các đoạn video đã ghi xong) được pickle vào
+    một file. Video kết quả được ghi thành nhiều đoạn nằm cạnh file checkpoint,
+    mỗi đoạn được đóng lại khi lưu checkpoint, nên khi tiếp tục job chỉ cần
+    ghi các đoạn mới và ghép tất cả ở cuối.
+    """
+
+    def __init__(self, path, interval=1500, on_save=None):
+        self.path = path
+        self.interval = max(1, interval)
+        self.on_save = on_save
+        self._last_frame = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Đọc checkpoint, trả về None nếu không có hoặc file bị hỏng"""
+        if not self.exists():
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+            self._last_frame = state['frame_index']
+            return state
+        except Exception as e:
+            logger.warning(f"Could not read checkpoint {self.path}: {str(e)}")
+            return None
+
+    def due(self, frame_index):
+        """Đã xử lý đủ interval frame kể từ checkpoint trước hay chưa"""
+        return frame_index - self._last_frame >= self.interval
+
+    def save(self, state):
+        """Ghi checkpoint vào file tạm rồi đổi tên, để không bao giờ để lại file ghi dở"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+        self._last_frame = state['frame_index']
+        logger.info(f"Checkpoint saved at frame {self._last_frame}: {self.path}")
+        if self.on_save:
+            self.on_save(self._last_frame)
+
+    def segment_path(self, index, extension):
+        """Đường dẫn đoạn video thứ index của job"""
+        return f"{self.path}.seg{index}{extension}"
+
+    def clear(self):
+        """Xóa checkpoint và các đoạn video còn sót lại"""
+        for path in [self.path, f"{self.path}.tmp"] + glob.glob(f"{self.path}.seg*"):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,337 @@
+import os
+import time
+import queue
+import logging
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from app.services.encoder import FFMPEG_BINARY, open_video_writer, release_writer
+from app.services.rendering import index_tracks, render_tracks
+from app.services.trackers import iou_matrix
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Đoạn ngắn hơn số frame này không đáng để tách ra một process riêng
+MIN_CHUNK_FRAMES = 300
+
+# Mean IoU tối thiểu trong vùng chồng lấn để hai track được coi là một
+STITCH_IOU = 0.5
+
+# Số frame chung tối thiểu trong vùng chồng lấn để so khớp hai track
+STITCH_MIN_FRAMES = 3
+
+# Tỷ lệ tiến trình dành cho bước phát hiện (phần còn lại là vẽ và ghép video)
+DETECT_PROGRESS = 90
+
+
+def plan_chunks(total_frames, workers, overlap):
+    """Chia [0, total_frames) thành các đoạn (read_start, start, end)
+
+    Mỗi đoạn ghi kết quả cho [start, end) nhưng bắt đầu tracking từ read_start
+    = start - overlap, để tracker của đoạn sau đã xác nhận các track trước khi
+    tới ranh giới và có vùng chồng lấn để nối track ID với đoạn trước.
+    """
+    count = min(workers, total_frames // MIN_CHUNK_FRAMES)
+    if count < 2:
+        return []
+    # Vùng chồng lấn không được dài hơn chính đoạn trước nó
+    overlap = min(overlap, total_frames // count - 1)
+    bounds = np.linspace(0, total_frames, count + 1).astype(int)
+    return [(max(0, int(start) - overlap), int(start), int(end))
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _limit_threads(workers):
+    """Chia đều số core cho các process để chúng không tranh nhau thread"""
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _detect_chunk(task):
+    """Chạy trong process con: phát hiện và tracking một đoạn video"""
+    from app.services.detector import ObjectDetector
+
+    index, input_path, read_start, end, backend, opts, workers, progress_queue, previews = task
+    _limit_threads(workers)
+
+    tracker_options = {
+        'embed_reuse_iou': opts['embed_reuse_iou'],
+        'embed_refresh_interval': opts['embed_refresh_interval']
+    }
+    detector = ObjectDetector(backend=backend, tracker=opts['tracker'], tracker_options=tracker_options)
+
+    def on_progress(progress):
+        progress_queue.put((index, progress))
+
+    # output_path=None: không vẽ và mã hóa, video được ghép sau khi nối track ID
+    results = detector.process_video(input_path, None, on_progress, options=opts,
+                                     start_frame=read_start, end_frame=end, previews=previews)
+    # Thumbnail và ô sprite của đoạn này được gộp lại ở process chính
+    results['previews'] = previews
+    return results
+
+
+def _render_chunk(task):
+    """Chạy trong process con: vẽ các track (ID đã nối) lên một đoạn video"""
+    input_path, segment_path, start, end, tracks_by_frame, opts = task
+    return render_tracks(input_path, segment_path, tracks_by_frame, start, end,
+                         opts['encoder_preset'], opts['encoder_crf'])
+
+
+def _wait(futures, progress_queue, weights, progress_callback, scale):
+    """Chờ các process con, gộp tiến trình của từng đoạn thành tiến trình của job"""
+    chunk_progress = [0] * len(futures)
+    total_weight = sum(weights)
+    while not all(future.done() for future in futures):
+        try:
+            index, progress = progress_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        chunk_progress[index] = progress
+        if progress_callback:
+            done = sum(p * w for p, w in zip(chunk_progress, weights)) / total_weight
+            progress_callback(int(done * scale / 100))
+    return [future.result() for future in futures]
+
+
+def _object_type(class_name):
+    """'person', 'animal' hoặc None, giống cách process_video đếm đối tượng"""
+    class_name = class_name.lower()
+    if 'person' in class_name:
+        return 'person'
+    if any(animal in class_name for animal in ['animal', 'dog', 'cat']):
+        return 'animal'
+    return None
+
+
+def _overlap_score(track, other, read_start, start):
+    """Mean IoU của hai track trên các frame chung trong [read_start, start)"""
+    boxes = {p['frame']: p['box'] for p in other['positions'] if read_start <= p['frame'] < start}
+    pairs = [(p['box'], boxes[p['frame']]) for p in track['positions'] if p['frame'] in boxes]
+    if len(pairs) < STITCH_MIN_FRAMES:
+        return 0.0
+    boxes_a = np.array([a for a, _ in pairs], dtype=float)
+    boxes_b = np.array([b for _, b in pairs], dtype=float)
+    return float(np.mean(np.diag(iou_matrix(boxes_a, boxes_b))))
+
+
+def stitch_chunks(chunks, results):
+    """Nối kết quả các đoạn thành một kết quả, track ID là duy nhất trên cả video
+
+    Track của đoạn sau được ghép với track cùng class của đoạn trước có mean IoU
+    lớn nhất trong vùng chồng lấn (greedy, mỗi track chỉ ghép một lần). Vị trí
+    và detection trong vùng chồng lấn chỉ được lấy từ đoạn trước, track chỉ xuất
+    hiện trong vùng chồng lấn bị bỏ, nên một đối tượng không bị đếm hai lần.
+    """
+    all_tracks = {}
+    all_detections = []
+    next_id = 1
+    previous = {}
+
+    for (read_start, start, end), result in zip(chunks, results):
+        local_tracks = result.get('tracks', {})
+
+        # Ghép track ở ranh giới với track của đoạn trước
+        mapping = {}
+        candidates = []
+        for local_id, track in local_tracks.items():
+            for global_id, other in previous.items():
+                if track['class'] != other['class']:
+                    continue
+                score = _overlap_score(track, other, read_start, start)
+                if score >= STITCH_IOU:
+                    candidates.append((score, local_id, global_id))
+        used = set()
+        for score, local_id, global_id in sorted(candidates, reverse=True):
+            if local_id in mapping or global_id in used:
+                continue
+            mapping[local_id] = global_id
+            used.add(global_id)
+
+        current = {}
+        for local_id, track in local_tracks.items():
+            positions = [p for p in track['positions'] if p['frame'] >= start]
+            if not positions:
+                continue
+            global_id = mapping.get(local_id)
+            if global_id is None:
+                global_id = str(next_id)
+                next_id += 1
+                all_tracks[global_id] = {
+                    'class': track['class'],
+                    'first_frame': positions[0]['frame'],
+                    'last_frame': positions[0]['frame'],
+                    'positions': []
+                }
+            merged = all_tracks[global_id]
+            merged['positions'].extend(positions)
+            merged['last_frame'] = positions[-1]['frame']
+            current[global_id] = merged
+
+        all_detections.extend(d for d in result.get('detections', []) if d['frame'] >= start)
+        previous = current
+
+    return all_detections, all_tracks
+
+
+def concat_segments(segment_paths, output_path, fragmented=False):
+    """Ghép các đoạn video đã mã hóa thành một file
+
+    Dùng FFmpeg concat (không mã hóa lại); nếu không được thì đọc lại các
+    đoạn bằng OpenCV và mã hóa lại nối tiếp.
+    """
+    list_path = f"{output_path}.segments.txt"
+    movflags = 'frag_keyframe+empty_moov+default_base_moof' if fragmented else '+faststart'
+    try:
+        with open(list_path, 'w') as f:
+            for path in segment_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        subprocess.run([FFMPEG_BINARY, '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+                        '-c', 'copy', '-movflags', movflags, output_path],
+                       check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return
+    except Exception as e:
+        logger.warning(f"FFmpeg concat failed, joining segments with OpenCV: {str(e)}")
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+    out = None
+    for path in segment_paths:
+        cap = cv2.VideoCapture(path)
+        if out is None:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            out = open_video_writer(output_path, cap.get(cv2.CAP_PROP_FPS), (width, height),
+                                    fragmented=fragmented)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(frame)
+        cap.release()
+    if out is not None:
+        encode_error = release_writer(out)
+        if encode_error is not None:
+            raise RuntimeError(f"Error joining segments into {output_path}: {str(encode_error)}")
+
+
+def process_video_chunked(detector, input_path, output_path, progress_callback, opts, previews=None,
+                          sinks=None):
+    """Xử lý một video dài bằng nhiều process, mỗi process một đoạn
+
+    Mỗi process có detector và tracker riêng. Sau khi nối track ID giữa các
+    đoạn, các đoạn được vẽ song song rồi ghép thành một file. Trả về None nếu
+    video quá ngắn để chia (gọi process_video tuần tự như bình thường).
+    previews nhận thumbnail và ô sprite từ frame gốc mà các đoạn đã giải mã.
+    sinks nhận detections và vị trí track sau khi nối các đoạn (các process con
+    giữ kết quả của đoạn trong bộ nhớ để nối track ID).
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        return None
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if fps <= 0 or np.isnan(fps):
+        fps = 30
+    if previews is not None:
+        previews.start(fps)
+
+    start_time = time.time()
+    # Mỗi process tải một model: không tạo nhiều process hơn số CPU
+    workers = min(opts['chunk_workers'], os.cpu_count() or 1)
+    chunks = plan_chunks(total_frames, workers, opts['chunk_overlap'])
+    if not chunks:
+        return None
+
+    logger.info(f"Processing {total_frames} frames in {len(chunks)} chunks "
+                f"(overlap {chunks[1][1] - chunks[1][0]} frames)")
+    chunk_opts = dict(opts, chunk_workers=1, tracker=opts['tracker'] or detector.tracker.name)
+    weights = [end - read_start for read_start, _, end in chunks]
+    segment_paths = [f"{output_path}.part{i}.mp4" for i in range(len(chunks))]
+
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=len(chunks), mp_context=context) as executor:
+        progress_queue = manager.Queue()
+        futures = [executor.submit(_detect_chunk, (i, input_path, read_start, end, detector.backend,
+                                                   chunk_opts, len(chunks), progress_queue,
+                                                   previews.empty_copy() if previews is not None else None))
+                   for i, (read_start, _, end) in enumerate(chunks)]
+        results = _wait(futures, progress_queue, weights, progress_callback, DETECT_PROGRESS)
+
+        errors = [result['error'] for result in results if 'error' in result]
+        if errors:
+            return {
+                'detections': [],
+                'tracks': {},
+                'person_count': 0,
+                'animal_count': 0,
+                'error': errors[0]
+            }
+
+        all_detections, all_tracks = stitch_chunks(chunks, results)
+        if previews is not None:
+            for result in results:
+                previews.merge(result['previews'])
+        for sink in sinks or []:
+            sink.start(0)
+            sink.write_detections(all_detections)
+            for frame_idx, tracks in sorted(index_tracks(all_tracks).items()):
+                sink.write_tracks(frame_idx, tracks)
+
+        # Vẽ các đoạn song song với track ID đã nối, sau đó ghép thành một file
+        # (bỏ qua khi chỉ cần detections, output_path là None)
+        if output_path is not None:
+            try:
+                list(executor.map(_render_chunk, [
+                    (input_path, segment_paths[i], start, end, index_tracks(all_tracks, start, end), opts)
+                    for i, (_, start, end) in enumerate(chunks)]))
+                concat_segments(segment_paths, output_path, opts['fragmented_mp4'])
+            finally:
+                for path in segment_paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    if progress_callback:
+        progress_callback(100)
+
+    person_count = sum(1 for track in all_tracks.values() if _object_type(track['class']) == 'person')
+    animal_count = sum(1 for track in all_tracks.values() if _object_type(track['class']) == 'animal')
+    processed_frames = sum(end - start for _, start, end in chunks)
+    processing_time = time.time() - start_time
+
+    logger.info(f"Chunked processing completed: {person_count} people, {animal_count} animals, "
+                f"{len(all_tracks)} total tracks")
+
+    return {
+        'detections': all_detections,
+        'tracks': all_tracks,
+        'person_count': person_count,
+        'animal_count': animal_count,
+        'total_tracks': len(all_tracks),
+        'total_frames': processed_frames,
+        'resolution': results[0]['resolution'],
+        'fps': fps,
+        'duration': processed_frames / fps if fps > 0 else 0,
+        'backend': results[0]['backend'],
+        'tracker': results[0]['tracker'],
+        'tracker_stats': [result['tracker_stats'] for result in results],
+        'batch_size': results[0]['batch_size'],
+        'detected_frames': sum(result['detected_frames'] for result in results),
+        'skipped_frames': sum(result['skipped_frames'] for result in results),
+        'processing_time': processing_time,
+        'processing_fps': processed_frames / processing_time if processing_time > 0 else 0,
+        'chunks': len(chunks)
+    }
@@ -3,118 +3,287 @@ import numpy as np
 import os
 import time
 import logging
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
-import subprocess
+
+from app.services.backends import DEFAULT_MODEL_PATH, load_model
+from app.services.chunking import concat_segments, process_video_chunked
+from app.services.encoder import open_video_writer, release_writer
+from app.services.rendering import draw_tracks
+from app.services.options import resolve_options
+from app.services.pipeline import FrameReader, FrameWriter
+from app.services.stride import AdaptiveStride
+from app.services.motion import MotionGate
+from app.services.tiling import Tiler
+from app.services.roi import RegionFilter
+from app.services.sinks import MemorySink
+from app.services.trackers import create_tracker
 
 # Thiết lập logging
 logger = logging.getLogger(__name__)
 
 class ObjectDetector:
-    def __init__(self):
-        """Khởi tạo detector với mô hình YOLOv8 và DeepSORT tracker"""
+    def __init__(self, backend='pytorch', tracker='deepsort', model=None, tracker_options=None):
+        """Khởi tạo detector với mô hình YOLOv8 và tracker (mặc định DeepSORT)
+
+        backend: 'pytorch', 'onnx', 'onnx-int8' hoặc 'openvino' (xem app.services.backends)
+        tracker: 'deepsort' hoặc 'iou' (xem app.services.trackers)
+        model: model YOLOv8 đã được tải sẵn (wrapper của một slot trong DetectorPool, dùng chung trọng số)
+        tracker_options: tham số embed_reuse_iou/embed_refresh_interval cho tracker
+        
+        Tracker giữ trạng thái của một video, nên mỗi job cần một instance riêng.
+        """
         # Đường dẫn đến model
-        model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 
-                                 'model', 'best.pt')
+        model_path = DEFAULT_MODEL_PATH
+        
+        self.backend = backend
+        
+        # Bộ lọc chuyển động và chế độ tile (được bật theo từng job trong process_video)
+        self.motion_gate = None
+        self.tiler = None
+        
+        # Cài đặt suy luận của job: class, ngưỡng tin cậy, kích thước ảnh và ROI
+        self.predict_args = {}
+        self.region_filter = None
         
         try:
-            # Tải model YOLOv8
-            logger.info(f"Loading YOLOv8 model from: {model_path}")
-            self.model = YOLO(model_path)
-            logger.info(f"Model loaded successfully: {model_path}")
-            
-            # Khởi tạo DeepSORT tracker
-            self.tracker = DeepSort(max_age=30, 
-                                   n_init=3, 
-                                   nn_budget=100,
-                                   embedder_gpu=False,
-                                   embedder_model_name='mobilenetv2_x1_0')
-            logger.info("DeepSORT tracker initialized")
+            if model is not None:
+                # Dùng model đã được tải sẵn
+                self.model = model
+            else:
+                # Tải model YOLOv8
+                logger.info(f"Loading YOLOv8 model from: {model_path} (backend: {backend})")
+                self.model, self.backend = load_model(model_path, backend)
+                logger.info(f"Model loaded successfully: {model_path} (backend: {self.backend})")
+            
+            # Khởi tạo tracker
+            tracker_options = tracker_options or {}
+            self.tracker = create_tracker(tracker, **tracker_options)
+            self.tracker_config = self._tracker_config(tracker, tracker_options)
+            logger.info(f"{self.tracker.name} tracker initialized")
             
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}", exc_info=True)
             self.model = None
             self.tracker = None
 
+    @staticmethod
+    def _tracker_config(tracker, tracker_options):
+        """Cấu hình tracker dùng để so sánh với tham số của job"""
+        return ((tracker or 'deepsort').lower(),
+                tracker_options.get('embed_reuse_iou'),
+                tracker_options.get('embed_refresh_interval', 10))
+
+    def _predict_args(self, opts):
+        """Tham số truyền vào model từ cài đặt của job (classes, conf, imgsz)"""
+        args = {}
+        if opts['classes']:
+            # Model chỉ giữ các class được chọn nên NMS và tracker có ít box hơn
+            class_ids = {name.lower(): cls_id for cls_id, name in self.model.names.items()}
+            unknown = [name for name in opts['classes'] if name.lower() not in class_ids]
+            if unknown:
+                logger.warning(f"Ignoring classes unknown to the model: {', '.join(unknown)}")
+            selected = [class_ids[name.lower()] for name in opts['classes'] if name.lower() in class_ids]
+            if not selected:
+                raise ValueError(f"None of the requested classes are known to the model: "
+                                 f"{', '.join(opts['classes'])}")
+            args['classes'] = selected
+        if opts['conf'] is not None:
+            args['conf'] = opts['conf']
+        if opts['imgsz'] is not None:
+            args['imgsz'] = opts['imgsz']
+        return args
+
+    def _predict(self, images):
+        """Gọi model YOLOv8 với cài đặt suy luận của job"""
+        return self.model(images, verbose=False, **self.predict_args)
+
+    def _detect_batch(self, frames, frame_indices):
+        """Chạy YOLOv8 trên nhiều frame trong một lần gọi model"""
+        if not frames:
+            return []
+        results = self._predict(frames)
+        return [self._parse_result(result, frame_idx) for result, frame_idx in zip(results, frame_indices)]
+
+    def _detect_tiled(self, frame, frame_idx):
+        """Chạy YOLOv8 trên các tile chồng lấn của frame trong một lần gọi model
+
+        Box của các tile được dịch về tọa độ frame và gộp bằng NMS giữa các tile
+        trước khi đưa vào tracker.
+        """
+        images, offsets = self.tiler.split(frame)
+        results = self._predict(images)
+        
+        boxes, confs, cls_ids, sources = [], [], [], []
+        for source, (result, (x, y)) in enumerate(zip(results, offsets)):
+            if len(result.boxes) == 0:
+                continue
+            boxes.append(result.boxes.xyxy.cpu().numpy() + np.array([x, y, x, y]))
+            confs.append(result.boxes.conf.cpu().numpy())
+            cls_ids.append(result.boxes.cls.cpu().numpy().astype(int))
+            sources.append(np.full(len(result.boxes), source))
+        if not boxes:
+            return [], []
+        
+        boxes, confs, cls_ids = np.concatenate(boxes), np.concatenate(confs), np.concatenate(cls_ids)
+        keep = self.tiler.merge(boxes, confs, cls_ids, np.concatenate(sources), images, offsets,
+                                (frame.shape[1], frame.shape[0]))
+        return self._build_detections(boxes[keep], confs[keep], cls_ids[keep], frame_idx, frame.shape)
+
+    def _detect_frames(self, frames, frame_indices):
+        """Chạy YOLOv8 cho các frame, dùng tile cho các frame được Tiler chọn"""
+        tiled = [self.tiler is not None and self.tiler.should_tile() for _ in frames]
+        plain = [k for k, use_tiles in enumerate(tiled) if not use_tiles]
+        
+        results = [None] * len(frames)
+        for k, result in zip(plain, self._detect_batch([frames[k] for k in plain],
+                                                       [frame_indices[k] for k in plain])):
+            results[k] = result
+        for k, use_tiles in enumerate(tiled):
+            if use_tiles:
+                results[k] = self._detect_tiled(frames[k], frame_indices[k])
+        return results
+
+    def _parse_result(self, result, frame_idx):
+        """Chuyển kết quả YOLOv8 thành detections cho tracker và detection_results"""
+        if len(result.boxes) == 0:
+            return [], []
+        return self._build_detections(result.boxes.xyxy.cpu().numpy(),
+                                      result.boxes.conf.cpu().numpy(),
+                                      result.boxes.cls.cpu().numpy().astype(int),
+                                      frame_idx, result.orig_shape)
+
+    def _build_detections(self, boxes, confs, cls_ids, frame_idx, frame_shape):
+        """Tạo detections cho tracker và detection_results từ các mảng box, score, class"""
+        # Bỏ các detection nằm ngoài ROI trước khi đưa vào tracker
+        if self.region_filter is not None:
+            inside = self.region_filter.contains(boxes, frame_shape[1], frame_shape[0])
+            boxes, confs, cls_ids = boxes[inside], confs[inside], cls_ids[inside]
+        
+        # Tạo danh sách detections cho tracker
+        detections = []
+        detection_results = []
+        
+        # Xử lý các bounding boxes
+        for box, conf, cls_id in zip(boxes, confs, cls_ids):
+            # Lấy tọa độ bounding box
+            x1, y1, x2, y2 = (int(v) for v in box)
+            
+            # Lấy độ tin cậy
+            conf = float(conf)
+            
+            # Lấy class ID và tên
+            cls_name = self.model.names[int(cls_id)]
+            
+            # Thêm vào danh sách detections cho tracker
+            detections.append(([x1, y1, x2, y2], conf, cls_name))
+            
+            # Lưu kết quả detection
+            detection_results.append({
+                'frame': frame_idx,
+                'class': cls_name,
+                'confidence': conf,
+                'box': [x1, y1, x2, y2]
+            })
+        
+        return detections, detection_results
+
+    def _track(self, frame, detections, frame_idx, prepared=None):
+        """Cập nhật tracker với các detections mới và trả về các track đã xác nhận"""
+        tracks = self.tracker.update(detections, frame=frame, prepared=prepared)
+        return self._collect_tracks(tracks, frame_idx)
+
+    def _predict_tracks(self, frame_idx):
+        """Dự đoán vị trí các track bằng Kalman filter cho frame không chạy YOLO"""
+        self.tracker.predict()
+        return self._collect_tracks(self.tracker.tracks, frame_idx)
+
+    def _has_confirmed_tracks(self):
+        """Kiểm tra tracker còn track đã xác nhận hay không"""
+        return any(track.is_confirmed() for track in self.tracker.tracks)
+
+    def _should_skip(self, frame, pending_detections=False):
+        """Bỏ qua YOLO khi frame tĩnh và không có track nào đang được theo dõi
+
+        pending_detections: đã có frame trước đó (trong cùng batch) được chọn chạy YOLO
+        nhưng chưa được đưa vào tracker, nên tracker có thể sắp có track đã xác nhận.
+        """
+        if self.motion_gate is None:
+            return False
+        # Luôn kiểm tra chuyển động để frame tham chiếu được cập nhật
+        has_motion = self.motion_gate.has_motion(frame)
+        return not has_motion and not pending_detections and not self._has_confirmed_tracks()
+
+    def _collect_tracks(self, tracks, frame_idx):
+        """Trả về thông tin các track đã xác nhận"""
+        track_results = []
+        
+        for track in tracks:
+            if not track.is_confirmed():
+                continue
+            
+            track_id = track.track_id
+            ltrb = track.to_ltrb()
+            x1, y1, x2, y2 = map(int, ltrb)
+            
+            # Lấy class name từ track
+            class_name = track.get_det_class()
+            if not class_name:
+                continue  # Skip tracks without class information
+            
+            # Lưu thông tin track
+            track_results.append({
+                'track_id': track_id,
+                'class': class_name,
+                'frame': frame_idx,
+                'box': [x1, y1, x2, y2]
+            })
+        
+        return track_results
+
+    def _draw_tracks(self, frame, track_results):
+        """Vẽ các bounding boxes và track IDs lên frame"""
+        return draw_tracks(frame, track_results)
+
+    def _record_tracks(self, tracks, frame_idx, all_tracks, person_tracks, animal_tracks):
+        """Cập nhật thông tin (class, frame đầu/cuối) của các track trong một frame
+
+        Vị trí từng frame không được giữ ở đây mà được đưa vào các ResultSink.
+        """
+        for track in tracks:
+            track_id = track['track_id']
+            class_name = track['class'].lower()
+            
+            # Lưu ID của track theo loại
+            if 'person' in class_name:
+                person_tracks.add(track_id)
+            elif any(animal in class_name for animal in ['animal', 'dog', 'cat']):
+                animal_tracks.add(track_id)
+            
+            # Lưu hoặc cập nhật thông tin track
+            if track_id not in all_tracks:
+                all_tracks[track_id] = {
+                    'class': track['class'],
+                    'first_frame': frame_idx,
+                    'last_frame': frame_idx
+                }
+            else:
+                all_tracks[track_id]['last_frame'] = frame_idx
+
     def process_frame(self, frame, frame_idx=0):
         """Xử lý một frame và trả về kết quả phát hiện và tracking"""
         if self.model is None or self.tracker is None:
             return frame, [], []  # Trả về frame gốc nếu model không tồn tại
         
         try:
+            # Frame tĩnh và không có track: dùng lại kết quả rỗng thay vì chạy YOLO
+            if self._should_skip(frame):
+                return frame, [], []
+            
             # Thực hiện phát hiện đối tượng với YOLOv8
-            results = self.model(frame, verbose=False)
-            result = results[0]  # Lấy kết quả đầu tiên
-            
-            # Tạo danh sách detections cho DeepSORT
-            detections = []
-            detection_results = []
-            
-            # Xử lý các bounding boxes
-            if len(result.boxes) > 0:
-                for box in result.boxes:
-                    # Lấy tọa độ bounding box
-                    x1, y1, x2, y2 = map(float, box.xyxy[0])
-                    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                    
-                    # Lấy độ tin cậy
-                    conf = float(box.conf[0])
-                    
-                    # Lấy class ID và tên
-                    cls_id = int(box.cls[0])
-                    cls_name = self.model.names[cls_id]
-                    
-                    # Thêm vào danh sách detections cho DeepSORT
-                    detections.append(([x1, y1, x2, y2], conf, cls_name))
-                    
-                    # Lưu kết quả detection
-                    detection_results.append({
-                        'frame': frame_idx,
-                        'class': cls_name,
-                        'confidence': conf,
-                        'box': [x1, y1, x2, y2]
-                    })
-            
-            # Cập nhật tracker với các detections mới
-            tracks = self.tracker.update_tracks(detections, frame=frame)
-            track_results = []
-            
-            # Vẽ các bounding boxes và track IDs lên frame
-            for track in tracks:
-                if not track.is_confirmed():
-                    continue
-                
-                track_id = track.track_id
-                ltrb = track.to_ltrb()
-                x1, y1, x2, y2 = map(int, ltrb)
-                
-                # Lấy class name từ track
-                class_name = track.get_det_class()
-                if not class_name:
-                    continue  # Skip tracks without class information
-                
-                # Màu dựa vào loại đối tượng
-                if 'person' in class_name.lower():
-                    color = (0, 0, 255)  # Red for people
-                elif any(animal in class_name.lower() for animal in ['animal', 'dog', 'cat']):
-                    color = (0, 255, 0)  # Green for animals
-                else:
-                    color = (255, 0, 0)  # Blue for other objects
-                
-                # Vẽ bounding box
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                
-                # Thêm text với ID
-                label = f"{class_name}: {track_id}"
-                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                
-                # Lưu thông tin track
-                track_results.append({
-                    'track_id': track_id,
-                    'class': class_name,
-                    'frame': frame_idx,
-                    'box': [x1, y1, x2, y2]
-                })
+            (detections, detection_results), = self._detect_frames([frame], [frame_idx])
+            
+            # Cập nhật tracker và vẽ kết quả lên frame
+            track_results = self._track(frame, detections, frame_idx)
+            self._draw_tracks(frame, track_results)
             
             return frame, detection_results, track_results
             
@@ -122,8 +291,40 @@ class ObjectDetector:
             logger.error(f"Error in process_frame: {str(e)}", exc_info=True)
             return frame, [], []
 
-    def process_video(self, input_path, output_path, progress_callback=None):
-        """Xử lý video và trả về kết quả phát hiện và tracking"""
+    def process_video(self, input_path, output_path, progress_callback=None, options=None,
+                      start_frame=0, end_frame=None, checkpoint=None, previews=None,
+                      sinks=None):
+        """Xử lý video và trả về kết quả phát hiện và tracking
+
+        options: tham số xử lý của job (xem app.services.options), ví dụ
+        batch_size là số frame được đưa vào YOLO trong một lần gọi, pipeline
+        bật thread giải mã/mã hóa riêng với queue dài queue_size, detect_stride
+        và adaptive_stride chỉ chạy YOLO mỗi k frame, motion_gate bỏ qua YOLO cho
+        các frame tĩnh, tracker chọn tracker ('deepsort' hoặc 'iou'), embed_reuse_iou
+        và embed_refresh_interval điều khiển việc dùng lại embedding của DeepSORT,
+        chunk_workers > 1 chia video thành nhiều đoạn xử lý song song, tile_size > 0
+        chạy YOLO trên các tile chồng lấn (tile_overlap) mỗi tile_interval lần phát hiện,
+        roi, classes, conf và imgsz giới hạn vùng, class, ngưỡng tin cậy và kích thước
+        ảnh của YOLO.
+
+        start_frame/end_frame giới hạn đoạn frame được xử lý. Khi output_path là
+        None, video kết quả không được vẽ và mã hóa, chỉ trả về detections và tracks
+        (dùng cho các đoạn xử lý song song, xem app.services.chunking).
+
+        checkpoint: app.services.checkpoint.Checkpoint của job. Trạng thái được lưu
+        định kỳ và job tiếp tục từ checkpoint cuối cùng nếu có.
+
+        previews: app.services.previews.PreviewCollector nhận các frame (đã vẽ
+        overlay nếu có video kết quả) để tạo thumbnail và sprite sheet trong cùng
+        một lần giải mã.
+
+        sinks: danh sách app.services.sinks.ResultSink nhận detections và vị trí
+        track của từng frame (ví dụ ghi database theo batch, ghi file tracking),
+        nên bộ nhớ không tăng theo độ dài video. Khi đó 'tracks' trong kết quả chỉ
+        có class, first_frame, last_frame và 'detections' rỗng. Không có sink nào
+        thì kết quả được giữ trong bộ nhớ (MemorySink) và trả về đầy đủ như trước.
+        """
+        opts = resolve_options(options)
         if self.model is None or self.tracker is None:
             logger.error("No model loaded for video processing")
             return {
@@ -133,8 +334,15 @@ class ObjectDetector:
                 'animal_count': 0,
                 'error': 'Model not loaded'
             }
-            
+        
         try:
+            # Video dài: chia thành nhiều đoạn và xử lý song song trong các process riêng
+            if opts['chunk_workers'] > 1 and end_frame is None:
+                results = process_video_chunked(self, input_path, output_path, progress_callback, opts,
+                                                previews, sinks)
+                if results is not None:
+                    return results
+            
             cap = cv2.VideoCapture(input_path)
             if not cap.isOpened():
                 logger.error(f"Error opening video file: {input_path}")
@@ -156,122 +364,272 @@ class ObjectDetector:
             if fps <= 0 or np.isnan(fps):
                 logger.warning("Invalid FPS detected, setting to default 30fps")
                 fps = 30
+            if previews is not None:
+                previews.start(fps)
             
-            # Chọn codec phù hợp
-            if os.name == 'nt':  # Windows
-                fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                temp_output_path = output_path.replace('.mp4', '.avi')
-                out = cv2.VideoWriter(temp_output_path, fourcc, fps, (width, height))
-            else:  # Linux/Mac
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-            
-            if not out.isOpened():
-                logger.error(f"Failed to create VideoWriter for: {output_path}")
-                return {
-                    'detections': [],
-                    'tracks': {},
-                    'person_count': 0,
-                    'animal_count': 0,
-                    'error': 'Failed to create output video'
-                }
+            # Chỉ xử lý đoạn [start_frame, end_frame) nếu được yêu cầu
+            if end_frame is not None and total_frames > 0:
+                end_frame = min(end_frame, total_frames)
+            if start_frame > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            span_frames = (end_frame if end_frame is not None else total_frames) - start_frame
+            
+            # Video kết quả được mã hóa H.264 bằng FFmpeg qua stdin (xem app.services.encoder)
+            def open_output(path):
+                return open_video_writer(path, fps, (width, height), opts['encoder_preset'],
+                                         opts['encoder_crf'], opts['fragmented_mp4'])
+            
+            # Không có sink: giữ toàn bộ kết quả trong bộ nhớ để trả về
+            memory = None
+            if sinks is None:
+                memory = MemorySink()
+                sinks = [memory]
             
-            frame_count = 0
-            all_detections = []
+            frame_count = start_frame
             all_tracks = {}
             person_tracks = set()
             animal_tracks = set()
+            batch_size = max(1, int(opts['batch_size']))
+            detected_frames = 0
+            skipped_frames = 0
+            start_time = time.time()
             
-            # Xử lý từng frame
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                # In frame count mỗi 100 frame
-                if frame_count % 100 == 0:
-                    logger.info(f"Processing frame {frame_count}/{total_frames}")
+            # Tạo lại tracker nếu job chọn tracker hoặc tham số embedding khác
+            tracker_name = opts['tracker'] or self.tracker.name
+            tracker_options = {
+                'embed_reuse_iou': opts['embed_reuse_iou'],
+                'embed_refresh_interval': opts['embed_refresh_interval']
+            }
+            tracker_config = self._tracker_config(tracker_name, tracker_options)
+            if tracker_config != self.tracker_config:
+                self.tracker = create_tracker(tracker_name, **tracker_options)
+                self.tracker_config = tracker_config
+                logger.info(f"Using {self.tracker.name} tracker for this job")
+            
+            # Tiếp tục từ checkpoint (nếu có) thay vì xử lý lại từ đầu
+            segments = []
+            if checkpoint is not None:
+                state = checkpoint.load()
+                if (state is not None and state['tracker'] == self.tracker.name
+                        and len(state.get('sinks', [])) == len(sinks)):
+                    frame_count = state['frame_index']
+                    all_tracks = state['tracks']
+                    for sink, sink_state in zip(sinks, state['sinks']):
+                        sink.set_state(sink_state)
+                    person_tracks = state['person_tracks']
+                    animal_tracks = state['animal_tracks']
+                    detected_frames = state['detected_frames']
+                    skipped_frames = state['skipped_frames']
+                    start_time -= state['processing_time']
+                    segments = state['segments']
+                    if previews is not None and state.get('previews') is not None:
+                        previews.merge(state['previews'])
+                    self.tracker.set_state(state['tracker_state'])
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+                    logger.info(f"Resuming from checkpoint at frame {frame_count}")
+            
+            # Bỏ các kết quả đã ghi từ frame bắt đầu trở đi (ghi trước khi job bị gián đoạn)
+            for sink in sinks:
+                sink.start(frame_count)
+            
+            # Tạo video kết quả (không tạo khi output_path là None). Khi có checkpoint,
+            # video được ghi thành nhiều đoạn và ghép lại khi xử lý xong
+            out = None
+            if output_path is not None:
+                segment_path = output_path
+                if checkpoint is not None:
+                    segment_path = checkpoint.segment_path(len(segments), '.mp4')
+                out = open_output(segment_path)
                 
-                # Xử lý frame
-                try:
-                    processed_frame, detections, tracks = self.process_frame(frame, frame_count)
+                if not out.isOpened():
+                    out.release()
+                    logger.error(f"Failed to create VideoWriter for: {output_path}")
+                    return {
+                        'detections': [],
+                        'tracks': {},
+                        'person_count': 0,
+                        'animal_count': 0,
+                        'error': 'Failed to create output video'
+                    }
+            
+            # Chỉ chạy YOLO mỗi k frame (k = 1 nghĩa là mọi frame)
+            stride = AdaptiveStride(opts['detect_stride'], opts['adaptive_stride'], opts['max_stride'])
+            
+            # Bỏ qua YOLO cho các frame tĩnh khi không có track nào
+            self.motion_gate = None
+            if opts['motion_gate']:
+                self.motion_gate = MotionGate(opts['motion_threshold'],
+                                              opts['motion_pixel_threshold'],
+                                              opts['motion_method'])
+            
+            # Cài đặt suy luận và ROI của job
+            self.predict_args = self._predict_args(opts)
+            self.region_filter = RegionFilter(opts['roi']) if opts['roi'] else None
+            
+            # Chia frame độ phân giải cao thành các tile chồng lấn (mỗi tile_interval lần phát hiện)
+            self.tiler = None
+            if opts['tile_size'] > 0:
+                self.tiler = Tiler(opts['tile_size'], opts['tile_overlap'], opts['tile_interval'])
+            
+            # Pipeline: thread giải mã -> suy luận/tracking (thread hiện tại) -> thread mã hóa,
+            # nối với nhau bằng các queue có giới hạn
+            reader = FrameReader(cap, opts['queue_size'], threaded=opts['pipeline']).start()
+            writer = None
+            if out is not None:
+                writer = FrameWriter(out, opts['queue_size'], threaded=opts['pipeline']).start()
+            
+            try:
+                # Xử lý video theo từng batch frame
+                while True:
+                    # Khi bật stride, đọc đủ frame để có khoảng batch_size frame cần chạy YOLO
+                    read_size = batch_size * stride.stride
+                    if end_frame is not None:
+                        read_size = min(read_size, end_frame - frame_count)
+                    frames = reader.read_batch(read_size) if read_size > 0 else []
+                    if not frames:
+                        break
                     
-                    # Lưu các detections
-                    all_detections.extend(detections)
+                    # Chọn các frame sẽ chạy YOLO, các frame còn lại được tracker nội suy.
+                    # Tracker chỉ được cập nhật sau khi chọn xong cả batch, nên sau frame
+                    # chạy YOLO đầu tiên của batch, các frame tĩnh không bị bỏ qua nữa
+                    # (frame đó có thể tạo ra track đã xác nhận)
+                    detect_positions = []
+                    for i, frame in enumerate(frames):
+                        if not stride.should_detect(frame_count + i):
+                            continue
+                        if self._should_skip(frame, pending_detections=bool(detect_positions)):
+                            skipped_frames += 1
+                            continue
+                        detect_positions.append(i)
                     
-                    # Lưu và cập nhật các tracks
-                    for track in tracks:
-                        track_id = track['track_id']
-                        class_name = track['class'].lower()
-                        
-                        # Lưu ID của track theo loại
-                        if 'person' in class_name:
-                            person_tracks.add(track_id)
-                        elif any(animal in class_name for animal in ['animal', 'dog', 'cat']):
-                            animal_tracks.add(track_id)
+                    # Phát hiện đối tượng cho cả batch trong một lần gọi YOLO
+                    try:
+                        batch_detections = dict(zip(detect_positions, self._detect_frames(
+                            [frames[i] for i in detect_positions],
+                            [frame_count + i for i in detect_positions])))
                         
-                        # Lưu hoặc cập nhật thông tin track
-                        if track_id not in all_tracks:
-                            all_tracks[track_id] = {
-                                'class': track['class'],
-                                'first_frame': frame_count,
-                                'last_frame': frame_count,
-                                'positions': [{'frame': frame_count, 'box': track['box']}]
-                            }
-                        else:
-                            all_tracks[track_id]['last_frame'] = frame_count
-                            all_tracks[track_id]['positions'].append({
-                                'frame': frame_count, 
-                                'box': track['box']
-                            })
+                        # Chuẩn bị dữ liệu cho tracker (ví dụ embedding DeepSORT) cho cả batch
+                        prepared = self.tracker.prepare_batch(
+                            [frames[i] for i in detect_positions],
+                            [batch_detections[i][0] for i in detect_positions])
+                        if prepared is not None:
+                            prepared = dict(zip(detect_positions, prepared))
+                    except Exception as e:
+                        # Lỗi của model/backend, không phải của một frame: job phải thất bại
+                        # thay vì ghi frame gốc cho cả batch và báo hoàn thành
+                        raise RuntimeError(f"Detection failed at frame {frame_count}: {str(e)}") from e
                     
-                    # Lưu frame đã xử lý
-                    out.write(processed_frame)
+                    # Đưa kết quả vào tracker theo đúng thứ tự frame
+                    for i, frame in enumerate(frames):
+                        # In frame count mỗi 100 frame
+                        if frame_count % 100 == 0:
+                            logger.info(f"Processing frame {frame_count}/{total_frames}")
+                        
+                        try:
+                            if i in batch_detections:
+                                detections, detection_results = batch_detections[i]
+                                tracks = self._track(frame, detections, frame_count,
+                                                     prepared[i] if prepared is not None else None)
+                                stride.observe(tracks, frame_count)
+                                detected_frames += 1
+                            else:
+                                # Frame không chạy YOLO (do stride hoặc frame tĩnh): box được
+                                # nội suy bằng dự đoán Kalman
+                                detection_results = []
+                                tracks = self._predict_tracks(frame_count)
+                            
+                            # Đưa detections và tracks của frame vào các sink
+                            for sink in sinks:
+                                sink.write_detections(detection_results)
+                                sink.write_tracks(frame_count, tracks)
+                            self._record_tracks(tracks, frame_count, all_tracks, person_tracks, animal_tracks)
+                            
+                            # Lưu frame đã xử lý
+                            if writer is not None:
+                                writer.write(self._draw_tracks(frame, tracks))
+                            
+                        except Exception as e:
+                            logger.error(f"Error processing frame {frame_count}: {str(e)}")
+                            # Lỗi tracking/vẽ của riêng frame này: ghi lại frame gốc
+                            if writer is not None:
+                                writer.write(frame)
+                        
+                        # Thumbnail và sprite sheet từ frame đang có trong bộ nhớ
+                        if previews is not None:
+                            previews.observe(frame_count, frame)
+                        
+                        # Cập nhật tiến trình
+                        frame_count += 1
+                        if progress_callback and span_frames > 0:
+                            progress = int(((frame_count - start_frame) / span_frames) * 100)
+                            progress_callback(progress)
                     
-                except Exception as e:
-                    logger.error(f"Error processing frame {frame_count}: {str(e)}")
-                    # Ghi lại frame gốc nếu có lỗi
-                    try:
-                        out.write(frame)
-                    except:
-                        pass
-                
-                # Cập nhật tiến trình
-                frame_count += 1
-                if progress_callback and total_frames > 0:
-                    progress = int((frame_count / total_frames) * 100)
-                    progress_callback(progress)
+                    # Lưu checkpoint định kỳ: đóng đoạn video hiện tại rồi lưu trạng thái
+                    if checkpoint is not None and checkpoint.due(frame_count):
+                        if writer is not None:
+                            writer.close()
+                            encode_error = release_writer(out)
+                            if writer.error is not None or encode_error is not None:
+                                raise RuntimeError(f"Error encoding output video: "
+                                                   f"{str(encode_error or writer.error)}")
+                            segments.append(segment_path)
+                        checkpoint.save({
+                            'frame_index': frame_count,
+                            'tracks': all_tracks,
+                            'sinks': [sink.get_state() for sink in sinks],
+                            'person_tracks': person_tracks,
+                            'animal_tracks': animal_tracks,
+                            'detected_frames': detected_frames,
+                            'skipped_frames': skipped_frames,
+                            'processing_time': time.time() - start_time,
+                            'segments': segments,
+                            'previews': previews,
+                            'tracker': self.tracker.name,
+                            'tracker_state': self.tracker.get_state()
+                        })
+                        if writer is not None:
+                            segment_path = checkpoint.segment_path(len(segments), '.mp4')
+                            out = open_output(segment_path)
+                            writer = FrameWriter(out, opts['queue_size'], threaded=opts['pipeline']).start()
+            finally:
+                # Dừng thread giải mã và chờ encoder ghi hết frame
+                reader.stop()
+                if writer is not None:
+                    writer.close()
             
-            # Giải phóng resources
+            # Giải phóng resources; FFmpeg báo lỗi mã hóa khi writer được đóng
             cap.release()
-            out.release()
-            
-            # Nếu là Windows, chuyển đổi từ AVI sang MP4
-            if os.name == 'nt' and os.path.exists(temp_output_path):
-                try:
-                    # Thử chuyển đổi với FFmpeg
-                    logger.info(f"Converting {temp_output_path} to {output_path} using FFmpeg")
-                    ffmpeg_cmd = [
-                        'ffmpeg', '-y', '-i', temp_output_path, 
-                        '-c:v', 'libx264', '-preset', 'fast', 
-                        '-crf', '22', '-pix_fmt', 'yuv420p', output_path
-                    ]
-                    
-                    subprocess.run(ffmpeg_cmd, check=True, 
-                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    
-                    # Xóa file AVI nếu chuyển đổi thành công
-                    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                        os.remove(temp_output_path)
-                        logger.info(f"Conversion successful, deleted AVI file")
-                    else:
-                        logger.warning(f"MP4 conversion failed, using AVI file")
-                        os.rename(temp_output_path, output_path)
-                except Exception as e:
-                    logger.error(f"Error converting video: {str(e)}")
-                    if os.path.exists(temp_output_path):
-                        os.rename(temp_output_path, output_path)
-                    
+            encode_error = release_writer(out) if out is not None else None
+            
+            # Lỗi giải mã hoặc mã hóa: video kết quả bị thiếu frame, job phải thất bại
+            errors = [reader.error, writer.error if writer is not None else None, encode_error]
+            pipeline_error = next((error for error in errors if error is not None), None)
+            if pipeline_error is not None:
+                logger.error(f"Video pipeline failed at frame {frame_count}: {str(pipeline_error)}")
+                return {
+                    'detections': [],
+                    'tracks': {},
+                    'person_count': 0,
+                    'animal_count': 0,
+                    'error': f"Video pipeline failed: {str(pipeline_error)}"
+                }
+            
+            # Tốc độ xử lý (frame/giây) để so sánh giữa các batch_size
+            processing_time = time.time() - start_time
+            processed_frames = frame_count - start_frame
+            processing_fps = processed_frames / processing_time if processing_time > 0 else 0
+            logger.info(f"Processed {processed_frames} frames in {processing_time:.2f}s "
+                        f"({processing_fps:.2f} fps, batch_size={batch_size}, "
+                        f"YOLO on {detected_frames} frames, {skipped_frames} static frames skipped)")
+            
+            # Ghép các đoạn video đã ghi (kể cả các đoạn trước khi job được tiếp tục)
+            if out is not None and checkpoint is not None:
+                segments.append(segment_path)
+                concat_segments(segments, output_path, opts['fragmented_mp4'])
+                for path in segments:
+                    if os.path.exists(path):
+                        os.remove(path)
+            
             # Số lượng người và động vật dựa trên số track duy nhất
             person_count = len(person_tracks)
             animal_count = len(animal_tracks)
@@ -279,15 +637,23 @@ class ObjectDetector:
             logger.info(f"Video processing completed: {person_count} people, {animal_count} animals, {len(all_tracks)} total tracks")
             
             return {
-                'detections': all_detections,
-                'tracks': all_tracks,
+                'detections': memory.detections if memory is not None else [],
+                'tracks': memory.tracks(all_tracks) if memory is not None else all_tracks,
                 'person_count': person_count,
                 'animal_count': animal_count,
                 'total_tracks': len(all_tracks),
-                'total_frames': frame_count,
+                'total_frames': processed_frames,
                 'resolution': f"{width}x{height}",
                 'fps': fps,
-                'duration': frame_count / fps if fps > 0 else 0
+                'duration': processed_frames / fps if fps > 0 else 0,
+                'backend': self.backend,
+                'tracker': self.tracker.name,
+                'tracker_stats': self.tracker.stats(),
+                'batch_size': batch_size,
+                'detected_frames': detected_frames,
+                'skipped_frames': skipped_frames,
+                'processing_time': processing_time,
+                'processing_fps': processing_fps
             }
             
         except Exception as e:
@@ -0,0 +1,165 @@
+import copy
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.services.backends import DEFAULT_MODEL_PATH, load_model
+from app.services.detector import ObjectDetector
+from app.services.options import resolve_options
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Pool dùng chung cho cả ứng dụng, chỉ được tạo khi có job đầu tiên (hoặc khi warm-up)
+_pool = None
+_pool_lock = threading.Lock()
+
+# Thời gian tải model và warm-up, dùng cho báo cáo khởi động
+_pool_status = {
+    'loaded': False,
+    'load_seconds': None,
+    'warmed_up': False,
+    'warmup_seconds': None,
+    'error': None
+}
+
+
+class DetectorPool:
+    """Pool detector cho nhiều job xử lý song song
+
+    Trọng số YOLOv8 chỉ được tải một lần và dùng chung (chỉ đọc: eval, không
+    tính gradient) giữa các slot. Mỗi slot có wrapper YOLO và predictor riêng
+    (predictor của ultralytics giữ trạng thái nên không thể dùng chung giữa các
+    thread), nên bộ nhớ cho trọng số không tăng theo size. Với ONNX/OpenVINO,
+    predictor của mỗi slot mở session riêng. Mỗi job nhận một ObjectDetector
+    mới với tracker riêng nên track ID không bị lẫn giữa các video. Số job chạy
+    đồng thời bị giới hạn bởi size.
+    """
+
+    def __init__(self, size=2, backend='pytorch', tracker='deepsort'):
+        self.size = max(1, size)
+        self.default_tracker = tracker
+
+        logger.info(f"Loading shared YOLOv8 model for detector pool (size: {self.size}, backend: {backend})")
+        self.model, self.backend = load_model(DEFAULT_MODEL_PATH, backend)
+        if self.backend == 'pytorch':
+            # Fuse một lần trước khi chia sẻ để các predictor không cùng sửa model
+            self.model.fuse()
+            self.model.model.eval()
+            self.model.model.requires_grad_(False)
+
+        self._slots = queue.Queue()
+        for _ in range(self.size):
+            self._slots.put(self._slot_model())
+
+    def _slot_model(self):
+        """Wrapper YOLO riêng cho một slot, tham chiếu cùng nn.Module (không sao chép trọng số)
+
+        overrides và callbacks được sao chép để các slot không sửa trạng thái của
+        nhau. Predictor được tạo ngay bằng một lần suy luận nhỏ (tuần tự, trước
+        khi có job) rồi trỏ về module dùng chung.
+        """
+        slot = copy.copy(self.model)
+        slot.predictor = None
+        slot.overrides = dict(self.model.overrides)
+        slot.callbacks = {event: list(callbacks) for event, callbacks in self.model.callbacks.items()}
+        if self.backend == 'pytorch':
+            slot(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+            self._share_weights(slot)
+        return slot
+
+    def _share_weights(self, slot):
+        """Thay module trong predictor của slot bằng module dùng chung
+
+        Các phiên bản ultralytics mới sao chép model khi tạo predictor; bản sao
+        được bỏ đi để trọng số chỉ có một bản trong bộ nhớ.
+        """
+        from torch import nn
+
+        backend = slot.predictor.model
+        # ultralytics >= 8.4: AutoBackend giữ model trong backend riêng theo định dạng
+        holder = backend.__dict__.get('backend', backend)
+        if isinstance(getattr(holder, 'model', None), nn.Module) and holder.model is not self.model.model:
+            holder.model = self.model.model
+
+    @contextmanager
+    def acquire(self, options=None, timeout=None):
+        """Lấy một detector với tracker mới cho một job
+
+        Raise TimeoutError nếu không có slot rảnh sau timeout giây.
+        """
+        opts = resolve_options(options)
+        try:
+            model = self._slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"All {self.size} detector slots are busy")
+
+        try:
+            yield ObjectDetector(backend=self.backend,
+                                 tracker=opts['tracker'] or self.default_tracker,
+                                 model=model,
+                                 tracker_options={
+                                     'embed_reuse_iou': opts['embed_reuse_iou'],
+                                     'embed_refresh_interval': opts['embed_refresh_interval']
+                                 })
+        finally:
+            self._slots.put(model)
+
+    def warm_up(self):
+        """Chạy một lần suy luận giả để khởi tạo predictor và tracker trước job đầu tiên"""
+        dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
+        with self.acquire() as detector:
+            detector.process_frame(dummy_frame)
+
+
+def get_detector_pool(config):
+    """Trả về pool detector dùng chung, tải model ở lần gọi đầu tiên
+
+    torch, ultralytics và embedder của DeepSORT chỉ được import tại đây nên
+    việc khởi động API không phải chờ tải model. Trả về None nếu tải lỗi.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            start_time = time.time()
+            try:
+                _pool = DetectorPool(size=config['DETECTOR_POOL_SIZE'],
+                                     backend=config['DETECTOR_BACKEND'],
+                                     tracker=config['DEFAULT_TRACKER'])
+                _pool_status.update(loaded=True, load_seconds=time.time() - start_time, error=None)
+                logger.info(f"DetectorPool initialized in {_pool_status['load_seconds']:.2f}s")
+            except Exception as e:
+                logger.error(f"Error initializing DetectorPool: {str(e)}", exc_info=True)
+                _pool_status['error'] = str(e)
+    return _pool
+
+
+def get_pool_status():
+    """Trạng thái tải model của pool (cho /api/status)"""
+    return dict(_pool_status)
+
+
+def start_warmup(config):
+    """Tải model và chạy warm-up trong một thread nền sau khi server khởi động"""
+    def _warm_up():
+        pool = get_detector_pool(config)
+        if pool is None:
+            return
+        start_time = time.time()
+        try:
+            pool.warm_up()
+            _pool_status.update(warmed_up=True, warmup_seconds=time.time() - start_time)
+            logger.info(f"Detector warm-up completed in {_pool_status['warmup_seconds']:.2f}s")
+        except Exception as e:
+            logger.error(f"Error during detector warm-up: {str(e)}", exc_info=True)
+
+    thread = threading.Thread(target=_warm_up, name='detector-warmup', daemon=True)
+    thread.start()
+    return thread
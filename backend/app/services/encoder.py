@@ -0,0 +1,149 @@
+import os
+import uuid
+import shutil
+import logging
+import subprocess
+
+import cv2
+import numpy as np
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Đường dẫn đến FFmpeg (có thể đặt qua biến môi trường khi không nằm trong PATH)
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+
+def ffmpeg_available():
+    """Kiểm tra FFmpeg có sẵn trên máy hay không"""
+    return shutil.which(FFMPEG_BINARY) is not None
+
+
+class FFmpegWriter:
+    """Mã hóa H.264 bằng cách đưa frame BGR thô vào stdin của FFmpeg
+
+    Có cùng giao diện với cv2.VideoWriter (write, isOpened, release) nên dùng
+    được với FrameWriter. File ra là MP4 H.264/yuv420p phát được trực tiếp trên
+    trình duyệt, không cần bước chuyển mã sau khi xử lý. Với fragmented=True,
+    file là fragmented MP4 (moov ở đầu, mỗi keyframe một fragment) nên có thể
+    phát khi đang ghi; nếu không, moov được chuyển lên đầu file (faststart).
+
+    Nếu FFmpeg dừng giữa chừng, write() raise ở frame đầu tiên không ghi được
+    và các frame sau bị bỏ; lỗi (kèm stderr của FFmpeg) được lưu trong error
+    sau release().
+    """
+
+    def __init__(self, path, fps, size, preset='veryfast', crf=23, fragmented=False):
+        width, height = size
+        self.path = path
+        command = [
+            FFMPEG_BINARY, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{width}x{height}", '-r', str(fps),
+            '-i', '-',
+            '-an', '-c:v', 'libx264', '-preset', preset, '-crf', str(crf),
+            # yuv420p cần kích thước chẵn
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p',
+        ]
+        if fragmented:
+            command += ['-movflags', 'frag_keyframe+empty_moov+default_base_moof']
+        else:
+            command += ['-movflags', '+faststart']
+        command.append(path)
+
+        self.error = None
+        self._stderr = open(f"{path}.ffmpeg.log", 'w+b')
+        try:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                             stdout=subprocess.DEVNULL, stderr=self._stderr)
+        except OSError as e:
+            logger.error(f"Could not start FFmpeg: {str(e)}")
+            self.error = e
+            self._process = None
+
+    def isOpened(self):
+        return self._process is not None and self._process.poll() is None
+
+    def write(self, frame):
+        if self.error is not None:
+            raise RuntimeError(f"FFmpeg is not running: {str(self.error)}")
+        # Ghi trực tiếp buffer của frame, không tạo bản sao bytes
+        if not frame.flags['C_CONTIGUOUS']:
+            frame = np.ascontiguousarray(frame)
+        try:
+            self._process.stdin.write(frame.data)
+        except OSError as e:
+            # FFmpeg đã dừng (BrokenPipe): không ghi các frame còn lại
+            self.error = e
+            raise
+
+    def release(self):
+        """Đóng stdin và chờ FFmpeg; trả về False nếu mã hóa lỗi (xem error)"""
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            if self._process.wait() != 0:
+                self._stderr.seek(0)
+                message = self._stderr.read().decode(errors='replace').strip()
+                logger.error(f"FFmpeg exited with code {self._process.returncode}: {message}")
+                self.error = RuntimeError(f"FFmpeg exited with code {self._process.returncode}: {message}")
+            self._process = None
+        if not self._stderr.closed:
+            self._stderr.close()
+            os.remove(self._stderr.name)
+        return self.error is None
+
+
+def release_writer(writer):
+    """Đóng writer của open_video_writer; trả về lỗi mã hóa hoặc None nếu thành công"""
+    writer.release()
+    return getattr(writer, 'error', None)
+
+
+def open_video_writer(path, fps, size, preset='veryfast', crf=23, fragmented=False):
+    """Mở writer cho video kết quả: FFmpeg H.264 nếu có, ngược lại OpenCV mp4v"""
+    if ffmpeg_available():
+        return FFmpegWriter(path, fps, size, preset, crf, fragmented)
+    logger.warning("FFmpeg not found, encoding with OpenCV mp4v (not playable in most browsers)")
+    return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+
+
+def write_hls(input_path, output_dir, segment_seconds=6):
+    """Tạo HLS (index.m3u8 + các segment .ts) từ video bằng stream copy, không mã hóa lại
+
+    Segment được cắt tại keyframe gần nhất nên độ dài thực tế có thể lớn hơn
+    segment_seconds. Playlist và segment được ghi vào một thư mục tạm có tên riêng
+    rồi đổi tên thành output_dir (thay thế HLS cũ nếu có), nên output_dir chỉ xuất
+    hiện khi mọi segment đã sẵn sàng và hai lần tạo đồng thời không ghi đè file của
+    nhau. Trả về đường dẫn playlist hoặc None.
+    """
+    if not ffmpeg_available():
+        logger.warning("FFmpeg not found, HLS output skipped")
+        return None
+
+    output_dir = os.path.normpath(output_dir)
+    tmp_dir = f"{output_dir}.{uuid.uuid4().hex}.tmp"
+    old_dir = f"{tmp_dir}.old"
+    os.makedirs(tmp_dir)
+    try:
+        result = subprocess.run(
+            [FFMPEG_BINARY, '-y', '-loglevel', 'error', '-i', input_path,
+             '-map', '0:v:0', '-c', 'copy', '-f', 'hls',
+             '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+             '-hls_segment_filename', os.path.join(tmp_dir, 'segment_%05d.ts'),
+             os.path.join(tmp_dir, 'index.m3u8')],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            logger.error(f"FFmpeg HLS failed: {result.stderr.decode(errors='replace').strip()}")
+            return None
+
+        # Thư mục không thể bị thay thế bằng os.replace: chuyển HLS cũ sang chỗ khác trước
+        if os.path.isdir(output_dir):
+            os.rename(output_dir, old_dir)
+        os.rename(tmp_dir, output_dir)
+        return os.path.join(output_dir, 'index.m3u8')
+    finally:
+        for path in (tmp_dir, old_dir):
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
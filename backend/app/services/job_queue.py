@@ -0,0 +1,246 @@
+import os
+import json
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime
+
+from app import db
+from app.models.detection import ProcessingJob
+from app.socket_events import ProgressThrottle, emit_processing_progress
+from app.services.checkpoint import Checkpoint
+from app.services.persistence import discard_detections
+from app.services.video_processing import build_hls, process_uploaded_video, render_overlay
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Hàng đợi job dùng chung cho cả ứng dụng (được tạo trong create_app)
+job_queue = None
+
+# Hàm thực hiện từng loại job: (video_id, options, progress_callback, checkpoint)
+JOB_TASKS = {
+    'process': process_uploaded_video,
+    'render': render_overlay,
+    'hls': build_hls,
+}
+
+
+class JobQueue:
+    """Hàng đợi xử lý video chạy nền
+
+    Bảng ProcessingJob là nguồn dữ liệu chính: upload (hoặc yêu cầu vẽ overlay, tạo HLS)
+    chỉ tạo một job 'pending' và đưa job_id vào queue, các worker thread lấy job ra và xử lý. Worker cũng
+    kiểm tra database mỗi poll_interval giây để nhận các job do process khác
+    tạo. Một job chỉ được chạy khi worker chuyển được nó từ 'pending' sang
+    'running' bằng một câu UPDATE, nên hai worker (kể cả ở hai process) không
+    chạy cùng một job. Khi worker khởi động, các job chưa hoàn thành được đưa
+    lại vào queue và tiếp tục từ checkpoint gần nhất
+    (uploads/checkpoints/<job_id>.ckpt); vì vậy chỉ một process nên chạy worker.
+    """
+
+    def __init__(self, app, workers=2, poll_interval=5.0):
+        self.app = app
+        self.workers = max(1, workers)
+        self.poll_interval = max(0.1, poll_interval)
+        self.started = False
+        self._queue = queue.Queue()
+        self._threads = []
+
+    def start(self):
+        self._recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'video-job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.started = True
+        logger.info(f"Job queue started with {self.workers} workers")
+        return self
+
+    def submit(self, job_id):
+        """Đưa một job đã được lưu trong database vào hàng đợi
+
+        Process không chạy worker chỉ lưu job; worker của process khác nhận job
+        khi kiểm tra database.
+        """
+        if self.started:
+            self._queue.put(job_id)
+
+    def _recover(self):
+        """Đưa lại các job pending/running (bị gián đoạn do server dừng) vào hàng đợi"""
+        with self.app.app_context():
+            try:
+                ProcessingJob.query.filter_by(status='running').update(
+                    {'status': 'pending'}, synchronize_session=False)
+                db.session.commit()
+                jobs = ProcessingJob.query.filter_by(status='pending').order_by(ProcessingJob.created_at).all()
+                for job in jobs:
+                    self._queue.put(job.job_id)
+                if jobs:
+                    logger.info(f"Re-queued {len(jobs)} unfinished processing jobs")
+            except Exception as e:
+                logger.error(f"Error recovering processing jobs: {str(e)}")
+                db.session.rollback()
+
+    def _next_pending(self):
+        """job_id của job pending cũ nhất trong database, None nếu không có"""
+        job = ProcessingJob.query.filter_by(status='pending').order_by(ProcessingJob.created_at).first()
+        return job.job_id if job else None
+
+    def _worker(self):
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                job_id = None
+            with self.app.app_context():
+                try:
+                    if job_id is None:
+                        job_id = self._next_pending()
+                    if job_id is not None:
+                        self._run(job_id)
+                except Exception as e:
+                    logger.error(f"Unexpected error in job worker for {job_id}: {str(e)}", exc_info=True)
+                finally:
+                    db.session.remove()
+
+    def _claim(self, job_id):
+        """Chuyển job từ 'pending' sang 'running'; False nếu worker khác đã nhận job"""
+        claimed = ProcessingJob.query.filter_by(job_id=job_id, status='pending').update(
+            {'status': 'running', 'started_at': datetime.utcnow(), 'error': None},
+            synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _update(self, job_id, **fields):
+        ProcessingJob.query.filter_by(job_id=job_id).update(fields)
+        db.session.commit()
+
+    def _checkpoint(self, job_id):
+        """Checkpoint của job, None nếu CHECKPOINT_INTERVAL = 0"""
+        interval = self.app.config['CHECKPOINT_INTERVAL']
+        if interval <= 0:
+            return None
+        path = os.path.join(self.app.config['UPLOAD_FOLDER'], 'checkpoints', f"{job_id}.ckpt")
+        return Checkpoint(path, interval, on_save=lambda frame: self._update(job_id, checkpoint_frame=frame))
+
+    def _emit(self, job_id, video_id, status, progress, error=None, task='process'):
+        emit_processing_progress({
+            'job_id': job_id,
+            'video_id': video_id,
+            'task': task,
+            'status': status,
+            'progress': progress,
+            'error': error
+        })
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            return
+        job = ProcessingJob.query.filter_by(job_id=job_id).first()
+
+        video_id = job.video_id
+        task = job.task or 'process'
+        options = json.loads(job.options) if job.options else None
+        checkpoint_frame = job.checkpoint_frame
+        progress = job.progress or 0
+        
+        # Job bị gián đoạn trước đó: tiếp tục từ checkpoint gần nhất (chỉ job xử lý video)
+        checkpoint = self._checkpoint(job_id) if task == 'process' else None
+        if checkpoint is not None and checkpoint_frame and checkpoint.exists():
+            self._update(job_id, resumed_at=datetime.utcnow(), resumed_from_frame=checkpoint_frame)
+            logger.info(f"Resuming processing job {job_id} from frame {checkpoint_frame}")
+        else:
+            # Bỏ checkpoint cũ không khớp với trạng thái trong database
+            if checkpoint is not None:
+                checkpoint.clear()
+            progress = 0
+            self._update(job_id, progress=0, checkpoint_frame=None)
+        self._emit(job_id, video_id, 'running', progress, task=task)
+
+        # Cập nhật tiến trình vào database và gửi qua Socket.IO, có giới hạn tần suất
+        throttle = ProgressThrottle(self.app.config['PROGRESS_EMIT_INTERVAL'])
+
+        def on_progress(progress):
+            if not throttle.should_emit(progress):
+                return
+            throttle.mark(progress)
+            self._update(job_id, progress=progress)
+            self._emit(job_id, video_id, 'running', progress, task=task)
+
+        try:
+            if task not in JOB_TASKS:
+                raise ValueError(f"Unknown job task: {task}")
+            JOB_TASKS[task](video_id, options, on_progress, checkpoint)
+            self._update(job_id, status='completed', progress=100, finished_at=datetime.utcnow())
+            self._emit(job_id, video_id, 'completed', 100, task=task)
+            logger.info(f"{task.capitalize()} job {job_id} completed")
+        except Exception as e:
+            logger.error(f"{task.capitalize()} job {job_id} failed: {str(e)}", exc_info=True)
+            db.session.rollback()
+            # Checkpoint bị xóa nên job không tiếp tục: bỏ các detection đã commit theo batch
+            if task == 'process':
+                try:
+                    discard_detections(video_id)
+                except Exception as cleanup_error:
+                    db.session.rollback()
+                    logger.error(f"Error discarding detections of {video_id}: {str(cleanup_error)}")
+            self._update(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+            self._emit(job_id, video_id, 'failed', None, str(e), task=task)
+        finally:
+            if checkpoint is not None:
+                checkpoint.clear()
+
+
+def init_job_queue(app):
+    """Tạo hàng đợi job của ứng dụng
+
+    Worker chỉ được khởi động ở đây khi JOB_WORKERS_AUTOSTART = True; nếu không,
+    run.py gọi start_job_workers().
+    """
+    global job_queue
+    job_queue = JobQueue(app, app.config['JOB_WORKERS'], app.config['JOB_POLL_INTERVAL'])
+    if app.config['JOB_WORKERS_AUTOSTART']:
+        job_queue.start()
+    return job_queue
+
+
+def start_job_workers():
+    """Khởi động worker của hàng đợi job (khôi phục các job bị gián đoạn)"""
+    if job_queue is None:
+        raise RuntimeError("Job queue is not initialized")
+    if not job_queue.started:
+        job_queue.start()
+    return job_queue
+
+
+def submit_job(job_id):
+    """Đưa job vào hàng đợi xử lý nền"""
+    if job_queue is None:
+        raise RuntimeError("Job queue is not initialized")
+    job_queue.submit(job_id)
+
+
+def find_or_create_job(video_id, task, options):
+    """Job pending/running cùng loại và tham số của video, hoặc một job mới được đưa vào hàng đợi
+
+    Nhiều request cùng yêu cầu một kết quả chỉ tạo một job. Phải được gọi trong app context.
+    """
+    options_json = json.dumps(options, sort_keys=True)
+    job = ProcessingJob.query.filter(
+        ProcessingJob.video_id == video_id,
+        ProcessingJob.task == task,
+        ProcessingJob.options == options_json,
+        ProcessingJob.status.in_(['pending', 'running'])
+    ).first()
+    if job:
+        return job
+
+    job = ProcessingJob(job_id=str(uuid.uuid4()), video_id=video_id, task=task,
+                        status='pending', options=options_json)
+    db.session.add(job)
+    db.session.commit()
+    submit_job(job.job_id)
+    logger.info(f"Queued {task} job {job.job_id} for video {video_id}")
+    return job
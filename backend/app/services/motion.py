@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Bộ lọc chuyển động rẻ tiền chạy trước YOLO
+
+    Frame được thu nhỏ, chuyển sang ảnh xám và so sánh với frame tham chiếu
+    (method='diff') hoặc đưa qua background subtractor MOG2 (method='mog2').
+    Frame được coi là có chuyển động khi tỷ lệ pixel thay đổi >= threshold.
+    """
+
+    def __init__(self, threshold=0.002, pixel_threshold=25, method='diff', resize_width=160):
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.method = method
+        self.resize_width = resize_width
+        self._reference = None
+        self._subtractor = None
+        if method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(varThreshold=pixel_threshold,
+                                                                  detectShadows=False)
+
+    def _prepare(self, frame):
+        """Thu nhỏ frame và chuyển sang ảnh xám đã làm mờ"""
+        height, width = frame.shape[:2]
+        if width > self.resize_width:
+            size = (self.resize_width, max(1, int(height * self.resize_width / width)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def has_motion(self, frame):
+        """Kiểm tra frame có thay đổi so với frame tham chiếu hay không"""
+        small = self._prepare(frame)
+
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(small)
+            return np.count_nonzero(mask) / mask.size >= self.threshold
+
+        if self._reference is None:
+            self._reference = small
+            return True
+
+        diff = cv2.absdiff(small, self._reference)
+        changed = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+        if changed >= self.threshold:
+            # Chỉ cập nhật tham chiếu khi có chuyển động để thay đổi chậm vẫn được cộng dồn
+            self._reference = small
+            return True
+        return False
@@ -0,0 +1,225 @@
+import os
+import json
+
+# Các tham số xử lý mặc định cho mỗi job
+DEFAULT_PROCESSING_OPTIONS = {
+    # Số frame được gom lại cho một lần gọi YOLO
+    'batch_size': 1,
+    # Chạy giải mã và mã hóa video trong các thread riêng
+    'pipeline': True,
+    # Số frame tối đa chờ trong mỗi queue của pipeline
+    'queue_size': 32,
+    # Chạy YOLO mỗi k frame, các frame ở giữa được nội suy bằng Kalman
+    'detect_stride': 1,
+    # Tự điều chỉnh k theo chuyển động và số lượng track
+    'adaptive_stride': False,
+    # Giá trị k lớn nhất khi adaptive_stride bật
+    'max_stride': 8,
+    # Bỏ qua YOLO cho các frame tĩnh khi không có track nào
+    'motion_gate': False,
+    # Tỷ lệ pixel thay đổi tối thiểu để coi là có chuyển động
+    'motion_threshold': 0.002,
+    # Độ chênh lệch mức xám tối thiểu để một pixel được coi là thay đổi
+    'motion_pixel_threshold': 25,
+    # 'diff' (so sánh frame) hoặc 'mog2' (background subtractor)
+    'motion_method': 'diff',
+    # Tracker cho job: 'deepsort' hoặc 'iou' (None = tracker mặc định của detector)
+    'tracker': None,
+    # DeepSORT: dùng lại embedding khi IoU với box ở frame trước >= giá trị này (None = tắt)
+    'embed_reuse_iou': None,
+    # DeepSORT: tính lại embedding sau tối đa số frame này
+    'embed_refresh_interval': 10,
+    # Số process xử lý song song các đoạn của một video (1 = xử lý tuần tự)
+    'chunk_workers': 1,
+    # Số frame chồng lấn giữa hai đoạn liên tiếp, dùng để nối track ID
+    'chunk_overlap': 30,
+    # Kích thước tile (pixel) cho frame độ phân giải cao (0 = không chia tile)
+    'tile_size': 0,
+    # Tỷ lệ chồng lấn giữa hai tile liền kề
+    'tile_overlap': 0.2,
+    # Chỉ chia tile mỗi k lần chạy YOLO, các lần khác chạy trên frame đầy đủ
+    'tile_interval': 1,
+    # Các đa giác vùng quan tâm [[[x, y], ...], ...] (pixel), detection ngoài vùng bị bỏ (None = cả frame)
+    'roi': None,
+    # Danh sách tên class được phát hiện, truyền vào model (None = mọi class)
+    'classes': None,
+    # Ngưỡng độ tin cậy của YOLO (None = mặc định của model)
+    'conf': None,
+    # Kích thước ảnh đầu vào của YOLO (None = kích thước lúc train/export)
+    'imgsz': None,
+    # Preset của libx264 khi mã hóa video kết quả (nhanh hơn = file lớn hơn)
+    'encoder_preset': 'veryfast',
+    # Chất lượng H.264 (CRF, 0-51, nhỏ hơn = đẹp hơn và file lớn hơn)
+    'encoder_crf': 23,
+    # Ghi fragmented MP4 để video phát được ngay khi đang xử lý
+    'fragmented_mp4': False,
+    # Chỉ lưu detections/tracks, không vẽ và mã hóa video kết quả (video gốc
+    # được phát, overlay được vẽ khi cần qua /api/videos/render/<video_id>)
+    'detections_only': False,
+    # Tạo thêm HLS (playlist + segment) bằng stream copy sau khi xử lý
+    'hls': False,
+}
+
+
+def to_bool(value):
+    """Chuyển giá trị từ form (chuỗi) thành bool"""
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 'yes', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(f"Not a boolean: {value}")
+
+
+def _load_json(value):
+    """Đọc giá trị JSON từ form (chuỗi) hoặc dùng trực tiếp nếu đã là list"""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def to_polygons(value):
+    """Chuyển giá trị từ form thành danh sách đa giác, mỗi đa giác có ít nhất 3 điểm [x, y]"""
+    polygons = _load_json(value)
+    if not isinstance(polygons, list) or not polygons:
+        raise ValueError("Expected a list of polygons")
+    result = []
+    for polygon in polygons:
+        if not isinstance(polygon, list) or len(polygon) < 3:
+            raise ValueError("Each polygon needs at least 3 points")
+        result.append([[float(x), float(y)] for x, y in polygon])
+    return result
+
+
+def to_class_list(value):
+    """Chuyển giá trị từ form (list JSON hoặc chuỗi 'person,dog') thành danh sách tên class"""
+    if isinstance(value, str) and not value.strip().startswith('['):
+        classes = value.split(',')
+    else:
+        classes = _load_json(value)
+    if not isinstance(classes, list):
+        raise ValueError("Expected a list of class names")
+    classes = [str(name).strip() for name in classes if str(name).strip()]
+    if not classes:
+        raise ValueError("Expected at least one class name")
+    return classes
+
+
+# Kiểu dữ liệu của từng tham số khi đọc từ form upload
+OPTION_TYPES = {
+    'batch_size': int,
+    'pipeline': to_bool,
+    'queue_size': int,
+    'detect_stride': int,
+    'adaptive_stride': to_bool,
+    'max_stride': int,
+    'motion_gate': to_bool,
+    'motion_threshold': float,
+    'motion_pixel_threshold': int,
+    'motion_method': str,
+    'tracker': str,
+    'embed_reuse_iou': float,
+    'embed_refresh_interval': int,
+    'chunk_workers': int,
+    'chunk_overlap': int,
+    'tile_size': int,
+    'tile_overlap': float,
+    'tile_interval': int,
+    'roi': to_polygons,
+    'classes': to_class_list,
+    'conf': float,
+    'imgsz': int,
+    'encoder_preset': str,
+    'encoder_crf': int,
+    'fragmented_mp4': to_bool,
+    'detections_only': to_bool,
+    'hls': to_bool,
+}
+
+# Giá trị nhỏ nhất cho các tham số dạng số
+OPTION_MINIMUMS = {
+    'batch_size': 1,
+    'queue_size': 1,
+    'detect_stride': 1,
+    'max_stride': 1,
+    'motion_threshold': 0,
+    'motion_pixel_threshold': 0,
+    'embed_reuse_iou': 0,
+    'embed_refresh_interval': 1,
+    'chunk_workers': 1,
+    'chunk_overlap': 0,
+    'tile_size': 0,
+    'tile_overlap': 0,
+    'tile_interval': 1,
+    'conf': 0,
+    'imgsz': 32,
+    'encoder_crf': 0,
+}
+
+# Giá trị lớn nhất cho các tham số dạng số. Các giá trị này giới hạn tài nguyên
+# một request có thể chiếm: mỗi chunk worker là một process tải model riêng, batch
+# và queue giữ frame trong bộ nhớ, imgsz tăng bộ nhớ và thời gian suy luận
+OPTION_MAXIMUMS = {
+    'batch_size': 64,
+    'queue_size': 256,
+    'chunk_workers': os.cpu_count() or 1,
+    'imgsz': 1920,
+    'tile_size': 1920,
+    'tile_overlap': 0.5,
+    'conf': 1,
+    'encoder_crf': 51,
+}
+
+# Kích thước tile nhỏ nhất khi chia tile (tile_size = 0 vẫn là không chia tile): số
+# tile mỗi frame tăng theo bình phương khi tile nhỏ đi, và mọi tile được đưa vào
+# model trong một lần gọi
+TILE_SIZE_MINIMUM = 160
+
+# Các giá trị hợp lệ cho tham số dạng lựa chọn
+OPTION_CHOICES = {
+    'motion_method': ('diff', 'mog2'),
+    'tracker': ('deepsort', 'iou'),
+    'encoder_preset': ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast',
+                       'medium', 'slow', 'slower', 'veryslow'),
+}
+
+
+def resolve_options(options=None):
+    """Gộp tham số của job với giá trị mặc định"""
+    resolved = dict(DEFAULT_PROCESSING_OPTIONS)
+    if options:
+        resolved.update({key: value for key, value in options.items() if value is not None})
+    return resolved
+
+
+def parse_processing_options(form, defaults=None):
+    """Đọc tham số xử lý từ form của request upload
+
+    Raise ValueError nếu một tham số không hợp lệ.
+    """
+    options = dict(defaults or {})
+    for key, cast in OPTION_TYPES.items():
+        value = form.get(key)
+        if value is None or value == '':
+            continue
+        try:
+            options[key] = cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for '{key}': {value}")
+
+    for key, minimum in OPTION_MINIMUMS.items():
+        if options.get(key) is not None and options[key] < minimum:
+            raise ValueError(f"'{key}' must be at least {minimum}")
+
+    if options.get('tile_size') and options['tile_size'] < TILE_SIZE_MINIMUM:
+        raise ValueError(f"'tile_size' must be 0 (no tiling) or at least {TILE_SIZE_MINIMUM}")
+
+    for key, maximum in OPTION_MAXIMUMS.items():
+        if options.get(key) is not None and options[key] > maximum:
+            raise ValueError(f"'{key}' must be at most {maximum}")
+
+    for key, choices in OPTION_CHOICES.items():
+        if options.get(key) is not None and options[key] not in choices:
+            raise ValueError(f"'{key}' must be one of: {', '.join(choices)}")
+
+    return options
@@ -0,0 +1,143 @@
+import time
+import logging
+from datetime import datetime
+
+from app import db
+from app.models.detection import AnimalDetection, TrackedObject
+from app.services.sinks import ResultSink
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+
+class BulkInserter:
+    """Ghi nhiều row vào một bảng bằng Core executemany, mỗi batch một transaction
+
+    Không tạo ORM object cho từng row: các dict được gom thành batch
+    batch_size row và ghi bằng một câu INSERT executemany rồi commit. Số row
+    và thời gian ghi được cộng dồn để báo cáo tốc độ (row/giây).
+    """
+
+    def __init__(self, table, batch_size=5000):
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.rows = 0
+        self.seconds = 0.0
+        self._buffer = []
+
+    def add(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        try:
+            db.session.execute(self.table.insert(), self._buffer)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.seconds += time.perf_counter() - start
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def clear(self):
+        """Bỏ các row chưa được ghi"""
+        self._buffer = []
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'seconds': self.seconds,
+            'rows_per_sec': self.rows / self.seconds if self.seconds > 0 else 0
+        }
+
+
+class DetectionWriter(ResultSink):
+    """Ghi detections của một video vào bảng AnimalDetection trong lúc xử lý
+
+    process_video gọi write_detections() với detections của mỗi frame; row được ghi theo
+    batch nên bộ nhớ và thời gian ghi không phụ thuộc độ dài video. Khi job
+    tiếp tục từ checkpoint, start() xóa các row từ frame tiếp tục trở đi (đã
+    ghi trước khi bị gián đoạn) để không bị trùng.
+    """
+
+    def __init__(self, video_id, video_source, batch_size=5000):
+        self.video_id = video_id
+        self.video_source = video_source
+        self.inserter = BulkInserter(AnimalDetection.__table__, batch_size)
+        self._timestamp = datetime.utcnow()
+
+    def start(self, from_frame=0):
+        AnimalDetection.query.filter(
+            AnimalDetection.video_id == self.video_id,
+            AnimalDetection.frame_number >= from_frame
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    def write_detections(self, detections):
+        for detection in detections:
+            x1, y1, x2, y2 = detection.get('box', [0, 0, 0, 0])
+            self.inserter.add({
+                'video_id': self.video_id,
+                'video_source': self.video_source,
+                'class_name': detection.get('class', 'unknown'),
+                'confidence': float(detection.get('confidence', 0.0)),
+                'timestamp': self._timestamp,
+                'frame_number': int(detection.get('frame', 0)),
+                'x1': int(x1),
+                'y1': int(y1),
+                'x2': int(x2),
+                'y2': int(y2)
+            })
+
+    def get_state(self):
+        # Mọi detection trước frame checkpoint phải nằm trong database
+        self.inserter.flush()
+        return None
+
+    def close(self):
+        """Ghi batch cuối, trả về thống kê ghi (rows, seconds, rows_per_sec)"""
+        self.inserter.flush()
+        stats = self.inserter.stats()
+        logger.info(f"Wrote {stats['rows']} detections for {self.video_id} in {stats['seconds']:.2f}s "
+                    f"({stats['rows_per_sec']:.0f} rows/s)")
+        return stats
+
+    def discard(self):
+        """Bỏ batch đang chờ và xóa mọi detection đã ghi của video (job thất bại, không tiếp tục)"""
+        self.inserter.clear()
+        discard_detections(self.video_id)
+
+
+def discard_detections(video_id):
+    """Xóa mọi detection của một video
+
+    Detection được commit theo batch trong lúc xử lý, nên một job thất bại giữa
+    chừng để lại các row của phần video đã xử lý (dashboard sẽ đếm các row này).
+    """
+    db.session.rollback()
+    AnimalDetection.query.filter_by(video_id=video_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def save_tracked_objects(video_id, tracks, batch_size=5000):
+    """Ghi các track (dạng tracks của process_video) vào bảng TrackedObject theo batch"""
+    inserter = BulkInserter(TrackedObject.__table__, batch_size)
+    inserter.extend({
+        'video_id': video_id,
+        'track_id': int(track_id),
+        'class_name': track.get('class', 'unknown'),
+        'first_frame': track.get('first_frame', 0),
+        'last_frame': track.get('last_frame', 0),
+        'avg_confidence': 0.0  # Calculate from detections if available
+    } for track_id, track in tracks.items())
+    inserter.flush()
+    return inserter.stats()
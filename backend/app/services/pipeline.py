@@ -0,0 +1,151 @@
+import logging
+import queue
+import threading
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Đánh dấu kết thúc luồng frame trong queue
+_END = object()
+
+
+class FrameReader:
+    """Giải mã frame từ cv2.VideoCapture (producer)
+
+    Khi threaded=True, việc giải mã chạy trong một thread riêng và đẩy frame vào
+    một queue có giới hạn, nên bộ nhớ không tăng khi stage suy luận chậm hơn.
+    """
+
+    def __init__(self, cap, queue_size=32, threaded=True):
+        self.cap = cap
+        self.threaded = threaded
+        self.error = None
+        self._finished = False
+        self._stop = threading.Event()
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name='frame-reader', daemon=True)
+
+    def start(self):
+        if self._thread is not None:
+            self._thread.start()
+        return self
+
+    def _put(self, item):
+        # Chờ có chỗ trống trong queue nhưng vẫn thoát được khi bị dừng
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                if not self._put(frame):
+                    break
+        except Exception as e:
+            logger.error(f"Error decoding frames: {str(e)}", exc_info=True)
+            self.error = e
+        finally:
+            self._put(_END)
+
+    def read(self):
+        """Trả về frame tiếp theo hoặc None khi hết video"""
+        if self._finished:
+            return None
+
+        if not self.threaded:
+            ret, frame = self.cap.read()
+            if not ret:
+                self._finished = True
+                return None
+            return frame
+
+        frame = self._queue.get()
+        if frame is _END:
+            self._finished = True
+            return None
+        return frame
+
+    def read_batch(self, max_frames):
+        """Đọc tối đa max_frames frame theo đúng thứ tự"""
+        frames = []
+        while len(frames) < max_frames:
+            frame = self.read()
+            if frame is None:
+                break
+            frames.append(frame)
+        return frames
+
+    def stop(self):
+        """Dừng thread giải mã và giải phóng các frame còn trong queue"""
+        self._stop.set()
+        if self._thread is not None:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._thread.join(timeout=5)
+
+
+class FrameWriter:
+    """Mã hóa frame vào writer (consumer)
+
+    Khi threaded=True, writer.write() chạy trong một thread riêng. Queue có giới
+    hạn nên stage suy luận sẽ chờ nếu encoder chậm hơn; thứ tự frame được giữ
+    nguyên vì chỉ có một producer và một consumer. Lỗi mã hóa đầu tiên được lưu
+    trong error (người gọi kiểm tra sau close()).
+    """
+
+    def __init__(self, writer, queue_size=32, threaded=True):
+        self.writer = writer
+        self.threaded = threaded
+        self.error = None
+        self.frames_written = 0
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name='frame-writer', daemon=True)
+
+    def start(self):
+        if self._thread is not None:
+            self._thread.start()
+        return self
+
+    def _write(self, frame):
+        # Sau lỗi đầu tiên, video kết quả đã hỏng: bỏ các frame còn lại
+        if self.error is not None:
+            return
+        try:
+            self.writer.write(frame)
+            self.frames_written += 1
+        except Exception as e:
+            logger.error(f"Error encoding frame {self.frames_written}: {str(e)}")
+            self.error = e
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is _END:
+                break
+            self._write(frame)
+
+    def write(self, frame):
+        if self.threaded:
+            self._queue.put(frame)
+        else:
+            self._write(frame)
+
+    def close(self):
+        """Chờ encoder ghi hết các frame còn trong queue"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_END)
+            self._thread.join()
@@ -0,0 +1,103 @@
+import os
+import logging
+
+import cv2
+import numpy as np
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+
+class PreviewCollector:
+    """Thu thập thumbnail và sprite sheet từ các frame đã có trong vòng lặp xử lý
+
+    process_video gọi observe() cho mỗi frame (sau khi vẽ overlay nếu có), nên
+    không cần mở và giải mã lại video sau khi xử lý. Chỉ giữ trong bộ nhớ một
+    frame đầy đủ (thumbnail) và các ô nhỏ của sprite sheet, mỗi sprite_interval
+    giây một ô. Đối tượng pickle được, nên có thể lưu trong checkpoint và gửi
+    về từ các process xử lý song song (xem app.services.chunking).
+    """
+
+    def __init__(self, thumbnail_widths=(160, 320, 640), sprite_interval=10, tile_width=160,
+                 columns=10, thumbnail_frame=0, fps=None):
+        self.thumbnail_widths = tuple(thumbnail_widths)
+        self.sprite_interval = sprite_interval
+        self.tile_width = tile_width
+        self.columns = max(1, columns)
+        self.thumbnail_frame = thumbnail_frame
+        self.fps = None
+        self.step = None
+        self.thumbnail = None
+        self.tiles = {}
+        if fps is not None:
+            self.start(fps)
+
+    def start(self, fps):
+        """Đặt fps của video (gọi khi mở video, trước frame đầu tiên)"""
+        if self.fps is None:
+            self.fps = fps
+            self.step = max(1, int(round(self.sprite_interval * fps)))
+
+    def empty_copy(self):
+        """Collector rỗng với cùng cài đặt (cho một đoạn video xử lý riêng)"""
+        return PreviewCollector(self.thumbnail_widths, self.sprite_interval, self.tile_width,
+                                self.columns, self.thumbnail_frame, self.fps)
+
+    def observe(self, frame_index, frame):
+        if frame_index == self.thumbnail_frame and self.thumbnail is None:
+            self.thumbnail = frame.copy()
+        if frame_index % self.step == 0 and frame_index not in self.tiles:
+            self.tiles[frame_index] = _resize(frame, self.tile_width)
+
+    def merge(self, other):
+        """Gộp kết quả của collector khác (đoạn video hoặc checkpoint) vào collector này"""
+        if self.thumbnail is None and other.thumbnail is not None:
+            self.thumbnail = other.thumbnail
+        for frame_index, tile in other.tiles.items():
+            self.tiles.setdefault(frame_index, tile)
+
+    def save(self, directory, video_id):
+        """Ghi thumbnail (kích thước gốc và các chiều rộng thumbnail_widths) và sprite sheet
+
+        Trả về thông tin preview để lưu vào database (None nếu không có frame nào).
+        """
+        if self.thumbnail is None:
+            return None
+
+        os.makedirs(directory, exist_ok=True)
+        cv2.imwrite(os.path.join(directory, f"thumbnail_{video_id}.jpg"), self.thumbnail)
+        widths = []
+        for width in self.thumbnail_widths:
+            if width < self.thumbnail.shape[1]:
+                cv2.imwrite(os.path.join(directory, f"thumbnail_{video_id}_{width}.jpg"),
+                            _resize(self.thumbnail, width))
+                widths.append(width)
+
+        info = {'thumbnail_widths': widths, 'sprite': None}
+        if self.tiles:
+            frames = sorted(self.tiles)
+            tile_height, tile_width = self.tiles[frames[0]].shape[:2]
+            rows = (len(frames) + self.columns - 1) // self.columns
+            sheet = np.zeros((rows * tile_height, min(len(frames), self.columns) * tile_width, 3),
+                             dtype=np.uint8)
+            for i, frame_index in enumerate(frames):
+                row, column = divmod(i, self.columns)
+                sheet[row * tile_height:(row + 1) * tile_height,
+                      column * tile_width:(column + 1) * tile_width] = self.tiles[frame_index]
+            cv2.imwrite(os.path.join(directory, f"sprite_{video_id}.jpg"), sheet)
+            info['sprite'] = {
+                'interval': self.sprite_interval,
+                'count': len(frames),
+                'columns': self.columns,
+                'tile_width': tile_width,
+                'tile_height': tile_height,
+                'times': [frame_index / self.fps for frame_index in frames]
+            }
+
+        logger.info(f"Saved previews for {video_id}: {len(widths) + 1} thumbnails, {len(self.tiles)} sprite tiles")
+        return info
+
+
+def _resize(frame, width):
+    height = max(1, int(round(frame.shape[0] * width / frame.shape[1])))
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,230 @@
+import os
+import glob
+import time
+import argparse
+import logging
+from collections import Counter
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from app.services.backends import DEFAULT_MODEL_PATH, ensure_exported, exported_model_path
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Phần mở rộng của các file video trong uploads/original
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+
+def list_videos(folder):
+    """Liệt kê các video trong thư mục, sắp xếp theo tên"""
+    return sorted(path for path in glob.glob(os.path.join(folder, '*'))
+                  if path.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def split_videos(videos, holdout_ratio=0.2):
+    """Chia video thành tập calibration và tập held-out để đánh giá
+
+    Mỗi video chỉ thuộc một tập để kết quả đánh giá không bị lệch bởi
+    chính các frame đã dùng để calibrate.
+    """
+    if len(videos) < 2:
+        return videos, videos
+    holdout_count = max(1, int(round(len(videos) * holdout_ratio)))
+    return videos[:-holdout_count], videos[-holdout_count:]
+
+
+def sample_frames(video_path, max_frames):
+    """Lấy tối đa max_frames frame trải đều trong video"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.warning(f"Could not open video: {video_path}")
+        return []
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = max(1, total_frames // max_frames) if total_frames > 0 else 1
+
+    frames = []
+    frame_idx = 0
+    while len(frames) < max_frames:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+        frame_idx += step
+    cap.release()
+    return frames
+
+
+def preprocess(frame, imgsz=640):
+    """Letterbox frame về imgsz x imgsz giống tiền xử lý của YOLOv8 (NCHW, float32, 0-1)"""
+    height, width = frame.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+
+    image = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+    return np.ascontiguousarray(image[np.newaxis], dtype=np.float32) / 255.0
+
+
+def quantize_model(model_path, calibration_frames, imgsz=640):
+    """Tạo model INT8 (ONNX, QDQ) bằng post-training static quantization
+
+    Trả về đường dẫn model INT8, nằm cạnh model gốc (best_int8.onnx).
+    """
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+
+    fp32_path = ensure_exported(model_path, 'onnx')
+    int8_path = exported_model_path(model_path, 'onnx-int8')
+    input_name = onnxruntime.InferenceSession(
+        fp32_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        """Đưa lần lượt các frame calibration vào quantizer"""
+
+        def __init__(self, frames):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            return {input_name: preprocess(frame, imgsz)}
+
+    logger.info(f"Quantizing {fp32_path} with {len(calibration_frames)} calibration frames")
+    quantize_static(fp32_path, int8_path, FrameCalibrationReader(calibration_frames),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True,
+                    calibrate_method=CalibrationMethod.MinMax)
+
+    # Giữ metadata (tên class, stride, imgsz) để ultralytics đọc được model INT8
+    fp32_model = onnx.load(fp32_path)
+    int8_model = onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+
+    logger.info(f"INT8 model saved to: {int8_path}")
+    return int8_path
+
+
+def box_iou(box, boxes):
+    """IoU giữa một box và một mảng box (xyxy)"""
+    if len(boxes) == 0:
+        return np.zeros(0)
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def run_model(model, frames, imgsz=640):
+    """Chạy model trên từng frame, trả về (danh sách (boxes, classes), fps)"""
+    outputs = []
+    start_time = time.time()
+    for frame in frames:
+        result = model(frame, imgsz=imgsz, verbose=False)[0]
+        boxes = result.boxes.xyxy.cpu().numpy() if len(result.boxes) > 0 else np.zeros((0, 4))
+        classes = [model.names[int(cls_id)] for cls_id in result.boxes.cls] if len(result.boxes) > 0 else []
+        outputs.append((boxes, classes))
+    elapsed = time.time() - start_time
+    return outputs, (len(frames) / elapsed if elapsed > 0 else 0)
+
+
+def compare_models(fp32_model, int8_model, frames, imgsz=640):
+    """So sánh INT8 với FP32: số detection theo class, mean IoU và fps"""
+    fp32_outputs, fp32_fps = run_model(fp32_model, frames, imgsz)
+    int8_outputs, int8_fps = run_model(int8_model, frames, imgsz)
+
+    fp32_counts = Counter()
+    int8_counts = Counter()
+    ious = []
+    for (fp32_boxes, fp32_classes), (int8_boxes, int8_classes) in zip(fp32_outputs, int8_outputs):
+        fp32_counts.update(fp32_classes)
+        int8_counts.update(int8_classes)
+
+        # Mỗi box FP32 được ghép với box INT8 cùng class có IoU cao nhất (0 nếu không có)
+        int8_classes = np.array(int8_classes)
+        for box, class_name in zip(fp32_boxes, fp32_classes):
+            candidates = int8_boxes[int8_classes == class_name] if len(int8_boxes) else int8_boxes
+            overlaps = box_iou(box, candidates)
+            ious.append(float(overlaps.max()) if len(overlaps) else 0.0)
+
+    return {
+        'frames': len(frames),
+        'detections_per_class': {
+            class_name: {'fp32': fp32_counts[class_name], 'int8': int8_counts[class_name]}
+            for class_name in sorted(set(fp32_counts) | set(int8_counts))
+        },
+        'mean_iou': float(np.mean(ious)) if ious else None,
+        'fp32_fps': fp32_fps,
+        'int8_fps': int8_fps
+    }
+
+
+def print_report(report):
+    """In bảng so sánh INT8 và FP32"""
+    print(f"Held-out frames: {report['frames']}")
+    print(f"{'class':<20}{'fp32':>10}{'int8':>10}")
+    for class_name, counts in report['detections_per_class'].items():
+        print(f"{class_name:<20}{counts['fp32']:>10}{counts['int8']:>10}")
+    mean_iou = report['mean_iou']
+    print(f"Mean IoU (INT8 vs FP32): {mean_iou:.3f}" if mean_iou is not None else "Mean IoU: n/a")
+    print(f"FPS: fp32={report['fp32_fps']:.2f}  int8={report['int8_fps']:.2f}")
+
+
+def main(argv=None):
+    """Tạo model INT8 từ các video đã upload và in báo cáo so sánh với FP32"""
+    from app.config import Config
+
+    parser = argparse.ArgumentParser(description='Post-training INT8 quantization for the detector model')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help='Path to the FP32 .pt model')
+    parser.add_argument('--videos', default=os.path.join(Config.UPLOAD_FOLDER, 'original'),
+                        help='Folder with videos used for calibration and evaluation')
+    parser.add_argument('--calibration-frames', type=int, default=200,
+                        help='Total number of calibration frames')
+    parser.add_argument('--eval-frames', type=int, default=100,
+                        help='Number of frames sampled per held-out video')
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help='Fraction of videos held out for evaluation')
+    parser.add_argument('--imgsz', type=int, default=640, help='Model input size')
+    args = parser.parse_args(argv)
+
+    videos = list_videos(args.videos)
+    if not videos:
+        print(f"No videos found in {args.videos}")
+        return 1
+
+    calibration_videos, holdout_videos = split_videos(videos, args.holdout)
+    if len(videos) < 2:
+        print("Warning: only one video available, evaluating on the calibration video")
+    per_video = max(1, args.calibration_frames // len(calibration_videos))
+    calibration_frames = [frame for video in calibration_videos for frame in sample_frames(video, per_video)]
+    print(f"Calibration: {len(calibration_frames)} frames from {len(calibration_videos)} videos")
+
+    int8_path = quantize_model(args.model, calibration_frames, args.imgsz)
+    print(f"INT8 model written to {int8_path}")
+
+    eval_frames = [frame for video in holdout_videos for frame in sample_frames(video, args.eval_frames)]
+    # So sánh với model FP32 chạy cùng ONNX Runtime để chỉ đo ảnh hưởng của lượng tử hóa
+    fp32_model = YOLO(ensure_exported(args.model, 'onnx'), task='detect')
+    report = compare_models(fp32_model, YOLO(int8_path, task='detect'), eval_frames, args.imgsz)
+    print_report(report)
+    print("Set DETECTOR_BACKEND=onnx-int8 to use the INT8 model")
+    return 0
@@ -0,0 +1,95 @@
+import logging
+
+import cv2
+import numpy as np
+
+from app.services.encoder import open_video_writer, release_writer
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+
+def draw_tracks(frame, track_results):
+    """Vẽ các bounding boxes và track IDs lên frame"""
+    for track in track_results:
+        x1, y1, x2, y2 = track['box']
+        class_name = track['class']
+
+        # Màu dựa vào loại đối tượng
+        if 'person' in class_name.lower():
+            color = (0, 0, 255)  # Red for people
+        elif any(animal in class_name.lower() for animal in ['animal', 'dog', 'cat']):
+            color = (0, 255, 0)  # Green for animals
+        else:
+            color = (255, 0, 0)  # Blue for other objects
+
+        # Vẽ bounding box
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+
+        # Thêm text với ID
+        label = f"{class_name}: {track['track_id']}"
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+    return frame
+
+
+def index_tracks(tracks, start_frame=0, end_frame=None):
+    """Nhóm vị trí các track (dạng tracks của process_video) theo frame
+
+    Trả về {frame: [{'track_id', 'class', 'box'}, ...]} cho các frame trong
+    [start_frame, end_frame).
+    """
+    by_frame = {}
+    for track_id, track in tracks.items():
+        for position in track['positions']:
+            frame_idx = position['frame']
+            if frame_idx < start_frame or (end_frame is not None and frame_idx >= end_frame):
+                continue
+            by_frame.setdefault(frame_idx, []).append({
+                'track_id': track_id,
+                'class': track['class'],
+                'box': position['box']
+            })
+    return by_frame
+
+
+def render_tracks(input_path, output_path, tracks_by_frame, start_frame=0, end_frame=None,
+                  preset='veryfast', crf=23, fragmented=False, progress_callback=None):
+    """Vẽ các track đã lưu lên video gốc cho đoạn [start_frame, end_frame)
+
+    Dùng khi video kết quả không được tạo lúc xử lý (chế độ chỉ phát hiện) hoặc
+    khi các đoạn được xử lý song song. progress_callback nhận tiến trình (0-100).
+    Trả về số frame đã ghi.
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {input_path}")
+
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0 or np.isnan(fps):
+        fps = 30
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    span_frames = (end_frame if end_frame is not None else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))) - start_frame
+
+    out = open_video_writer(output_path, fps, (width, height), preset, crf, fragmented)
+    frame_idx = start_frame
+    try:
+        while end_frame is None or frame_idx < end_frame:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(draw_tracks(frame, tracks_by_frame.get(frame_idx, [])))
+            frame_idx += 1
+            if progress_callback and span_frames > 0:
+                progress_callback(min(100, int((frame_idx - start_frame) / span_frames * 100)))
+    finally:
+        cap.release()
+        encode_error = release_writer(out)
+    if encode_error is not None:
+        raise RuntimeError(f"Error encoding {output_path}: {str(encode_error)}")
+
+    logger.info(f"Rendered frames {start_frame}-{frame_idx} to {output_path}")
+    return frame_idx - start_frame
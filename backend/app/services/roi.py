@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+
+
+class RegionFilter:
+    """Giữ lại các detection nằm trong các đa giác vùng quan tâm (ROI)
+
+    Điểm đại diện của một box là điểm giữa cạnh dưới (vị trí chân của người
+    hoặc động vật). Mask của các đa giác được vẽ một lần cho mỗi kích thước
+    frame, nên việc kiểm tra một detection chỉ là đọc một pixel.
+    """
+
+    def __init__(self, polygons):
+        self.polygons = [np.array(polygon, dtype=np.int32) for polygon in polygons]
+        self._masks = {}
+
+    def _mask(self, width, height):
+        if (width, height) not in self._masks:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, self.polygons, 1)
+            self._masks[(width, height)] = mask
+        return self._masks[(width, height)]
+
+    def contains(self, boxes, width, height):
+        """Mảng bool: box (x1, y1, x2, y2) nào có điểm đại diện nằm trong ROI"""
+        if len(boxes) == 0:
+            return np.zeros(0, dtype=bool)
+        mask = self._mask(width, height)
+        x = np.clip(((boxes[:, 0] + boxes[:, 2]) / 2).astype(int), 0, width - 1)
+        y = np.clip(boxes[:, 3].astype(int), 0, height - 1)
+        return mask[y, x].astype(bool)
@@ -0,0 +1,160 @@
+import os
+import json
+import logging
+
+import numpy as np
+
+from app.services.track_store import write_track_store
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+
+class ResultSink:
+    """Nơi nhận kết quả của process_video theo từng frame
+
+    process_video không giữ toàn bộ detections và vị trí track trong bộ nhớ mà
+    đưa kết quả của mỗi frame vào các sink (ghi database, ghi file, ...). Trạng
+    thái của sink được lưu cùng checkpoint của job: get_state() phải đảm bảo
+    mọi kết quả trước frame checkpoint đã được ghi, start(from_frame) bỏ các
+    kết quả từ frame from_frame trở đi (ghi trước khi job bị gián đoạn).
+    """
+
+    def start(self, from_frame=0):
+        pass
+
+    def write_detections(self, detections):
+        """detections: danh sách {'frame', 'class', 'confidence', 'box'} của một frame"""
+        pass
+
+    def write_tracks(self, frame_idx, tracks):
+        """tracks: danh sách {'track_id', 'class', 'box'} của frame frame_idx"""
+        pass
+
+    def get_state(self):
+        return None
+
+    def set_state(self, state):
+        pass
+
+    def close(self):
+        return None
+
+
+class MemorySink(ResultSink):
+    """Giữ detections và vị trí track trong bộ nhớ (kết quả giống process_video trước đây)
+
+    Dùng khi không có sink nào được truyền vào, ví dụ cho các đoạn video xử lý
+    song song cần nối track ID (xem app.services.chunking).
+    """
+
+    def __init__(self):
+        self.detections = []
+        self.positions = {}
+
+    def write_detections(self, detections):
+        self.detections.extend(detections)
+
+    def write_tracks(self, frame_idx, tracks):
+        for track in tracks:
+            self.positions.setdefault(track['track_id'], []).append({'frame': frame_idx, 'box': track['box']})
+
+    def get_state(self):
+        return {'detections': self.detections, 'positions': self.positions}
+
+    def set_state(self, state):
+        self.detections = state['detections']
+        self.positions = state['positions']
+
+    def tracks(self, track_info):
+        """Ghép thông tin track (class, first_frame, last_frame) với danh sách vị trí"""
+        return {
+            track_id: dict(info, positions=self.positions.get(track_id, []))
+            for track_id, info in track_info.items()
+        }
+
+
+class TrackFileSink(ResultSink):
+    """Ghi vị trí các track ra file theo từng đoạn, bộ nhớ không tăng theo độ dài video
+
+    Vị trí được gom trong bộ nhớ tối đa flush_frames frame rồi ghi thành các dòng
+    JSON (mỗi dòng một đoạn vị trí của một track) vào file tạm path; chỉ offset
+    của các dòng được giữ lại. export() ghi file track dạng cột (.npz, xem
+    app.services.track_store) bằng cách đọc lần lượt các đoạn của từng track.
+    """
+
+    def __init__(self, path, flush_frames=1000):
+        self.path = path
+        self.flush_frames = max(1, flush_frames)
+        self._file = None
+        self._offsets = {}
+        self._buffer = {}
+        self._buffered_since = None
+        self._restored = False
+
+    def start(self, from_frame=0):
+        if not self._restored:
+            self._offsets = {}
+            self._file = open(self.path, 'w+b')
+        self._buffer = {}
+        self._buffered_since = None
+
+    def write_tracks(self, frame_idx, tracks):
+        for track in tracks:
+            self._buffer.setdefault(track['track_id'], []).append([frame_idx] + list(track['box']))
+        if self._buffered_since is None:
+            self._buffered_since = frame_idx
+        elif frame_idx - self._buffered_since >= self.flush_frames:
+            self.flush()
+
+    def flush(self):
+        for track_id, positions in self._buffer.items():
+            self._offsets.setdefault(track_id, []).append(self._file.tell())
+            self._file.write(json.dumps(positions).encode() + b'\n')
+        self._file.flush()
+        self._buffer = {}
+        self._buffered_since = None
+
+    def get_state(self):
+        self.flush()
+        return {'size': self._file.tell(), 'offsets': self._offsets}
+
+    def set_state(self, state):
+        # Bỏ các đoạn được ghi sau checkpoint
+        self._file = open(self.path, 'r+b')
+        self._file.truncate(state['size'])
+        self._file.seek(state['size'])
+        self._offsets = state['offsets']
+        self._restored = True
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+
+    def positions(self, track_id):
+        """Mảng (n, 5) [frame, x1, y1, x2, y2] các vị trí của một track, đọc từ file tạm"""
+        positions = []
+        for offset in self._offsets.get(track_id, []):
+            self._file.seek(offset)
+            positions.extend(json.loads(self._file.readline()))
+        return np.array(positions, dtype=np.int64).reshape(-1, 5)
+
+    def export(self, output_path, fields, track_info, compressed=True):
+        """Ghi các track (info + vị trí) vào file .npz output_path, sau đó xóa file tạm"""
+        self.close()
+
+        def tracks():
+            for track_id, info in track_info.items():
+                positions = self.positions(track_id)
+                yield track_id, info, positions[:, 0], positions[:, 1:]
+
+        write_track_store(output_path, fields, tracks(), compressed)
+        self.discard()
+
+    def discard(self):
+        """Đóng và xóa file tạm"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,59 @@
+class AdaptiveStride:
+    """Chọn khoảng cách k giữa hai frame chạy YOLO
+
+    Các frame ở giữa được tracker nội suy bằng dự đoán Kalman. Khi adaptive=True,
+    k giảm khi cảnh chuyển động nhanh hoặc có nhiều track, và tăng dần (tối đa
+    max_stride) khi cảnh tĩnh.
+    """
+
+    def __init__(self, stride=1, adaptive=False, max_stride=8,
+                 motion_low=0.02, motion_high=0.08, crowd_size=10):
+        self.stride = max(1, int(stride))
+        self.max_stride = max(self.stride, int(max_stride))
+        self.adaptive = adaptive
+        self.motion_low = motion_low
+        self.motion_high = motion_high
+        self.crowd_size = crowd_size
+        self._last_detect_idx = None
+        self._last_observed_idx = None
+        self._last_boxes = {}
+
+    def should_detect(self, frame_idx):
+        """Kiểm tra frame có cần chạy YOLO hay không"""
+        if self._last_detect_idx is None or frame_idx - self._last_detect_idx >= self.stride:
+            self._last_detect_idx = frame_idx
+            return True
+        return False
+
+    def _motion(self, tracks, frames_elapsed):
+        """Độ dịch chuyển trung bình mỗi frame, chuẩn hóa theo kích thước box"""
+        displacements = []
+        for track in tracks:
+            previous = self._last_boxes.get(track['track_id'])
+            if previous is None:
+                continue
+            x1, y1, x2, y2 = track['box']
+            px1, py1, px2, py2 = previous
+            size = max(x2 - x1, y2 - y1, 1)
+            dx = ((x1 + x2) - (px1 + px2)) / 2
+            dy = ((y1 + y2) - (py1 + py2)) / 2
+            displacements.append(((dx * dx + dy * dy) ** 0.5) / size / max(frames_elapsed, 1))
+
+        if not displacements:
+            # Không có track chung với lần detect trước: cảnh trống được coi là tĩnh,
+            # còn track mới xuất hiện được coi là chuyển động mạnh
+            return 0.0 if not tracks else float('inf')
+        return sum(displacements) / len(displacements)
+
+    def observe(self, tracks, frame_idx):
+        """Cập nhật k từ các track tại frame vừa chạy detection"""
+        if self.adaptive and self._last_observed_idx is not None:
+            motion = self._motion(tracks, frame_idx - self._last_observed_idx)
+            if len(tracks) >= self.crowd_size or motion > self.motion_high:
+                self.stride = max(1, self.stride // 2)
+            elif motion < self.motion_low:
+                self.stride = min(self.max_stride, self.stride + 1)
+
+        self._last_observed_idx = frame_idx
+        self._last_boxes = {track['track_id']: track['box'] for track in tracks}
+        return self.stride
@@ -0,0 +1,134 @@
+import numpy as np
+
+from app.services.trackers import iou_matrix
+
+
+def tile_offsets(length, tile_size, overlap):
+    """Vị trí bắt đầu của các tile phủ kín đoạn [0, length)
+
+    Các tile cách nhau tile_size * (1 - overlap); tile cuối được dịch vào trong
+    để không vượt ra ngoài frame.
+    """
+    if length <= tile_size:
+        return [0]
+    step = max(1, int(tile_size * (1 - overlap)))
+    offsets = list(range(0, length - tile_size, step))
+    offsets.append(length - tile_size)
+    return offsets
+
+
+def intersection_over_smaller(boxes_a, boxes_b):
+    """Diện tích giao chia cho diện tích box nhỏ hơn, tính cho mọi cặp box (xyxy)
+
+    Dùng thay cho IoU khi gộp box giữa các tile: một đối tượng nằm trên ranh
+    giới tile cho ra một box bị cắt nằm gọn trong box đầy đủ, IoU của hai box
+    này thấp nhưng tỷ lệ giao trên box nhỏ hơn gần bằng 1.
+    """
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / np.maximum(np.minimum(area_a[:, None], area_b[None, :]), 1e-9)
+
+
+def touches_tile_border(boxes, rects, frame_size, margin=2):
+    """Box có chạm cạnh tile nằm bên trong frame hay không (đối tượng có thể bị tile cắt)
+
+    rects: vùng (xyxy, tọa độ frame) của tile chứa từng box. Cạnh trùng với cạnh
+    frame không tính, nên box của frame đầy đủ không bao giờ chạm cạnh tile.
+    """
+    width, height = frame_size
+    return (((boxes[:, 0] <= rects[:, 0] + margin) & (rects[:, 0] > 0))
+            | ((boxes[:, 1] <= rects[:, 1] + margin) & (rects[:, 1] > 0))
+            | ((boxes[:, 2] >= rects[:, 2] - margin) & (rects[:, 2] < width))
+            | ((boxes[:, 3] >= rects[:, 3] - margin) & (rects[:, 3] < height)))
+
+
+def merge_boxes(boxes, scores, classes, sources, rects, frame_size, iou_threshold=0.5,
+                border_threshold=0.5):
+    """NMS giữa các tile: giữ box có score cao nhất trong mỗi nhóm box cùng class trùng nhau
+
+    sources: chỉ số tile (ảnh đưa vào model) của từng box, rects: vùng của từng
+    tile trong frame. Hai box cùng class được coi là trùng khi IoU >= iou_threshold
+    (NMS thông thường, kể cả trong cùng một tile). Giao trên box nhỏ hơn
+    (intersection_over_smaller >= border_threshold) chỉ được dùng cho hai box từ
+    hai tile khác nhau khi ít nhất một box chạm cạnh tile bên trong frame, nên
+    các đối tượng thật chồng lên nhau (người đứng trước người khác, con vật nhỏ
+    cạnh con vật lớn) không bị gộp.
+
+    Trả về chỉ số các box được giữ lại.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=int)
+    order = np.argsort(-scores)
+    boxes, classes, sources = boxes[order], classes[order], sources[order]
+    
+    clipped = touches_tile_border(boxes, rects[sources], frame_size)
+    across_border = (sources[:, None] != sources[None, :]) & (clipped[:, None] | clipped[None, :])
+    duplicate = ((iou_matrix(boxes, boxes) >= iou_threshold)
+                 | (across_border & (intersection_over_smaller(boxes, boxes) >= border_threshold)))
+    duplicate &= classes[:, None] == classes[None, :]
+    
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(order[i])
+        suppressed |= duplicate[i]
+    return np.array(keep, dtype=int)
+
+
+class Tiler:
+    """Chia frame độ phân giải cao thành các tile chồng lấn cho YOLO
+
+    Các tile (và frame đầy đủ đã thu nhỏ, để bắt các đối tượng lớn hơn một
+    tile) được đưa vào model trong một lần gọi; box của từng tile được dịch về
+    tọa độ frame rồi gộp bằng merge_boxes. Chỉ mỗi interval lần phát hiện mới
+    dùng tile, các lần còn lại chạy trên frame đầy đủ như bình thường.
+    """
+
+    def __init__(self, tile_size=640, overlap=0.2, interval=1, merge_threshold=0.5):
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.interval = max(1, interval)
+        self.merge_threshold = merge_threshold
+        self._count = 0
+        self._grids = {}
+
+    def should_tile(self):
+        """Lần phát hiện này có dùng tile hay không (mỗi interval lần một lần)"""
+        tile = self._count % self.interval == 0
+        self._count += 1
+        return tile
+
+    def _grid(self, width, height):
+        if (width, height) not in self._grids:
+            self._grids[(width, height)] = [
+                (x, y)
+                for y in tile_offsets(height, self.tile_size, self.overlap)
+                for x in tile_offsets(width, self.tile_size, self.overlap)
+            ]
+        return self._grids[(width, height)]
+
+    def split(self, frame):
+        """Trả về (danh sách ảnh, danh sách offset (x, y)); ảnh cuối là frame đầy đủ"""
+        height, width = frame.shape[:2]
+        grid = self._grid(width, height)
+        if len(grid) == 1:
+            return [frame], [(0, 0)]
+        images = [frame[y:y + self.tile_size, x:x + self.tile_size] for x, y in grid]
+        return images + [frame], grid + [(0, 0)]
+
+    def merge(self, boxes, scores, classes, sources, images, offsets, frame_size):
+        """Chỉ số các box được giữ lại sau NMS giữa các tile
+
+        sources: chỉ số ảnh (trong images/offsets của split) của từng box.
+        """
+        rects = np.array([[x, y, x + image.shape[1], y + image.shape[0]]
+                          for image, (x, y) in zip(images, offsets)])
+        return merge_boxes(boxes, scores, classes, sources, rects, frame_size,
+                           self.merge_threshold, self.merge_threshold)
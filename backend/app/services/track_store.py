@@ -0,0 +1,267 @@
+import os
+import json
+import struct
+import zipfile
+import logging
+from functools import lru_cache
+
+import numpy as np
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+INT16_MIN, INT16_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+
+def tracking_store_path(upload_folder, video_id):
+    """File .npz chứa vị trí các track của một video"""
+    return os.path.join(upload_folder, 'tracking_data', f"tracking_{video_id}.npz")
+
+
+def _delta_encode(values, offsets):
+    """Mỗi track: giá trị đầu giữ nguyên, các giá trị sau là hiệu với giá trị trước"""
+    encoded = values.copy()
+    encoded[1:] -= values[:-1]
+    starts = offsets[:-1][offsets[:-1] < offsets[1:]]
+    encoded[starts] = values[starts]
+    return encoded
+
+
+def write_track_store(path, fields, tracks, compressed=True):
+    """Ghi các track dưới dạng cột vào file .npz
+
+    tracks: iterable (track_id, info, frames, boxes) với info có 'class', frames
+    là mảng số frame tăng dần và boxes là mảng (n, 4) xyxy. Các track được nối
+    thành mảng phẳng (offsets đánh dấu vị trí bắt đầu của từng track); frames
+    và boxes được mã hóa delta theo từng track nên phần lớn giá trị rất nhỏ,
+    boxes dùng int16 khi vừa. compressed=False ghi không nén để TrackStore có
+    thể memory-map.
+    """
+    track_ids, classes, first_frames, last_frames, lengths = [], [], [], [], []
+    frame_parts, box_parts = [], []
+    for track_id, info, frames, boxes in tracks:
+        track_ids.append(str(track_id))
+        classes.append(info.get('class', 'unknown'))
+        first_frames.append(info.get('first_frame', frames[0] if len(frames) else 0))
+        last_frames.append(info.get('last_frame', frames[-1] if len(frames) else 0))
+        lengths.append(len(frames))
+        frame_parts.append(np.asarray(frames, dtype=np.int64))
+        box_parts.append(np.asarray(boxes, dtype=np.int64).reshape(-1, 4))
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    frames = np.concatenate(frame_parts) if frame_parts else np.zeros(0, dtype=np.int64)
+    boxes = np.concatenate(box_parts) if box_parts else np.zeros((0, 4), dtype=np.int64)
+
+    frames = _delta_encode(frames, offsets).astype(np.int32)
+    boxes = _delta_encode(boxes, offsets)
+    box_dtype = np.int16 if boxes.size == 0 or (boxes.min() >= INT16_MIN and boxes.max() <= INT16_MAX) else np.int32
+
+    arrays = {
+        'meta': np.array(json.dumps(fields)),
+        'track_ids': np.array(track_ids, dtype=str),
+        'classes': np.array(classes, dtype=str),
+        'first_frame': np.array(first_frames, dtype=np.int32),
+        'last_frame': np.array(last_frames, dtype=np.int32),
+        'offsets': offsets,
+        'frames': frames,
+        'boxes': boxes.astype(box_dtype)
+    }
+
+    # Ghi ra file tạm rồi đổi tên để reader không đọc file đang ghi
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        if compressed:
+            np.savez_compressed(f, **arrays)
+        else:
+            np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved {len(track_ids)} tracks ({len(frames)} positions) to {path}")
+
+
+def _memmap_member(path, archive, name):
+    """Memory-map một mảng .npy được lưu không nén trong file .npz, None nếu bị nén"""
+    info = archive.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, 'rb') as f:
+        # Local file header: 30 byte cố định + tên file + extra field
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if not shape or shape[0] == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+class TrackStore:
+    """Đọc file track dạng cột do write_track_store ghi
+
+    Các mảng nhỏ (id, class, offsets) được đọc ngay; frames và boxes được
+    memory-map khi file không nén, nên đọc một track chỉ chạm đến phần dữ liệu
+    của track đó.
+
+    Interval index: trục frame được chia thành các bin bin_frames frame, mỗi bin
+    lưu danh sách các track có mặt trong bin đó (mảng CSR: _bin_offsets và
+    _bin_tracks, một track dài được liệt kê trong mọi bin nó đi qua). Truy vấn
+    [a, b] chỉ đọc các bin phủ đoạn đó rồi lọc theo first_frame <= b và
+    last_frame >= a, nên một track rất dài không làm chậm các truy vấn khác.
+    Vị trí trong một track đã sắp theo frame nên đoạn trong cửa sổ được tìm
+    bằng binary search.
+    """
+
+    def __init__(self, path, bin_frames=256):
+        self.path = path
+        self.bin_frames = max(1, bin_frames)
+        with np.load(path) as npz, zipfile.ZipFile(path) as archive:
+            self.fields = json.loads(str(npz['meta']))
+            self.track_ids = npz['track_ids']
+            self.classes = npz['classes']
+            self.first_frame = npz['first_frame']
+            self.last_frame = npz['last_frame']
+            self.offsets = npz['offsets']
+            self.frames = _memmap_member(path, archive, 'frames')
+            if self.frames is None:
+                self.frames = npz['frames']
+            self.boxes = _memmap_member(path, archive, 'boxes')
+            if self.boxes is None:
+                self.boxes = npz['boxes']
+        self._index = {track_id: i for i, track_id in enumerate(self.track_ids.tolist())}
+        
+        self._build_index()
+
+    def _build_index(self):
+        """Tạo index bin -> các track có mặt trong bin (CSR)"""
+        first = self.first_frame.astype(np.int64)
+        last = np.maximum(self.last_frame.astype(np.int64), first)
+        self._base = int(first.min()) if len(self) else 0
+        first_bin = (first - self._base) // self.bin_frames
+        last_bin = (last - self._base) // self.bin_frames
+        self._bin_count = int(last_bin.max()) + 1 if len(self) else 0
+        
+        # Mỗi track được lặp lại một lần cho mỗi bin nó đi qua, rồi sắp theo bin
+        counts = last_bin - first_bin + 1
+        track_of = np.repeat(np.arange(len(self), dtype=np.int64), counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        bin_of = first_bin[track_of] + np.arange(len(track_of)) - starts
+        order = np.argsort(bin_of, kind='stable')
+        self._bin_tracks = track_of[order]
+        self._bin_offsets = np.zeros(self._bin_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(bin_of, minlength=self._bin_count), out=self._bin_offsets[1:])
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def track(self, index):
+        """(frames, boxes) đã giải mã delta của track thứ index"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        frames = np.cumsum(self.frames[start:end], dtype=np.int64)
+        boxes = np.cumsum(self.boxes[start:end], axis=0, dtype=np.int64)
+        return frames, boxes
+
+    def track_by_id(self, track_id):
+        return self.track(self._index[str(track_id)])
+
+    def tracks_in_window(self, from_frame, to_frame):
+        """Chỉ số (tăng dần) các track có mặt trong đoạn frame [from_frame, to_frame]"""
+        from_frame, to_frame = int(from_frame), int(to_frame)
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(self) or from_frame > to_frame:
+            return empty
+        lo_bin = max(0, (from_frame - self._base) // self.bin_frames)
+        hi_bin = min(self._bin_count - 1, (to_frame - self._base) // self.bin_frames)
+        if lo_bin > hi_bin:
+            return empty
+        
+        lo, hi = self._bin_offsets[lo_bin], self._bin_offsets[hi_bin + 1]
+        if hi - lo > len(self):
+            # Cửa sổ rộng: kiểm tra trực tiếp mọi track rẻ hơn gộp các bin
+            candidates = np.arange(len(self), dtype=np.int64)
+        else:
+            candidates = np.unique(self._bin_tracks[lo:hi])
+        present = (self.first_frame[candidates] <= to_frame) & (self.last_frame[candidates] >= from_frame)
+        return candidates[present]
+
+    def tracks_at(self, frame):
+        """Chỉ số các track có mặt tại frame"""
+        return self.tracks_in_window(frame, frame)
+
+    def to_dict(self, from_frame=None, to_frame=None):
+        """Dữ liệu tracking theo định dạng JSON cũ: {**fields, 'tracks': {id: {..., 'positions'}}}
+
+        Với from_frame/to_frame, chỉ có các track có ít nhất một vị trí trong đoạn
+        [from_frame, to_frame] và chỉ các vị trí đó.
+        """
+        if from_frame is None and to_frame is None:
+            indices = range(len(self))
+        else:
+            from_frame = from_frame if from_frame is not None else np.iinfo(np.int32).min
+            to_frame = to_frame if to_frame is not None else np.iinfo(np.int32).max
+            indices = self.tracks_in_window(from_frame, to_frame).tolist()
+
+        tracks = {}
+        for i in indices:
+            frames, boxes = self.track(i)
+            if from_frame is not None or to_frame is not None:
+                lo = np.searchsorted(frames, from_frame, side='left')
+                hi = np.searchsorted(frames, to_frame, side='right')
+                frames, boxes = frames[lo:hi], boxes[lo:hi]
+                if not len(frames):
+                    continue
+            tracks[str(self.track_ids[i])] = {
+                'class': str(self.classes[i]),
+                'first_frame': int(self.first_frame[i]),
+                'last_frame': int(self.last_frame[i]),
+                'positions': [{'frame': frame, 'box': box}
+                              for frame, box in zip(frames.tolist(), boxes.tolist())]
+            }
+        return dict(self.fields, tracks=tracks)
+
+
+@lru_cache(maxsize=32)
+def _open_track_store(path, modified):
+    return TrackStore(path)
+
+
+def open_track_store(path):
+    """TrackStore (kèm interval index) của file, được cache cho đến khi file thay đổi"""
+    return _open_track_store(path, os.path.getmtime(path))
+
+
+def load_tracking_data(upload_folder, video_id, from_frame=None, to_frame=None):
+    """Dữ liệu tracking của video (định dạng JSON), đọc từ .npz hoặc file JSON cũ; None nếu không có
+
+    from_frame/to_frame (tính cả hai đầu) giới hạn các track và vị trí được trả về.
+    """
+    store_path = tracking_store_path(upload_folder, video_id)
+    if os.path.exists(store_path):
+        return open_track_store(store_path).to_dict(from_frame, to_frame)
+
+    json_path = os.path.join(upload_folder, 'tracking_data', f"tracking_{video_id}.json")
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, 'r') as f:
+        tracking_data = json.load(f)
+    if from_frame is None and to_frame is None:
+        return tracking_data
+
+    # File JSON cũ không có index: lọc tuần tự
+    from_frame = from_frame if from_frame is not None else float('-inf')
+    to_frame = to_frame if to_frame is not None else float('inf')
+    tracks = {}
+    for track_id, track in tracking_data.get('tracks', {}).items():
+        if track['first_frame'] > to_frame or track['last_frame'] < from_frame:
+            continue
+        positions = [position for position in track['positions'] if from_frame <= position['frame'] <= to_frame]
+        if not positions:
+            continue
+        tracks[track_id] = dict(track, positions=positions)
+    tracking_data['tracks'] = tracks
+    return tracking_data
@@ -0,0 +1,427 @@
+import time
+import logging
+import numpy as np
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Các tracker được hỗ trợ
+SUPPORTED_TRACKERS = ('deepsort', 'iou')
+
+
+class BaseTracker:
+    """Giao diện chung cho các tracker
+
+    update() nhận detections dạng ([x1, y1, x2, y2], confidence, class_name) và
+    trả về danh sách track. Mỗi track có track_id, is_confirmed(), to_ltrb()
+    và get_det_class() giống Track của deep_sort_realtime.
+    """
+
+    name = None
+
+    def prepare_batch(self, frames, detections_list):
+        """Chuẩn bị trước dữ liệu cho nhiều frame (ví dụ embedding), None nếu không cần"""
+        return None
+
+    def update(self, detections, frame=None, prepared=None):
+        """Cập nhật tracker với detections của một frame
+
+        prepared: phần tử tương ứng của kết quả prepare_batch() nếu có.
+        """
+        raise NotImplementedError
+
+    def predict(self):
+        """Dự đoán vị trí các track cho frame tiếp theo mà không có detection"""
+        raise NotImplementedError
+
+    @property
+    def tracks(self):
+        """Các track hiện tại của tracker"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Thống kê hoạt động của tracker"""
+        return {}
+
+    def get_state(self):
+        """Trạng thái của tracker (pickle được) để lưu vào checkpoint"""
+        raise NotImplementedError
+
+    def set_state(self, state):
+        """Khôi phục trạng thái đã lưu bằng get_state()"""
+        raise NotImplementedError
+
+
+class DeepSortTracker(BaseTracker):
+    """DeepSORT (deep_sort_realtime) với appearance embedder MobileNetV2
+
+    Embedding được tính ở đây thay vì bên trong DeepSort: crop của tất cả
+    detection trong một hoặc nhiều frame được gom vào một lần gọi embedder.
+    Khi embed_reuse_iou được đặt, detection có IoU >= embed_reuse_iou với một
+    detection cùng class ở frame trước dùng lại embedding đó, cho tới khi
+    embedding đã cũ embed_refresh_interval frame. Detection không khớp với
+    frame trước (mới xuất hiện hoặc sau khi bị che) luôn được tính lại.
+    """
+
+    name = 'deepsort'
+
+    def __init__(self, max_age=30, n_init=3, nn_budget=100, embedder_model_name='mobilenetv2_x1_0',
+                 embed_reuse_iou=None, embed_refresh_interval=10):
+        from deep_sort_realtime.deepsort_tracker import DeepSort
+
+        self.deepsort = DeepSort(max_age=max_age,
+                                 n_init=n_init,
+                                 nn_budget=nn_budget,
+                                 embedder_gpu=False,
+                                 embedder_model_name=embedder_model_name)
+        self.embed_reuse_iou = embed_reuse_iou
+        self.embed_refresh_interval = max(1, embed_refresh_interval)
+
+        # Các detection của frame trước: box, class, embedding và frame đã tính embedding
+        self._cache = []
+        self._frame_idx = 0
+
+        # Thống kê embedding
+        self.embeddings_computed = 0
+        self.embeddings_reused = 0
+        self.embed_time = 0.0
+
+    @staticmethod
+    def _crop(frame, box):
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = (int(v) for v in box)
+        x1, y1 = min(max(x1, 0), width - 1), min(max(y1, 0), height - 1)
+        x2, y2 = max(min(x2, width), x1 + 1), max(min(y2, height), y1 + 1)
+        return frame[y1:y2, x1:x2]
+
+    def _find_reusable(self, box, cls_name):
+        """Tìm detection ở frame trước có thể dùng lại embedding"""
+        if not self.embed_reuse_iou or not self._cache:
+            return None
+        candidates = [entry for entry in self._cache
+                      if entry['class'] == cls_name
+                      and self._frame_idx - entry['computed_at'] < self.embed_refresh_interval]
+        if not candidates:
+            return None
+        ious = iou_matrix(np.array([box], dtype=float),
+                          np.array([entry['box'] for entry in candidates], dtype=float))[0]
+        best = int(np.argmax(ious))
+        return candidates[best] if ious[best] >= self.embed_reuse_iou else None
+
+    def prepare_batch(self, frames, detections_list):
+        """Tính embedding cho detections của nhiều frame bằng một lần gọi embedder"""
+        crops = []
+        batch_entries = []
+        for frame, detections in zip(frames, detections_list):
+            self._frame_idx += 1
+            entries = []
+            for box, _, cls_name in detections:
+                source = self._find_reusable(box, cls_name)
+                if source is not None:
+                    # embedding có thể là vector hoặc chỉ số crop đang chờ tính trong batch này
+                    entry = {'box': box, 'class': cls_name,
+                             'embedding': source['embedding'], 'computed_at': source['computed_at']}
+                    self.embeddings_reused += 1
+                else:
+                    entry = {'box': box, 'class': cls_name,
+                             'embedding': len(crops), 'computed_at': self._frame_idx}
+                    crops.append(self._crop(frame, box))
+                entries.append(entry)
+            self._cache = entries
+            batch_entries.append(entries)
+
+        computed = []
+        if crops:
+            start_time = time.time()
+            computed = self.deepsort.embedder.predict(crops)
+            self.embed_time += time.time() - start_time
+            self.embeddings_computed += len(crops)
+
+        for entries in batch_entries:
+            for entry in entries:
+                if isinstance(entry['embedding'], int):
+                    entry['embedding'] = computed[entry['embedding']]
+
+        return [[entry['embedding'] for entry in entries] for entries in batch_entries]
+
+    def update(self, detections, frame=None, prepared=None):
+        if prepared is None:
+            prepared = self.prepare_batch([frame], [detections])[0]
+        # deep_sort_realtime nhận box dạng [left, top, width, height]
+        raw_detections = [([x1, y1, x2 - x1, y2 - y1], conf, cls_name)
+                          for (x1, y1, x2, y2), conf, cls_name in detections]
+        return self.deepsort.update_tracks(raw_detections, embeds=prepared)
+
+    def predict(self):
+        self.deepsort.tracker.predict()
+
+    @property
+    def tracks(self):
+        return self.deepsort.tracker.tracks
+
+    def stats(self):
+        total = self.embeddings_computed + self.embeddings_reused
+        return {
+            'embeddings_computed': self.embeddings_computed,
+            'embeddings_reused': self.embeddings_reused,
+            'embedding_cache_hit_rate': self.embeddings_reused / total if total else 0.0,
+            'embeddings_per_second': self.embeddings_computed / self.embed_time if self.embed_time > 0 else 0.0
+        }
+
+    def get_state(self):
+        # Tracker bên trong DeepSort (track, Kalman, feature đã lưu) không chứa embedder
+        return {
+            'tracker': self.deepsort.tracker,
+            'cache': self._cache,
+            'frame_idx': self._frame_idx,
+            'embeddings_computed': self.embeddings_computed,
+            'embeddings_reused': self.embeddings_reused,
+            'embed_time': self.embed_time
+        }
+
+    def set_state(self, state):
+        self.deepsort.tracker = state['tracker']
+        self._cache = state['cache']
+        self._frame_idx = state['frame_idx']
+        self.embeddings_computed = state['embeddings_computed']
+        self.embeddings_reused = state['embeddings_reused']
+        self.embed_time = state['embed_time']
+
+
+class IoUTrack:
+    """Ảnh chụp trạng thái một track của IoUTracker"""
+
+    def __init__(self, track_id, det_class, ltrb, confirmed, time_since_update):
+        self.track_id = track_id
+        self.det_class = det_class
+        self.time_since_update = time_since_update
+        self._ltrb = ltrb
+        self._confirmed = confirmed
+
+    def is_confirmed(self):
+        return self._confirmed
+
+    def to_ltrb(self):
+        return self._ltrb
+
+    def get_det_class(self):
+        return self.det_class
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Ma trận IoU giữa hai mảng box (x1, y1, x2, y2), tính vector hóa"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class IoUTracker(BaseTracker):
+    """Tracker chỉ dựa trên chuyển động, viết thuần NumPy (không có embedder)
+
+    Trạng thái Kalman [cx, cy, w, h, vx, vy, vw, vh] của tất cả track được lưu
+    trong các mảng để bước dự đoán và cập nhật được vector hóa. Ghép cặp track
+    với detection cùng class theo IoU lớn nhất (greedy), giống cách
+    ByteTrack/SORT dùng IoU thay cho đặc trưng ngoại hình.
+    """
+
+    name = 'iou'
+
+    # Độ lệch chuẩn của nhiễu, tỷ lệ với kích thước box (như DeepSORT)
+    STD_POSITION = 1.0 / 20
+    STD_VELOCITY = 1.0 / 160
+
+    def __init__(self, max_age=30, n_init=3, iou_threshold=0.3):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.iou_threshold = iou_threshold
+        self._next_id = 1
+
+        # Trạng thái của các track, mỗi hàng là một track
+        self._mean = np.zeros((0, 8))
+        self._covariance = np.zeros((0, 8, 8))
+        self._ids = []
+        self._classes = []
+        self._hits = np.zeros(0, dtype=int)
+        self._time_since_update = np.zeros(0, dtype=int)
+        self._confirmed = np.zeros(0, dtype=bool)
+
+        # Mô hình vận tốc không đổi với dt = 1 frame
+        self._motion = np.eye(8)
+        self._motion[:4, 4:] = np.eye(4)
+        self._observation = np.eye(4, 8)
+
+    @staticmethod
+    def _to_xywh(boxes):
+        return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                         boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1)
+
+    @staticmethod
+    def _to_ltrb(xywh):
+        half_w, half_h = xywh[:, 2] / 2, xywh[:, 3] / 2
+        return np.stack([xywh[:, 0] - half_w, xywh[:, 1] - half_h,
+                         xywh[:, 0] + half_w, xywh[:, 1] + half_h], axis=1)
+
+    @staticmethod
+    def _diagonal(std):
+        """Tạo các ma trận đường chéo (N, k, k) từ độ lệch chuẩn (N, k)"""
+        count, size = std.shape
+        matrices = np.zeros((count, size, size))
+        matrices[:, np.arange(size), np.arange(size)] = std ** 2
+        return matrices
+
+    def _scale(self, xywh):
+        """Kích thước [w, h, w, h] dùng để tính độ lệch chuẩn của nhiễu"""
+        return np.stack([xywh[:, 2], xywh[:, 3], xywh[:, 2], xywh[:, 3]], axis=1)
+
+    def predict(self):
+        if not self._ids:
+            return
+        scale = self._scale(self._mean[:, :4])
+        noise = self._diagonal(np.concatenate([self.STD_POSITION * scale, self.STD_VELOCITY * scale], axis=1))
+        self._mean = self._mean @ self._motion.T
+        self._covariance = self._motion @ self._covariance @ self._motion.T + noise
+        self._time_since_update += 1
+
+    def _kalman_update(self, indices, measurements):
+        """Cập nhật Kalman cho các track indices với measurements (xywh)"""
+        mean = self._mean[indices]
+        covariance = self._covariance[indices]
+        H = self._observation
+
+        measurement_noise = self._diagonal(self.STD_POSITION * self._scale(measurements))
+        projected_cov = H @ covariance @ H.T + measurement_noise
+        # K = P H^T S^-1, giải hệ thay vì nghịch đảo ma trận
+        gain = np.linalg.solve(projected_cov, (covariance @ H.T).transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = measurements - mean @ H.T
+
+        self._mean[indices] = mean + np.einsum('nij,nj->ni', gain, innovation)
+        self._covariance[indices] = covariance - gain @ H @ covariance
+
+    def _match(self, det_boxes, det_classes):
+        """Ghép track với detection cùng class theo IoU lớn nhất (greedy)"""
+        if not self._ids or len(det_boxes) == 0:
+            return [], list(range(len(self._ids))), list(range(len(det_boxes)))
+
+        ious = iou_matrix(self._to_ltrb(self._mean[:, :4]), det_boxes)
+        same_class = np.array(self._classes)[:, None] == np.array(det_classes)[None, :]
+        ious = np.where(same_class, ious, 0.0)
+
+        matches = []
+        used_tracks, used_dets = set(), set()
+        rows, cols = np.unravel_index(np.argsort(-ious, axis=None), ious.shape)
+        for row, col in zip(rows, cols):
+            if ious[row, col] < self.iou_threshold:
+                break
+            if row in used_tracks or col in used_dets:
+                continue
+            matches.append((row, col))
+            used_tracks.add(row)
+            used_dets.add(col)
+
+        unmatched_tracks = [i for i in range(len(self._ids)) if i not in used_tracks]
+        unmatched_dets = [j for j in range(len(det_boxes)) if j not in used_dets]
+        return matches, unmatched_tracks, unmatched_dets
+
+    def update(self, detections, frame=None, prepared=None):
+        self.predict()
+
+        det_boxes = np.array([box for box, _, _ in detections], dtype=float).reshape(-1, 4)
+        det_classes = [cls_name for _, _, cls_name in detections]
+        matches, unmatched_tracks, unmatched_dets = self._match(det_boxes, det_classes)
+
+        # Cập nhật các track được ghép cặp
+        if matches:
+            track_idx = np.array([row for row, _ in matches])
+            det_idx = np.array([col for _, col in matches])
+            self._kalman_update(track_idx, self._to_xywh(det_boxes[det_idx]))
+            self._hits[track_idx] += 1
+            self._time_since_update[track_idx] = 0
+            self._confirmed[track_idx] |= self._hits[track_idx] >= self.n_init
+            for row, col in matches:
+                self._classes[row] = det_classes[col]
+
+        # Xóa track chưa xác nhận bị mất, hoặc track đã mất quá max_age frame
+        unmatched = np.zeros(len(self._ids), dtype=bool)
+        unmatched[unmatched_tracks] = True
+        keep = ~(unmatched & (~self._confirmed | (self._time_since_update > self.max_age)))
+        self._remove(keep)
+
+        # Tạo track mới cho các detection chưa được ghép
+        if unmatched_dets:
+            self._add(self._to_xywh(det_boxes[unmatched_dets]), [det_classes[j] for j in unmatched_dets])
+
+        return self.tracks
+
+    def _remove(self, keep):
+        self._mean = self._mean[keep]
+        self._covariance = self._covariance[keep]
+        self._hits = self._hits[keep]
+        self._time_since_update = self._time_since_update[keep]
+        self._confirmed = self._confirmed[keep]
+        self._ids = [track_id for track_id, kept in zip(self._ids, keep) if kept]
+        self._classes = [cls_name for cls_name, kept in zip(self._classes, keep) if kept]
+
+    def _add(self, xywh, classes):
+        count = len(xywh)
+        mean = np.concatenate([xywh, np.zeros((count, 4))], axis=1)
+        scale = self._scale(xywh)
+        covariance = self._diagonal(np.concatenate([2 * self.STD_POSITION * scale,
+                                                    10 * self.STD_VELOCITY * scale], axis=1))
+
+        self._mean = np.concatenate([self._mean, mean])
+        self._covariance = np.concatenate([self._covariance, covariance])
+        self._hits = np.concatenate([self._hits, np.ones(count, dtype=int)])
+        self._time_since_update = np.concatenate([self._time_since_update, np.zeros(count, dtype=int)])
+        self._confirmed = np.concatenate([self._confirmed, np.full(count, self.n_init <= 1)])
+        self._classes.extend(classes)
+        for _ in range(count):
+            self._ids.append(str(self._next_id))
+            self._next_id += 1
+
+    def get_state(self):
+        return {
+            'next_id': self._next_id,
+            'mean': self._mean,
+            'covariance': self._covariance,
+            'ids': self._ids,
+            'classes': self._classes,
+            'hits': self._hits,
+            'time_since_update': self._time_since_update,
+            'confirmed': self._confirmed
+        }
+
+    def set_state(self, state):
+        self._next_id = state['next_id']
+        self._mean = state['mean']
+        self._covariance = state['covariance']
+        self._ids = state['ids']
+        self._classes = state['classes']
+        self._hits = state['hits']
+        self._time_since_update = state['time_since_update']
+        self._confirmed = state['confirmed']
+
+    @property
+    def tracks(self):
+        ltrb = self._to_ltrb(self._mean[:, :4]) if self._ids else np.zeros((0, 4))
+        return [IoUTrack(track_id, cls_name, box, bool(confirmed), int(since_update))
+                for track_id, cls_name, box, confirmed, since_update
+                in zip(self._ids, self._classes, ltrb, self._confirmed, self._time_since_update)]
+
+
+def create_tracker(name='deepsort', embed_reuse_iou=None, embed_refresh_interval=10):
+    """Tạo tracker theo tên ('deepsort' hoặc 'iou')
+
+    Các tham số embed_* chỉ áp dụng cho DeepSORT.
+    """
+    name = (name or 'deepsort').lower()
+    if name == 'iou':
+        return IoUTracker()
+    if name != 'deepsort':
+        logger.warning(f"Unknown tracker '{name}', using deepsort")
+    return DeepSortTracker(embed_reuse_iou=embed_reuse_iou,
+                           embed_refresh_interval=embed_refresh_interval)
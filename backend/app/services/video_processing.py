@@ -0,0 +1,239 @@
+import os
+import json
+import uuid
+import shutil
+import logging
+import threading
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models.detection import ProcessedVideo, TrackedObject, TrackingHistory
+from app.services.detector_pool import get_detector_pool
+from app.services.encoder import write_hls
+from app.services.persistence import DetectionWriter, save_tracked_objects
+from app.services.previews import PreviewCollector
+from app.services.rendering import index_tracks, render_tracks
+from app.services.sinks import TrackFileSink
+from app.services.track_store import load_tracking_data, tracking_store_path
+
+# Thiết lập logging
+logger = logging.getLogger(__name__)
+
+# Lock theo video: chỉ một lần tạo HLS cho mỗi video tại một thời điểm
+_hls_locks = {}
+_hls_locks_lock = threading.Lock()
+
+
+def hls_directory(video_id):
+    """Thư mục chứa playlist và segment HLS của một video"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'hls', video_id)
+
+
+def playable_video_path(video):
+    """Video dùng để phát: video gốc ở chế độ chỉ phát hiện, video kết quả trong các trường hợp khác"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if video.detections_only:
+        return os.path.join(upload_folder, 'original', video.original_filename)
+    return os.path.join(upload_folder, 'processed', video.processed_filename)
+
+
+def _hls_lock(video_id):
+    with _hls_locks_lock:
+        return _hls_locks.setdefault(video_id, threading.Lock())
+
+
+def _write_video_hls(video_id, source_path, replace=True):
+    """Tạo HLS cho video dưới lock của video đó
+
+    replace=False: giữ HLS đã có (do lần gọi khác vừa tạo xong). Trả về đường dẫn playlist hoặc None.
+    """
+    playlist_path = os.path.join(hls_directory(video_id), 'index.m3u8')
+    with _hls_lock(video_id):
+        if not replace and os.path.exists(playlist_path):
+            return playlist_path
+        return write_hls(source_path, hls_directory(video_id), current_app.config['HLS_SEGMENT_SECONDS'])
+
+
+def process_uploaded_video(video_id, options=None, progress_callback=None, checkpoint=None):
+    """Xử lý một video đã upload và lưu kết quả (tracking JSON, thumbnail, database)
+
+    Phải được gọi trong app context. Trả về summary của process_video, hoặc None
+    nếu không có detector (video được sao chép nguyên bản). Raise RuntimeError
+    khi xử lý lỗi. checkpoint: Checkpoint của job để có thể tiếp tục khi bị gián đoạn.
+    """
+    video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+    if not video:
+        raise ValueError(f"Video not found: {video_id}")
+    
+    upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'original', video.original_filename)
+    processed_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'processed', video.processed_filename)
+    
+    # Chế độ chỉ phát hiện: không ghi video kết quả, video gốc được phát
+    detections_only = bool(options and options.get('detections_only'))
+    output_path = None if detections_only else processed_path
+    source_path = upload_path if detections_only else processed_path
+    
+    # Thumbnail và sprite sheet được lấy từ các frame trong lúc xử lý
+    previews = PreviewCollector(current_app.config['THUMBNAIL_WIDTHS'],
+                                current_app.config['SPRITE_INTERVAL'],
+                                current_app.config['SPRITE_TILE_WIDTH'],
+                                current_app.config['SPRITE_COLUMNS'])
+    
+    # Kết quả được ghi ra ngay trong lúc xử lý: detections vào database theo batch,
+    # vị trí track vào file tạm (giữ lại khi job bị gián đoạn để tiếp tục)
+    tracking_data_path = tracking_store_path(current_app.config['UPLOAD_FOLDER'], video_id)
+    detection_writer = DetectionWriter(video_id, video.processed_filename,
+                                       current_app.config['DB_INSERT_BATCH_SIZE'])
+    track_writer = TrackFileSink(f"{tracking_data_path}.positions", current_app.config['TRACK_FLUSH_FRAMES'])
+    
+    # Pool detector (trọng số YOLO tải một lần và dùng chung, mỗi slot có predictor riêng,
+    # mỗi job có detector và tracker riêng)
+    # chỉ được tạo khi có video đầu tiên cần xử lý
+    detector_pool = get_detector_pool(current_app.config)
+    if not detector_pool:
+        logger.warning("No detector available, copying video without processing")
+        shutil.copy(upload_path, processed_path)
+        return None
+    
+    logger.info(f"Starting to process video: {upload_path}")
+    
+    # Xử lý video với detector và tracker riêng cho job này
+    with detector_pool.acquire(options, timeout=current_app.config['DETECTOR_POOL_TIMEOUT']) as detector:
+        results = detector.process_video(upload_path, output_path, progress_callback, options=options,
+                                         checkpoint=checkpoint, previews=previews,
+                                         sinks=[detection_writer, track_writer])
+    
+    if 'error' in results:
+        track_writer.discard()
+        detection_writer.discard()
+        raise RuntimeError(f"Video processing error: {results['error']}")
+    results['db_write'] = detection_writer.close()
+    
+    # Lưu tracking data dạng cột .npz (vị trí của từng track được đọc lại từ file tạm)
+    track_writer.export(tracking_data_path, {
+        'video_id': video_id,
+        'processed_at': datetime.now().isoformat(),
+        'person_count': results.get('person_count', 0),
+        'animal_count': results.get('animal_count', 0),
+        'total_frames': results.get('total_frames', 0)
+    }, results.get('tracks', {}), current_app.config['TRACK_STORE_COMPRESSED'])
+        
+    # Ghi thumbnail (nhiều kích thước) và sprite sheet đã thu thập khi xử lý
+    preview_info = previews.save(os.path.join(current_app.config['UPLOAD_FOLDER'], 'thumbnails'), video_id)
+    
+    # HLS cho video để phát (tùy chọn), tạo bằng stream copy nên gần như không tốn CPU
+    if options and options.get('hls'):
+        _write_video_hls(video_id, source_path)
+    
+    # Update database record
+    video_record = ProcessedVideo.query.filter_by(video_id=video_id).first()
+    if video_record:
+        video_record.processed_at = datetime.now()
+        video_record.person_count = results.get('person_count', 0)
+        video_record.animal_count = results.get('animal_count', 0)
+        video_record.total_frames = results.get('total_frames', 0)
+        video_record.fps = results.get('fps', 0)
+        video_record.resolution = results.get('resolution', '')
+        video_record.has_tracking_data = True
+        video_record.detections_only = detections_only
+        # Thời lượng tính từ số frame đã xử lý, không mở lại video
+        video_record.duration = results.get('duration', 0)
+        video_record.previews = json.dumps(preview_info) if preview_info else None
+        
+        db.session.commit()
+    
+    # Save detection history
+    tracking_history = TrackingHistory(
+        video_id=video_id,
+        person_count=results.get('person_count', 0),
+        animal_count=results.get('animal_count', 0),
+        total_objects=len(results.get('tracks', {})),
+        total_frames=results.get('total_frames', 0)
+    )
+    db.session.add(tracking_history)
+    db.session.commit()
+    
+    # Save tracked objects (detections đã được ghi trong lúc xử lý)
+    TrackedObject.query.filter_by(video_id=video_id).delete()
+    db.session.commit()
+    track_stats = save_tracked_objects(video_id, results.get('tracks', {}),
+                                       current_app.config['DB_INSERT_BATCH_SIZE'])
+    logger.info(f"Wrote {track_stats['rows']} tracked objects for {video_id} "
+                f"({track_stats['rows_per_sec']:.0f} rows/s)")
+    
+    logger.info(f"Video processing completed: {output_path or upload_path}")
+    return results
+
+
+def render_path(video_id, start=0, end=None):
+    """File overlay đã vẽ cho đoạn [start, end) giây của video (cache trong uploads/renders)"""
+    end_label = 'end' if end is None else f"{end:g}"
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'renders', f"render_{video_id}_{start:g}_{end_label}.mp4")
+
+
+def render_overlay(video_id, options=None, progress_callback=None, checkpoint=None):
+    """Vẽ overlay tracking lên video gốc từ tracks đã lưu (job 'render')
+
+    Phải được gọi trong app context. options: {'start', 'end'} tính bằng giây
+    (end None = hết video). Trả về đường dẫn file đã vẽ.
+    """
+    video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+    if not video:
+        raise ValueError(f"Video not found: {video_id}")
+    
+    options = options or {}
+    start, end = options.get('start', 0), options.get('end')
+    output_path = render_path(video_id, start, end)
+    if os.path.exists(output_path):
+        return output_path
+    
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    original_path = os.path.join(upload_folder, 'original', video.original_filename)
+    
+    # Đổi giây sang frame theo fps của video
+    fps = video.fps or 30
+    start_frame = int(start * fps)
+    end_frame = int(end * fps) if end is not None else None
+    
+    tracking_data = load_tracking_data(upload_folder, video_id, start_frame,
+                                       end_frame - 1 if end_frame is not None else None)
+    if tracking_data is None:
+        raise ValueError(f"Tracking data not found: {video_id}")
+    tracks = tracking_data.get('tracks', {})
+    
+    # Ghi ra file tạm rồi đổi tên để request khác không đọc file đang ghi
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp.mp4"
+    try:
+        render_tracks(original_path, tmp_path, index_tracks(tracks, start_frame, end_frame),
+                      start_frame, end_frame, progress_callback=progress_callback)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    logger.info(f"Rendered overlay for {video_id}: {output_path}")
+    return output_path
+
+
+def build_hls(video_id, options=None, progress_callback=None, checkpoint=None):
+    """Tạo HLS cho một video đã xử lý (job 'hls'), bỏ qua nếu playlist đã có
+
+    Phải được gọi trong app context. Trả về đường dẫn playlist.
+    """
+    video = ProcessedVideo.query.filter_by(video_id=video_id).first()
+    if not video:
+        raise ValueError(f"Video not found: {video_id}")
+    
+    source_path = playable_video_path(video)
+    if not os.path.exists(source_path):
+        raise ValueError(f"Video file not found: {source_path}")
+    
+    playlist_path = _write_video_hls(video_id, source_path, replace=False)
+    if not playlist_path:
+        raise RuntimeError(f"HLS output failed for video {video_id}")
+    
+    logger.info(f"HLS created for {video_id}: {playlist_path}")
+    return playlist_path
@@ -1,4 +1,5 @@
 from flask_socketio import SocketIO, emit
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,4 +28,32 @@ def init_socketio(app):
             emit('processing_progress', data, broadcast=True)
     
     except Exception as e:
-        logger.error(f"Error initializing Socket.IO: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error initializing Socket.IO: {str(e)}")
+
+class ProgressThrottle:
+    """Giới hạn tần suất gửi sự kiện processing_progress cho một job"""
+    
+    def __init__(self, min_interval=1.0, min_step=1):
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self._last_time = 0
+        self._last_progress = None
+    
+    def should_emit(self, progress):
+        # Luôn gửi lần đầu và khi hoàn thành
+        if self._last_progress is None or progress >= 100:
+            return True
+        if progress - self._last_progress < self.min_step:
+            return False
+        return time.time() - self._last_time >= self.min_interval
+    
+    def mark(self, progress):
+        self._last_time = time.time()
+        self._last_progress = progress
+
+def emit_processing_progress(data):
+    """Gửi tiến trình xử lý video tới tất cả client (gọi được từ thread nền)"""
+    try:
+        socketio.emit('processing_progress', data)
+    except Exception as e:
+        logger.error(f"Error emitting processing progress: {str(e)}")
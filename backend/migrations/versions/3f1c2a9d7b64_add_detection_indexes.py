@@ -0,0 +1,48 @@
+"""Add indexes for detection, tracking and job queries
+
+Database được tạo bằng db.create_all khi khởi động app đã có index từ model,
+nên migration này chỉ tạo các index còn thiếu.
+
+Revision ID: 3f1c2a9d7b64
+Revises: a0c4e1f27b93
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b64'
+down_revision = 'a0c4e1f27b93'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_animal_detection_video_frame', 'animal_detection', ['video_id', 'frame_number']),
+    ('ix_animal_detection_class_name', 'animal_detection', ['class_name']),
+    ('ix_animal_detection_timestamp', 'animal_detection', ['timestamp']),
+    ('ix_processed_video_processed_at', 'processed_video', ['processed_at']),
+    ('ix_tracked_object_video_track', 'tracked_object', ['video_id', 'track_id']),
+    ('ix_tracking_history_video_id', 'tracking_history', ['video_id']),
+    ('ix_tracking_history_timestamp', 'tracking_history', ['timestamp']),
+    ('ix_processing_job_video_id', 'processing_job', ['video_id']),
+    ('ix_processing_job_status_created_at', 'processing_job', ['status', 'created_at']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,110 @@
+"""Initial schema: detections, videos, tracking and processing jobs
+
+Database cũ được tạo bằng db.create_all (chưa có bảng alembic_version) đã có
+các bảng này, nên chỉ các bảng còn thiếu được tạo.
+
+Revision ID: a0c4e1f27b93
+Revises:
+Create Date: 2026-10-17 08:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a0c4e1f27b93'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade():
+    if not _has_table('animal_detection'):
+        op.create_table(
+            'animal_detection',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('video_source', sa.String(length=255), nullable=False),
+            sa.Column('video_id', sa.String(length=50), nullable=False),
+            sa.Column('class_name', sa.String(length=50), nullable=False),
+            sa.Column('confidence', sa.Float(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('frame_number', sa.Integer(), nullable=True),
+            sa.Column('x1', sa.Integer(), nullable=True),
+            sa.Column('y1', sa.Integer(), nullable=True),
+            sa.Column('x2', sa.Integer(), nullable=True),
+            sa.Column('y2', sa.Integer(), nullable=True),
+            sa.Column('track_id', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_table('processed_video'):
+        op.create_table(
+            'processed_video',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('video_id', sa.String(length=50), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('original_filename', sa.String(length=255), nullable=False),
+            sa.Column('processed_filename', sa.String(length=255), nullable=False),
+            sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+            sa.Column('processed_at', sa.DateTime(), nullable=True),
+            sa.Column('filesize', sa.Integer(), nullable=True),
+            sa.Column('duration', sa.Float(), nullable=True),
+            sa.Column('person_count', sa.Integer(), nullable=True),
+            sa.Column('animal_count', sa.Integer(), nullable=True),
+            sa.Column('total_frames', sa.Integer(), nullable=True),
+            sa.Column('fps', sa.Float(), nullable=True),
+            sa.Column('resolution', sa.String(length=20), nullable=True),
+            sa.Column('has_tracking_data', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('video_id')
+        )
+    if not _has_table('tracked_object'):
+        op.create_table(
+            'tracked_object',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('video_id', sa.String(length=50), nullable=False),
+            sa.Column('track_id', sa.Integer(), nullable=False),
+            sa.Column('class_name', sa.String(length=50), nullable=False),
+            sa.Column('first_frame', sa.Integer(), nullable=False),
+            sa.Column('last_frame', sa.Integer(), nullable=False),
+            sa.Column('avg_confidence', sa.Float(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_table('tracking_history'):
+        op.create_table(
+            'tracking_history',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('video_id', sa.String(length=50), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('person_count', sa.Integer(), nullable=True),
+            sa.Column('animal_count', sa.Integer(), nullable=True),
+            sa.Column('total_objects', sa.Integer(), nullable=True),
+            sa.Column('total_frames', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_table('processing_job'):
+        op.create_table(
+            'processing_job',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('job_id', sa.String(length=50), nullable=False),
+            sa.Column('video_id', sa.String(length=50), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('progress', sa.Integer(), nullable=True),
+            sa.Column('options', sa.Text(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('job_id')
+        )
+
+
+def downgrade():
+    for table in ('processing_job', 'tracking_history', 'tracked_object', 'processed_video', 'animal_detection'):
+        if _has_table(table):
+            op.drop_table(table)
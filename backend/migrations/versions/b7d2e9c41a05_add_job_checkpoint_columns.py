@@ -0,0 +1,43 @@
+"""Add checkpoint and resume columns to processing_job
+
+Revision ID: b7d2e9c41a05
+Revises: 3f1c2a9d7b64
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e9c41a05'
+down_revision = '3f1c2a9d7b64'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = [
+    sa.Column('checkpoint_frame', sa.Integer(), nullable=True),
+    sa.Column('resumed_at', sa.DateTime(), nullable=True),
+    sa.Column('resumed_from_frame', sa.Integer(), nullable=True),
+]
+
+
+def _existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # Database được tạo bằng db.create_all đã có các cột này
+    existing = _existing_columns('processing_job')
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column('processing_job', column)
+
+
+def downgrade():
+    existing = _existing_columns('processing_job')
+    with op.batch_alter_table('processing_job') as batch_op:
+        for column in reversed(COLUMNS):
+            if column.name in existing:
+                batch_op.drop_column(column.name)
@@ -0,0 +1,44 @@
+"""Add camera_settings table and processed_video.camera_id
+
+Revision ID: c5e8f3a62d17
+Revises: b7d2e9c41a05
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8f3a62d17'
+down_revision = 'b7d2e9c41a05'
+branch_labels = None
+depends_on = None
+
+
+def _existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # Database được tạo bằng db.create_all đã có bảng và cột này
+    if not sa.inspect(op.get_bind()).has_table('camera_settings'):
+        op.create_table(
+            'camera_settings',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('camera_id', sa.String(length=50), nullable=False),
+            sa.Column('settings', sa.Text(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('camera_id')
+        )
+    if 'camera_id' not in _existing_columns('processed_video'):
+        op.add_column('processed_video', sa.Column('camera_id', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    if 'camera_id' in _existing_columns('processed_video'):
+        with op.batch_alter_table('processed_video') as batch_op:
+            batch_op.drop_column('camera_id')
+    if sa.inspect(op.get_bind()).has_table('camera_settings'):
+        op.drop_table('camera_settings')
@@ -0,0 +1,32 @@
+"""Add processed_video.detections_only
+
+Revision ID: d94b1c7e0f28
+Revises: c5e8f3a62d17
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd94b1c7e0f28'
+down_revision = 'c5e8f3a62d17'
+branch_labels = None
+depends_on = None
+
+
+def _existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # Database được tạo bằng db.create_all đã có cột này
+    if 'detections_only' not in _existing_columns('processed_video'):
+        op.add_column('processed_video', sa.Column('detections_only', sa.Boolean(), nullable=True))
+
+
+def downgrade():
+    if 'detections_only' in _existing_columns('processed_video'):
+        with op.batch_alter_table('processed_video') as batch_op:
+            batch_op.drop_column('detections_only')
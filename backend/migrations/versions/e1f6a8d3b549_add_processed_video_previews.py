@@ -0,0 +1,32 @@
+"""Add processed_video.previews
+
+Revision ID: e1f6a8d3b549
+Revises: d94b1c7e0f28
+Create Date: 2026-10-17 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f6a8d3b549'
+down_revision = 'd94b1c7e0f28'
+branch_labels = None
+depends_on = None
+
+
+def _existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # Database được tạo bằng db.create_all đã có cột này
+    if 'previews' not in _existing_columns('processed_video'):
+        op.add_column('processed_video', sa.Column('previews', sa.Text(), nullable=True))
+
+
+def downgrade():
+    if 'previews' in _existing_columns('processed_video'):
+        with op.batch_alter_table('processed_video') as batch_op:
+            batch_op.drop_column('previews')
@@ -0,0 +1,32 @@
+"""Add processing_job.task
+
+Revision ID: f3a7c2d91e60
+Revises: e1f6a8d3b549
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c2d91e60'
+down_revision = 'e1f6a8d3b549'
+branch_labels = None
+depends_on = None
+
+
+def _existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # Database được tạo bằng db.create_all đã có cột này; job cũ (NULL) là job xử lý video
+    if 'task' not in _existing_columns('processing_job'):
+        op.add_column('processing_job', sa.Column('task', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    if 'task' in _existing_columns('processing_job'):
+        with op.batch_alter_table('processing_job') as batch_op:
+            batch_op.drop_column('task')
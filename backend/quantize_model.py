@@ -0,0 +1,6 @@
+import sys
+from app.services.quantization import main
+
+# Tạo model INT8 (model/best_int8.onnx) và in báo cáo so sánh với FP32
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,18 @@
 import os
 from app import create_app
 
-# Tạo app từ cấu hình phù hợp với môi trường
-app = create_app()
-
 if __name__ == '__main__':
+    # Tạo app từ cấu hình phù hợp với môi trường. Chỉ tạo trong __main__: chunk worker
+    # (multiprocessing spawn) import lại file này dưới tên __mp_main__ và không được
+    # tạo app (create_all, Socket.IO, warm-up, job worker) trong mỗi process
+    app = create_app()
+    
+    # Chỉ server xử lý job nền (không phải lệnh CLI như flask db upgrade)
+    from app.services.job_queue import start_job_workers
+    start_job_workers()
+    
     print("Starting application server...")
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    # Chạy qua SocketIO để client nhận processing_progress bằng WebSocket (eventlet/gevent
+    # nếu được cài, nếu không là server Werkzeug như app.run trước đây)
+    from app.socket_events import socketio
+    socketio.run(app, host='0.0.0.0', port=5000, debug=False, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import sqlite
+
+# Script nằm trong backend/scripts: thêm backend/ vào sys.path để import app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db
+from app.models.detection import AnimalDetection, TrackedObject, TrackingHistory, ProcessingJob
+
+CLASSES = ['person', 'dog', 'cat', 'cow', 'horse', 'sheep', 'bird', 'animal']
+DETECTIONS_PER_VIDEO = 20000
+
+
+def existing_rows(path):
+    """Tổng số row trong các bảng của một file SQLite có sẵn (0 nếu file không tồn tại)"""
+    if not os.path.exists(path):
+        return 0
+    connection = sqlite3.connect(path)
+    try:
+        tables = [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        return sum(connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables)
+    finally:
+        connection.close()
+
+
+def populate(path, rows):
+    """Tạo database SQLite với rows detection giả (DETECTIONS_PER_VIDEO mỗi video)"""
+    engine = sa.create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    videos = max(1, rows // DETECTIONS_PER_VIDEO)
+    start = datetime(2024, 1, 1)
+    # job_id là unique: thêm mã của lần chạy để có thể ghi thêm vào database đã có job (--force)
+    run = uuid.uuid4().hex[:8]
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany(
+            "INSERT INTO animal_detection (video_source, video_id, class_name, confidence, timestamp, "
+            "frame_number, x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((f"video_{i % videos}.mp4", f"video_{i % videos}", random.choice(CLASSES), random.random(),
+              start + timedelta(seconds=i), i // videos, 10, 20, 110, 220) for i in range(rows)))
+        connection.executemany(
+            "INSERT INTO tracked_object (video_id, track_id, class_name, first_frame, last_frame) "
+            "VALUES (?, ?, ?, ?, ?)",
+            ((f"video_{i % videos}", i, random.choice(CLASSES), i, i + 100) for i in range(rows // 100)))
+        connection.executemany(
+            "INSERT INTO tracking_history (video_id, timestamp, total_objects) VALUES (?, ?, ?)",
+            ((f"video_{i % videos}", start + timedelta(minutes=i), i) for i in range(videos * 10)))
+        connection.executemany(
+            "INSERT INTO processing_job (job_id, video_id, status, created_at) VALUES (?, ?, ?, ?)",
+            ((f"job_{run}_{i}", f"video_{i % videos}", 'completed' if i % 50 else 'pending',
+              start + timedelta(minutes=i)) for i in range(videos * 10)))
+    connection.execute("ANALYZE")
+    connection.close()
+    return videos
+
+
+def hot_queries(video_id):
+    """Các truy vấn thường dùng của API (tracking, dashboard, xóa video, job queue)"""
+    return {
+        'detections of a video by frame (get_video_detections)':
+            sa.select(AnimalDetection).where(AnimalDetection.video_id == video_id)
+            .order_by(AnimalDetection.frame_number).limit(100).offset(1000),
+        'detection count of a video (get_video_detections)':
+            sa.select(sa.func.count()).select_from(AnimalDetection).where(AnimalDetection.video_id == video_id),
+        'detections by class (dashboard)':
+            sa.select(AnimalDetection.class_name, sa.func.count(AnimalDetection.id))
+            .group_by(AnimalDetection.class_name),
+        'latest detections':
+            sa.select(AnimalDetection).order_by(AnimalDetection.timestamp.desc()).limit(10),
+        'delete detections of a video (delete_video)':
+            sa.delete(AnimalDetection).where(AnimalDetection.video_id == video_id),
+        'delete detections after resume frame (DetectionWriter.start)':
+            sa.delete(AnimalDetection).where(AnimalDetection.video_id == video_id,
+                                             AnimalDetection.frame_number >= 1000),
+        'tracked objects of a video':
+            sa.select(TrackedObject).where(TrackedObject.video_id == video_id),
+        'tracking history of a video (delete_video)':
+            sa.delete(TrackingHistory).where(TrackingHistory.video_id == video_id),
+        'latest tracking history (dashboard)':
+            sa.select(TrackingHistory).order_by(TrackingHistory.timestamp.desc()).limit(10),
+        'next pending job (job queue polling)':
+            sa.select(ProcessingJob).where(ProcessingJob.status == 'pending')
+            .order_by(ProcessingJob.created_at).limit(1),
+        'reset running jobs (job queue recovery)':
+            sa.update(ProcessingJob).where(ProcessingJob.status == 'running').values(status='pending'),
+    }
+
+
+def check_plans(path, video_id):
+    """EXPLAIN QUERY PLAN cho mỗi truy vấn; trả về danh sách (tên, plan, lỗi, thời gian)"""
+    connection = sqlite3.connect(path)
+    report = []
+    for name, statement in hot_queries(video_id).items():
+        sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+        plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        # Quét toàn bảng (SCAN không dùng index), hoặc sắp xếp toàn bộ kết quả bằng temp B-tree
+        problems = [detail for detail in plan
+                    if (detail.startswith('SCAN') and 'USING' not in detail)
+                    or 'TEMP B-TREE' in detail]
+
+        elapsed = None
+        if isinstance(statement, sa.sql.Select):
+            start = time.perf_counter()
+            connection.execute(sql).fetchall()
+            elapsed = time.perf_counter() - start
+        report.append((name, plan, problems, elapsed))
+    connection.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check that hot detection queries use indexes (SQLite)')
+    parser.add_argument('--rows', type=int, default=2000000, help='Number of AnimalDetection rows to generate')
+    parser.add_argument('--database', default=None,
+                        help='SQLite file to create (default: a temporary file, deleted afterwards)')
+    parser.add_argument('--force', action='store_true',
+                        help='Allow --database to point to a database that already contains data '
+                             '(fake rows are inserted into it)')
+    args = parser.parse_args(argv)
+
+    # Không ghi dữ liệu giả vào database thật (ví dụ instance/detection.db) nếu không được yêu cầu rõ
+    if args.database is not None and not args.force and existing_rows(args.database):
+        print(f"{args.database} already contains data; use a new file or pass --force", file=sys.stderr)
+        return 2
+
+    path = args.database
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        os.remove(path)
+
+    try:
+        start = time.perf_counter()
+        videos = populate(path, args.rows)
+        print(f"Generated {args.rows} detections for {videos} videos in {time.perf_counter() - start:.1f}s")
+
+        report = check_plans(path, f"video_{videos // 2}")
+        failed = 0
+        for name, plan, problems, elapsed in report:
+            status = 'FAIL' if problems else 'ok'
+            timing = f" ({elapsed * 1000:.1f} ms)" if elapsed is not None else ''
+            print(f"[{status}] {name}{timing}")
+            for detail in plan:
+                print(f"    {detail}")
+            failed += bool(problems)
+
+        print(f"{len(report) - failed}/{len(report)} queries use indexes")
+        return 1 if failed else 0
+    finally:
+        if args.database is None and os.path.exists(path):
+            os.remove(path)
+
+
+# Kiểm tra bằng EXPLAIN QUERY PLAN rằng các truy vấn detection thường dùng dùng index
+# (không quét toàn bảng) trên một database SQLite có hàng triệu row
+if __name__ == '__main__':
+    sys.exit(main())
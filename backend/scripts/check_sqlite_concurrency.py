@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+# Script nằm trong backend/scripts: thêm backend/ vào sys.path để import app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db
+from app.config import Config
+from app.db_profile import apply_sqlite_profile, engine_options
+from app.models.detection import AnimalDetection
+
+
+def _rows(video_id, start, count):
+    timestamp = datetime.utcnow()
+    return [{
+        'video_id': video_id,
+        'video_source': f"{video_id}.mp4",
+        'class_name': 'person' if i % 3 else 'dog',
+        'confidence': 0.9,
+        'timestamp': timestamp,
+        'frame_number': i,
+        'x1': 10, 'y1': 20, 'x2': 110, 'y2': 220
+    } for i in range(start, start + count)]
+
+
+def _create_engine(path, config, profile):
+    uri = f"sqlite:///{path}"
+    if profile:
+        engine = sa.create_engine(uri, **engine_options(uri, config))
+        apply_sqlite_profile(engine, config)
+        return engine
+    # Cấu hình mặc định trước đây: rollback journal, synchronous=FULL, cùng busy timeout
+    return sa.create_engine(uri, poolclass=QueuePool,
+                            connect_args={'timeout': config['SQLITE_BUSY_TIMEOUT'], 'check_same_thread': False})
+
+
+def run_scenario(config, profile, rows, batch_size, readers):
+    """Một job ghi rows detection theo batch trong khi readers thread liên tục đọc như dashboard
+
+    Trả về tốc độ ghi và độ trễ của các lần đọc trong lúc ghi.
+    """
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    os.remove(path)
+    engine = _create_engine(path, config, profile)
+    table = AnimalDetection.__table__
+    try:
+        db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(table.insert(), _rows('dashboard_video', 0, batch_size))
+
+        writing = threading.Event()
+        writing.set()
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def read():
+            query = sa.select(sa.func.count()).select_from(table).where(table.c.video_id == 'dashboard_video')
+            while writing.is_set():
+                start = time.perf_counter()
+                try:
+                    with engine.connect() as connection:
+                        connection.execute(query).scalar()
+                except OperationalError as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=read) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            # Mỗi batch một transaction, giống DetectionWriter
+            with engine.begin() as connection:
+                connection.execute(table.insert(), _rows('processing_video', offset, min(batch_size, rows - offset)))
+        write_seconds = time.perf_counter() - start
+
+        writing.clear()
+        for thread in threads:
+            thread.join()
+
+        with engine.connect() as connection:
+            journal_mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+    finally:
+        engine.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    reads = len(latencies)
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        'journal_mode': journal_mode,
+        'rows_per_sec': rows / write_seconds if write_seconds > 0 else 0,
+        'reads': reads,
+        'read_errors': len(errors),
+        'read_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'read_p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'read_max_ms': float(latencies.max() * 1000)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Show that dashboard reads are not blocked while detections are bulk written (SQLite)')
+    parser.add_argument('--rows', type=int, default=500000, help='Number of detection rows to write')
+    parser.add_argument('--batch-size', type=int, default=Config.DB_INSERT_BATCH_SIZE,
+                        help='Rows per transaction')
+    parser.add_argument('--readers', type=int, default=2, help='Number of concurrent reader threads')
+    parser.add_argument('--max-read-ms', type=float, default=250,
+                        help='Fail if a read takes longer than this with the SQLite profile')
+    args = parser.parse_args(argv)
+
+    config = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    results = {}
+    for name, profile in (('default', False), ('profile', True)):
+        results[name] = run_scenario(config, profile, args.rows, args.batch_size, args.readers)
+        result = results[name]
+        print(f"[{name}] journal_mode={result['journal_mode']} write={result['rows_per_sec']:.0f} rows/s "
+              f"reads={result['reads']} errors={result['read_errors']} "
+              f"p50={result['read_p50_ms']:.1f}ms p99={result['read_p99_ms']:.1f}ms "
+              f"max={result['read_max_ms']:.1f}ms")
+
+    profile = results['profile']
+    if profile['read_errors'] or profile['read_max_ms'] > args.max_read_ms:
+        print("FAIL: readers were blocked during bulk writes with the SQLite profile")
+        return 1
+    print(f"OK: readers were not blocked during bulk writes (max {profile['read_max_ms']:.1f}ms)")
+    return 0
+
+
+# Kiểm tra rằng với profile SQLite (WAL) các truy vấn đọc của dashboard không bị
+# chặn trong khi một job đang ghi hàng loạt detection
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+import pytest
+
+from app.services.options import TILE_SIZE_MINIMUM, parse_processing_options
+
+
+@pytest.mark.parametrize('tile_size', ['1', '32', str(TILE_SIZE_MINIMUM - 1), '1921'])
+def test_rejects_tile_size_outside_limits(tile_size):
+    with pytest.raises(ValueError, match='tile_size'):
+        parse_processing_options({'tile_size': tile_size})
+
+
+@pytest.mark.parametrize('tile_size', ['0', str(TILE_SIZE_MINIMUM), '640', '1920'])
+def test_accepts_tile_size_within_limits(tile_size):
+    assert parse_processing_options({'tile_size': tile_size})['tile_size'] == int(tile_size)
+
+
+def test_rejects_tile_overlap_above_maximum():
+    with pytest.raises(ValueError, match='tile_overlap'):
+        parse_processing_options({'tile_size': '640', 'tile_overlap': '0.9'})
@@ -213,13 +213,9 @@ const VideoProcessing = () => {
         fileInputRef.current.value = '';
       }
       
-      showAlert(
-        `Video đã được tải lên và xử lý thành công! Đã phát hiện ${uploadResponse.data.person_count || 0} người và ${uploadResponse.data.animal_count || 0} động vật.`,
-        'success'
-      );
-      
-      // Refresh video list
-      fetchVideos();
+      // Video được xử lý trong nền, theo dõi trạng thái job
+      showAlert('Video đã được tải lên, đang xử lý...', 'info');
+      pollJobStatus(uploadResponse.data.jobId);
       
     } catch (error) {
       console.error('Upload error:', error);
@@ -229,6 +225,32 @@ const VideoProcessing = () => {
     }
   };
 
+  const pollJobStatus = (jobId) => {
+    if (!jobId) {
+      fetchVideos();
+      return;
+    }
+    
+    const timer = setInterval(async () => {
+      try {
+        const response = await axios.get(API_ENDPOINTS.JOB_STATUS(jobId));
+        const job = response.data;
+        
+        if (job.status === 'completed') {
+          clearInterval(timer);
+          showAlert('Video đã được xử lý thành công!', 'success');
+          fetchVideos();
+        } else if (job.status === 'failed') {
+          clearInterval(timer);
+          showAlert(`Lỗi khi xử lý video: ${job.error || 'Unknown error'}`, 'error');
+        }
+      } catch (error) {
+        clearInterval(timer);
+        console.error('Error fetching job status:', error);
+      }
+    }, 2000);
+  };
+
   const handleDeleteVideo = async (video) => {
     try {
       // Lấy ID từ video
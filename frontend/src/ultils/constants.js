@@ -4,8 +4,10 @@ export const API_ENDPOINTS = {
     UPLOAD_VIDEO: '/api/videos/upload',
     PROCESSED_VIDEOS: '/api/videos/processed',
     STREAM_VIDEO: (videoId) => `/api/videos/stream/${videoId}`,
+    HLS_PLAYLIST: (videoId) => `/api/videos/stream/${videoId}/index.m3u8`,
     THUMBNAIL: (videoId) => `/api/videos/thumbnail/${videoId}`,
     DELETE_VIDEO: '/api/videos/delete',
+    JOB_STATUS: (jobId) => `/api/videos/jobs/${jobId}`,
     
     // Tracking endpoints
     TRACKING_VIDEO: '/api/tracking/video',